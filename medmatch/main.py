@@ -34,6 +34,10 @@ class ReportFilter(BaseModel):
 class SymptomInput(BaseModel): description: str
 class BookSlotModel(BaseModel): patient_id: int; doctor_id: int; date: str; time: str; symptoms: str
 class ConsultModel(BaseModel): appt_id: int; diagnosis: str; notes: str; charges: float
+# Public user views: never include password_hash
+class AdminOut(BaseModel): id: int; name: Optional[str] = None; email: Optional[str] = None
+class PatientOut(AdminOut): age: Optional[int] = None; dob: Optional[str] = None; phone: Optional[str] = None
+class DoctorOut(AdminOut): qualification: Optional[str] = None; phone_number: Optional[str] = None; specialty_id: Optional[int] = None; default_fee: Optional[float] = None
 
 # --- AUTH ---
 @app.post("/auth/register")
@@ -223,12 +227,13 @@ def get_all_docs(db: Session = Depends(get_db)):
 def get_specs(db: Session = Depends(get_db)): return [{"id": s.id, "name": s.name} for s in db.query(Specialty).all()]
 @app.get("/symptoms/all")
 def get_symps(db: Session = Depends(get_db)): return [{"id": s.id, "keyword": s.keyword, "spec_id": s.specialty_id} for s in db.query(Symptom).all()]
-@app.get("/users/all")
+USER_VIEWS = {"Patient": (Patient, PatientOut), "Doctor": (Doctor, DoctorOut), "Admin": (Admin, AdminOut)}
+
+@app.get("/users/all", response_model=List[PatientOut | DoctorOut | AdminOut])
 def get_users(role: str, db: Session = Depends(get_db)):
-    if role == "Patient": return db.query(Patient).all()
-    if role == "Doctor": return db.query(Doctor).all()
-    if role == "Admin": return db.query(Admin).all()
-    return []
+    if role not in USER_VIEWS: return []
+    m, out = USER_VIEWS[role]; cols = list(out.model_fields)
+    return [out(**dict(zip(cols, r))) for r in db.query(*[getattr(m, c) for c in cols])]
 @app.get("/reports/all")
 def get_reports(db: Session = Depends(get_db)):
     res = db.query(Appointment, Doctor.name.label("d"), Patient.name.label("p")).join(Doctor).outerjoin(Patient).all()
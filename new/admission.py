@@ -0,0 +1,107 @@
+from fastapi import HTTPException, Request
+from metrics import counter, histogram
+from security_utils import verify_user_token
+from contextlib import contextmanager
+import math, threading, time
+
+ADMISSION = counter("medmatch_admission_total", "Admission decisions for guarded endpoints", ("limit", "result"))
+ADMISSION_WAIT = histogram("medmatch_admission_wait_seconds", "Time spent queued for a concurrency slot", ("limit",))
+
+# Defaults per guarded endpoint group; clinic_config.json "admission" overrides any key.
+#   concurrency  requests running at once (per worker)
+#   max_queue    requests allowed to wait for a slot; beyond that they are shed at once
+#   queue_timeout seconds a queued request waits before it is shed
+#   rate, burst  per-user token bucket (requests per second, bucket size)
+DEFAULTS = {
+    "reports":   {"concurrency": 2, "max_queue": 4,  "queue_timeout": 10.0, "rate": 0.2, "burst": 3},
+    "knowledge": {"concurrency": 4, "max_queue": 16, "queue_timeout": 2.0,  "rate": 2.0, "burst": 10},
+    "pdf":       {"concurrency": 4, "max_queue": 16, "queue_timeout": 5.0,  "rate": 1.0, "burst": 5},
+    "auth":      {"concurrency": 4, "max_queue": 16, "queue_timeout": 3.0,  "rate": 0.5, "burst": 5},
+}
+
+def client_key(request):
+    # The signed-in user from the X-User-Token issued at login; anything else is keyed by
+    # address (all browsers share the frontend's address, so anonymous calls share a bucket)
+    user = verify_user_token(request.headers.get("x-user-token"))
+    return f"user:{user}" if user else f"addr:{request.client.host if request.client else 'anonymous'}"
+
+def shed(limit, result, retry_after, detail):
+    ADMISSION.inc(limit=limit, result=result)
+    raise HTTPException(429, detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+class TokenBuckets:
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate; self.burst = burst; self.max_keys = max_keys
+        self.buckets = {}; self.lock = threading.Lock()
+
+    def take(self, key, now=None):
+        # -> 0 when a token was taken, else seconds until one is available
+        if self.rate <= 0: return 0
+        now = now or time.monotonic()
+        with self.lock:
+            tokens, last = self.buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1: self.buckets[key] = (tokens - 1, now); wait = 0
+            else: self.buckets[key] = (tokens, now); wait = (1 - tokens) / self.rate
+            if len(self.buckets) > self.max_keys:
+                # drop keys whose bucket has refilled; they would start full anyway
+                full = now - self.burst / self.rate
+                self.buckets = {k: v for k, v in self.buckets.items() if v[1] > full}
+        return wait
+
+class Gate:
+    # Per-user rate limit, then a bounded wait for one of `concurrency` slots
+    def __init__(self, name, concurrency, max_queue, queue_timeout, rate, burst):
+        self.name = name; self.concurrency = concurrency; self.max_queue = max_queue; self.queue_timeout = queue_timeout
+        self.slots = threading.BoundedSemaphore(concurrency); self.buckets = TokenBuckets(rate, burst)
+        self.lock = threading.Lock(); self.running = 0; self.waiting = 0
+
+    def enter(self, key):
+        wait = self.buckets.take(key)
+        if wait: shed(self.name, "rate_limited", wait, "Too many requests, slow down")
+        if self.slots.acquire(blocking=False): ADMISSION.inc(limit=self.name, result="admitted")
+        else:
+            with self.lock:
+                full = self.waiting >= self.max_queue
+                if not full: self.waiting += 1
+            if full: shed(self.name, "queue_full", self.queue_timeout, "Server busy, try again shortly")
+            t0 = time.perf_counter()
+            try: ok = self.slots.acquire(timeout=self.queue_timeout)
+            finally:
+                with self.lock: self.waiting -= 1
+            ADMISSION_WAIT.observe(time.perf_counter() - t0, limit=self.name)
+            if not ok: shed(self.name, "timed_out", self.queue_timeout, "Server busy, try again shortly")
+            ADMISSION.inc(limit=self.name, result="queued")
+        with self.lock: self.running += 1
+
+    def leave(self):
+        with self.lock: self.running -= 1
+        self.slots.release()
+
+    def stats(self):
+        with self.lock: return {"concurrency": self.concurrency, "running": self.running, "waiting": self.waiting, "max_queue": self.max_queue,
+                                "queue_timeout": self.queue_timeout, "rate": self.buckets.rate, "burst": self.buckets.burst, "users": len(self.buckets.buckets)}
+
+class AdmissionControl:
+    def __init__(self, overrides=None):
+        overrides = overrides or {}
+        self.gates = {n: Gate(n, **{**d, **overrides.get(n, {})}) for n, d in DEFAULTS.items()}
+
+    def guard(self, name):
+        # FastAPI dependency: Depends(admission.guard("reports"))
+        gate = self.gates[name]
+        def dependency(request: Request):
+            gate.enter(client_key(request))
+            try: yield
+            finally: gate.leave()
+        return dependency
+
+    @contextmanager
+    def admit(self, name, key):
+        # For endpoints keyed on the request body, e.g. login by the submitted email
+        gate = self.gates[name]; gate.enter(key)
+        try: yield
+        finally: gate.leave()
+
+    def stats(self):
+        return {n: g.stats() for n, g in self.gates.items()}
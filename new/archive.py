@@ -0,0 +1,38 @@
+from database import Appointment, ArchivedAppointment
+from config import get_config
+from sqlalchemy import insert, delete, select, literal, func
+from datetime import datetime, timedelta
+
+COLUMNS = [c.name for c in Appointment.__table__.columns]
+
+def archive_cutoff():
+    days = get_config().get("archive_after_days")
+    return (datetime.now() - timedelta(days=int(days))).strftime("%Y-%m-%d") if days else None
+
+def archive_completed(db, batch_size=None, max_batches=100):
+    # Moves COMPLETED appointments older than the cutoff in id-ordered batches, one
+    # short transaction per batch so booking writers are never blocked for long
+    cutoff = archive_cutoff()
+    if not cutoff: return 0
+    batch_size = batch_size or get_config().get("archive_batch_size", 1000); moved = 0
+    for _ in range(max_batches):
+        ids = [i for (i,) in db.query(Appointment.id).filter(Appointment.status == "COMPLETED", Appointment.appt_date < cutoff)
+               .order_by(Appointment.id).limit(batch_size)]
+        if not ids: break
+        src = select(*[Appointment.__table__.c[c] for c in COLUMNS], literal(datetime.now().isoformat())).where(Appointment.id.in_(ids))
+        db.execute(insert(ArchivedAppointment).from_select(COLUMNS + ["archived_at"], src))
+        db.execute(delete(Appointment).where(Appointment.id.in_(ids)))
+        db.commit(); moved += len(ids)
+    return moved
+
+def archived_through(db):
+    # Latest appointment date in the archive (None when empty); an index lookup
+    return db.query(func.max(ArchivedAppointment.appt_date)).scalar()
+
+def needs_archive(db, start_date=None):
+    last = archived_through(db)
+    return last is not None and (not start_date or start_date <= last)
+
+def stats(db):
+    return {"cutoff": archive_cutoff(), "archived": db.query(func.count(ArchivedAppointment.id)).scalar(),
+            "archived_through": archived_through(db), "hot": db.query(func.count(Appointment.id)).scalar()}
@@ -0,0 +1,64 @@
+import argparse, json, os, sys, tempfile, time, statistics
+
+# Latency and accuracy of the learned specialty classifier against the keyword router,
+# on a generated clinic. Completed appointments are split by id: the first 80% train,
+# the rest evaluate. Incremental training is checked by fitting the training half in
+# two steps and comparing with a single full fit.
+#   python -m bench.classifier --appointments 20000 --out classifier.json
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Specialty classifier benchmark")
+    p.add_argument("--doctors", type=int, default=40); p.add_argument("--patients", type=int, default=500)
+    p.add_argument("--appointments", type=int, default=10000); p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--epochs", type=int, default=5); p.add_argument("--out")
+    args = p.parse_args(argv)
+    tmp = tempfile.mkdtemp(prefix="medmatch-clf-")
+    os.environ["MEDMATCH_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'clf.db')}"
+
+    import database
+    from bench import datagen
+    from logic_engine import SymptomRouter
+    from specialty_classifier import SpecialtyClassifier, training_rows
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        datagen.generate(db, args.doctors, args.patients, args.appointments, 0, args.seed, days=120)
+        rows = training_rows(db)
+        cut = int(len(rows) * 0.8); train, test = rows[:cut], rows[cut:]
+
+        t0 = time.perf_counter()
+        model = SpecialtyClassifier().partial_fit([r.symptoms for r in train], [r.specialty_id for r in train], epochs=args.epochs)
+        train_s = time.perf_counter() - t0
+        half = len(train) // 2
+        inc = SpecialtyClassifier().partial_fit([r.symptoms for r in train[:half]], [r.specialty_id for r in train[:half]], epochs=args.epochs)
+        t0 = time.perf_counter()
+        inc.partial_fit([r.symptoms for r in train[half:]], [r.specialty_id for r in train[half:]], epochs=args.epochs, seed=1)
+        inc_s = time.perf_counter() - t0
+
+        kw = SymptomRouter()
+        kw.keyword_scores("warm up", db)
+        def evaluate(fn):
+            hits, lat = 0, []
+            for r in test:
+                s = time.perf_counter(); pred = fn(r.symptoms); lat.append(time.perf_counter() - s)
+                hits += pred == r.specialty_id
+            lat.sort()
+            return {"accuracy": round(hits / len(test), 4) if test else None,
+                    "p50_us": round(lat[len(lat) // 2] * 1e6, 2) if lat else None, "p99_us": round(lat[int(len(lat) * .99)] * 1e6, 2) if lat else None}
+        def keyword_pred(text):
+            sc = kw.keyword_scores(text, db); return max(sc, key=sc.get) if sc else None
+        confs = [model.predict(r.symptoms)[1] for r in test]
+        out = {"meta": {"python": sys.version.split()[0], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": args.seed,
+                        "train_rows": len(train), "test_rows": len(test), "epochs": args.epochs, "classes": len(model.classes)},
+               "model": {**evaluate(lambda t: model.predict(t)[0]), "train_s": round(train_s, 3),
+                         "median_confidence": round(statistics.median(confs), 4) if confs else None},
+               "model_incremental": {**evaluate(lambda t: inc.predict(t)[0]), "increment_train_s": round(inc_s, 3)},
+               "keywords": evaluate(keyword_pred)}
+    finally: db.close()
+    text = json.dumps(out, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else: print(text)
+    return out
+
+if __name__ == "__main__":
+    main()
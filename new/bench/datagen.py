@@ -0,0 +1,96 @@
+from database import Specialty, Symptom, Doctor, Patient, Admin, Appointment, KnowledgeEntry
+from security_utils import get_password_hash
+from sqlalchemy import insert
+from datetime import date, timedelta
+import random
+
+# Deterministic synthetic clinic: the same seed, sizes and start always produce the same rows.
+BENCH_PASSWORD = "bench123"
+# Fixed first day, in the future so every generated day sits inside the in-process
+# calendar window; the first half of the range is generated as completed history.
+START = "2030-01-07"
+
+SPECIALTIES = {
+    "Cardiology": ["chest", "palpitation", "heart", "blood pressure", "breathless"],
+    "Dermatology": ["rash", "itch", "acne", "eczema", "mole"],
+    "Gastroenterology": ["stomach", "nausea", "diarrhea", "bloating", "acid reflux"],
+    "Neurology": ["headache", "migraine", "dizziness", "numbness", "seizure"],
+    "Orthopedics": ["knee", "back pain", "fracture", "joint", "shoulder"],
+    "Pulmonology": ["cough", "wheezing", "asthma", "phlegm", "shortness of breath"],
+    "ENT": ["ear", "sore throat", "sinus", "hearing", "tonsil"],
+    "Ophthalmology": ["eye", "blurred vision", "red eye", "watery eyes", "eyelid"],
+}
+DIAGNOSES = {
+    "Cardiology": [("Angina", "Aspirin 75mg"), ("Hypertension", "Amlodipine 5mg"), ("Arrhythmia", "Metoprolol 25mg")],
+    "Dermatology": [("Contact dermatitis", "Hydrocortisone cream"), ("Acne vulgaris", "Benzoyl peroxide"), ("Eczema", "Emollients")],
+    "Gastroenterology": [("Gastritis", "Omeprazole 20mg"), ("GERD", "Pantoprazole 40mg"), ("IBS", "Mebeverine")],
+    "Neurology": [("Migraine", "Sumatriptan 50mg"), ("Tension headache", "Paracetamol"), ("Vertigo", "Betahistine")],
+    "Orthopedics": [("Lumbar strain", "Ibuprofen 400mg"), ("Osteoarthritis", "Diclofenac gel"), ("Sprain", "RICE protocol")],
+    "Pulmonology": [("Asthma", "Salbutamol inhaler"), ("Bronchitis", "Amoxicillin"), ("COPD", "Tiotropium")],
+    "ENT": [("Otitis media", "Amoxicillin"), ("Pharyngitis", "Penicillin V"), ("Sinusitis", "Saline rinse")],
+    "Ophthalmology": [("Conjunctivitis", "Chloramphenicol drops"), ("Dry eye", "Artificial tears"), ("Stye", "Warm compress")],
+}
+# Lay descriptions that contain none of the specialty keywords
+LAY = {
+    "Cardiology": ["tightness when climbing stairs", "racing pulse at rest", "swollen ankles by evening"],
+    "Dermatology": ["red patches on arms", "flaky skin on scalp", "spots that will not heal"],
+    "Gastroenterology": ["burning after spicy food", "cramps after eating", "loose motions"],
+    "Neurology": ["tingling in fingers", "room spinning when standing", "pins and needles in feet"],
+    "Orthopedics": ["hurts to bend down", "twisted ankle playing football", "stiff in the mornings"],
+    "Pulmonology": ["cannot catch my breath", "whistling sound when breathing", "chesty rattle at night"],
+    "ENT": ["blocked nose for weeks", "ringing noise", "painful swallowing"],
+    "Ophthalmology": ["gritty feeling when reading", "seeing floaters", "sensitive to bright light"],
+}
+FILLER = ["since yesterday", "for two weeks", "worse at night", "after meals", "mild", "severe", "on and off", "with fever", "getting worse"]
+FIRST = ["Alex", "Sam", "Maria", "John", "Priya", "Chen", "Fatima", "Luca", "Aisha", "Noah", "Emma", "Ravi", "Olga", "Kenji", "Sara"]
+LAST = ["Smith", "Patel", "Garcia", "Kim", "Nguyen", "Rossi", "Khan", "Muller", "Silva", "Cohen", "Ivanova", "Okafor"]
+SLOTS = [f"{h:02d}:{m:02d}" for h in range(9, 17) for m in (0, 30)]
+
+def symptom_text(rng, spec):
+    if rng.random() < 0.3: return f"{rng.choice(LAY[spec])} {rng.choice(FILLER)}"
+    kws = rng.sample(SPECIALTIES[spec], 2)
+    return f"{kws[0]} and {kws[1]} {rng.choice(FILLER)}"
+
+def generate(db, doctors=20, patients=200, appointments=2000, knowledge=500, seed=42, start=START, days=60):
+    rng = random.Random(seed)
+    start = date.fromisoformat(start) if isinstance(start, str) else start
+    pw = get_password_hash(BENCH_PASSWORD)
+    specs = list(SPECIALTIES)
+
+    db.execute(insert(Specialty), [{"id": i + 1, "name": s} for i, s in enumerate(specs)])
+    db.execute(insert(Symptom), [{"keyword": k, "specialty_id": i + 1} for i, s in enumerate(specs) for k in SPECIALTIES[s]])
+    db.execute(insert(Admin), [{"id": 1, "name": "Bench Admin", "email": "admin@bench.test", "password_hash": pw}])
+    docs = [{"id": i + 1, "name": f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)}", "email": f"doc{i + 1}@bench.test", "password_hash": pw,
+             "qualification": rng.choice(["MD", "MBBS", "DO"]), "phone_number": f"555-{i:04d}", "specialty_id": i % len(specs) + 1,
+             "default_fee": float(rng.choice([80, 100, 120, 150, 200]))} for i in range(doctors)]
+    db.execute(insert(Doctor), docs)
+    db.execute(insert(Patient), [{"id": i + 1, "name": f"{rng.choice(FIRST)} {rng.choice(LAST)} {i + 1}", "email": f"pat{i + 1}@bench.test",
+                                  "password_hash": pw, "age": rng.randint(1, 90), "dob": "1990-01-01", "phone": f"556-{i:05d}"} for i in range(patients)])
+
+    rows, taken = [], set()
+    today = (start + timedelta(days=days // 2)).isoformat()
+    while len(rows) < appointments and len(taken) < doctors * days * len(SLOTS):
+        d = rng.randrange(doctors); day = (start + timedelta(days=rng.randrange(days))).isoformat(); t = rng.choice(SLOTS)
+        if (d, day, t) in taken: continue
+        taken.add((d, day, t))
+        spec = specs[docs[d]["specialty_id"] - 1]
+        if rng.random() < 0.05:
+            rows.append({"patient_id": None, "doctor_id": d + 1, "appt_date": day, "appt_time": t, "status": "BLOCKED", "symptoms": "Blocked"}); continue
+        row = {"patient_id": rng.randrange(patients) + 1, "doctor_id": d + 1, "appt_date": day, "appt_time": t, "symptoms": symptom_text(rng, spec)}
+        if day < today:
+            diag, med = rng.choice(DIAGNOSES[spec])
+            row.update(status="COMPLETED", diagnosis=diag, doctor_comments="Review in 2 weeks", medications=med, charges=docs[d]["default_fee"],
+                       receipt_number=f"BENCH-{len(rows) + 1:07d}")
+        else: row["status"] = rng.choice(["PENDING", "CONFIRMED"])
+        rows.append(row)
+    for i in range(0, len(rows), 5000): db.execute(insert(Appointment), rows[i:i + 5000])
+
+    kb = []
+    for _ in range(knowledge):
+        spec = rng.choice(specs); diag, med = rng.choice(DIAGNOSES[spec])
+        kb.append({"symptom_text": symptom_text(rng, spec), "diagnosis": diag, "treatment_plan": "Follow up if not improving",
+                   "medication_plan": med, "doctor_name": docs[rng.randrange(doctors)]["name"]})
+    for i in range(0, len(kb), 5000): db.execute(insert(KnowledgeEntry), kb[i:i + 5000])
+    db.commit()
+    return {"doctors": doctors, "patients": patients, "appointments": len(rows), "knowledge": knowledge, "seed": seed,
+            "start": start.isoformat(), "days": days}
@@ -0,0 +1,42 @@
+import asyncio, time, statistics
+import httpx
+
+# Local ASGI load driver: fires requests straight into the app (no sockets) with
+# a fixed number of concurrent clients and reports latency percentiles.
+def summarize(name, latencies, errors, wall, concurrency, extra=None):
+    lat = sorted(latencies)
+    pct = lambda p: round(lat[min(len(lat) - 1, int(p / 100 * len(lat)))] * 1000, 3) if lat else None
+    out = {"scenario": name, "requests": len(lat) + errors, "errors": errors, "concurrency": concurrency,
+           "wall_s": round(wall, 4), "rps": round((len(lat) + errors) / wall, 2) if wall else None,
+           "mean_ms": round(statistics.fmean(lat) * 1000, 3) if lat else None, "p50_ms": pct(50), "p95_ms": pct(95), "p99_ms": pct(99),
+           "max_ms": round(lat[-1] * 1000, 3) if lat else None}
+    if extra: out.update(extra)
+    return out
+
+def run_sequential(client, name, requests):
+    # requests: list of (method, url, kwargs)
+    lat, errors = [], 0; t0 = time.perf_counter()
+    for method, url, kw in requests:
+        s = time.perf_counter(); r = client.request(method, url, **kw)
+        if r.status_code >= 400: errors += 1
+        else: lat.append(time.perf_counter() - s)
+    return summarize(name, lat, errors, time.perf_counter() - t0, 1)
+
+def run_concurrent(app, name, requests, concurrency=8, accept=(200,)):
+    async def main():
+        lat, statuses = [], []; queue = list(requests); queue.reverse()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                while queue:
+                    method, url, kw = queue.pop()
+                    s = time.perf_counter(); r = await client.request(method, url, **kw)
+                    statuses.append(r.status_code)
+                    if r.status_code in accept: lat.append(time.perf_counter() - s)
+            t0 = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(concurrency)])
+            return lat, statuses, time.perf_counter() - t0
+    lat, statuses, wall = asyncio.run(main())
+    codes = {}
+    for c in statuses: codes[str(c)] = codes.get(str(c), 0) + 1
+    return summarize(name, lat, len(statuses) - len(lat), wall, concurrency, {"status_codes": codes})
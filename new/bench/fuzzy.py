@@ -0,0 +1,51 @@
+import argparse, json, random, string, sys, time
+
+# Latency of the fuzzy symptom matcher as the keyword vocabulary grows, plus how many
+# typo'd / lay-worded queries it still routes correctly. Real specialty keywords are
+# padded with random made-up terms up to --keywords.
+#   python -m bench.fuzzy --keywords 10000 --budget-ms 5
+def typo(rng, w):
+    if len(w) < 4: return w
+    i = rng.randrange(1, len(w) - 1); op = rng.randrange(3)
+    if op == 0: return w[:i] + w[i + 1:]
+    if op == 1: return w[:i] + w[i + 1] + w[i] + w[i + 2:]
+    return w[:i] + rng.choice(string.ascii_lowercase) + w[i:]
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fuzzy symptom matcher benchmark")
+    p.add_argument("--keywords", type=int, default=10000); p.add_argument("--queries", type=int, default=2000)
+    p.add_argument("--seed", type=int, default=42); p.add_argument("--budget-ms", type=float, default=5.0); p.add_argument("--out")
+    args = p.parse_args(argv)
+
+    from bench.datagen import SPECIALTIES, FILLER
+    from logic_engine import FuzzyMatcher
+    rng = random.Random(args.seed); specs = list(SPECIALTIES)
+    pairs = [(k, i + 1) for i, s in enumerate(specs) for k in SPECIALTIES[s]]
+    while len(pairs) < args.keywords:
+        w = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10)))
+        pairs.append((w, rng.randrange(len(specs)) + 1))
+    t0 = time.perf_counter(); m = FuzzyMatcher(pairs); build_s = time.perf_counter() - t0
+
+    queries = []
+    for _ in range(args.queries):
+        sid = rng.randrange(len(specs)); kw = rng.choice(SPECIALTIES[specs[sid]])
+        queries.append((f"{' '.join(typo(rng, w) for w in kw.split())} {rng.choice(FILLER)}", sid + 1))
+    m.scores("warm up")
+    lat, hits = [], 0
+    for q, sid in queries:
+        s = time.perf_counter(); sc = m.scores(q); lat.append(time.perf_counter() - s)
+        hits += bool(sc) and max(sc, key=sc.get) == sid
+    t0 = time.perf_counter(); m.scores_many([q for q, _ in queries]); batch_s = time.perf_counter() - t0
+    lat.sort(); pct = lambda x: round(lat[min(len(lat) - 1, int(x * len(lat)))] * 1000, 3)
+    out = {"meta": {"python": sys.version.split()[0], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "seed": args.seed,
+                    "keywords": len(pairs), "queries": len(queries)},
+           "build_s": round(build_s, 3), "p50_ms": pct(.5), "p99_ms": pct(.99), "batch_per_query_ms": round(batch_s / len(queries) * 1000, 3),
+           "typo_accuracy": round(hits / len(queries), 4), "budget_ms": args.budget_ms, "within_budget": pct(.99) <= args.budget_ms}
+    text = json.dumps(out, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else: print(text)
+    return out
+
+if __name__ == "__main__":
+    main()
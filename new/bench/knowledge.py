@@ -0,0 +1,67 @@
+import argparse, json, os, random, sys, tempfile, time, tracemalloc
+
+# Knowledge search engines side by side on one generated corpus: the in-process
+# TF-IDF index against the SQLite FTS5/BM25 index. Reports build time, per-query
+# latency, memory (Python heap for TF-IDF, on-disk index for FTS5) and how often
+# both return the same cases.
+#   python -m bench.knowledge --knowledge 20000 --queries 1000
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Knowledge search engine benchmark")
+    p.add_argument("--knowledge", type=int, default=20000); p.add_argument("--queries", type=int, default=1000)
+    p.add_argument("--limit", type=int, default=3); p.add_argument("--seed", type=int, default=42); p.add_argument("--out")
+    args = p.parse_args(argv)
+    tmp = tempfile.mkdtemp(prefix="medmatch-kb-")
+    os.environ["MEDMATCH_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'kb.db')}"
+
+    import database
+    from bench import datagen
+    from knowledge_engine import MedicalKnowledgeSystem, FTSKnowledgeSystem, install_fts
+    from sqlalchemy import text
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try: data = datagen.generate(db, 10, 10, 0, args.knowledge, args.seed)
+    finally: db.close()
+    rng = random.Random(args.seed + 1); specs = list(datagen.SPECIALTIES)
+    queries = [datagen.symptom_text(rng, rng.choice(specs)) for _ in range(args.queries)]
+
+    def run(engine, build):
+        db = database.SessionLocal()
+        try:
+            tracemalloc.start(); t0 = time.perf_counter(); build(db)
+            build_s = time.perf_counter() - t0; heap = tracemalloc.get_traced_memory()[0]; tracemalloc.stop()
+            engine.search_similar_cases("warm up", db, args.limit)
+            lat, results = [], []
+            for q in queries:
+                s = time.perf_counter(); r = engine.search_similar_cases(q, db, args.limit); lat.append(time.perf_counter() - s)
+                results.append([(x["data"].id, x["data"].diagnosis) for x in r])
+            t0 = time.perf_counter(); engine.search_many(queries, db, args.limit); batch_s = time.perf_counter() - t0
+            lat.sort(); pct = lambda x: round(lat[min(len(lat) - 1, int(x * len(lat)))] * 1000, 3)
+            return {"build_s": round(build_s, 3), "p50_ms": pct(.5), "p99_ms": pct(.99), "batch_per_query_ms": round(batch_s / len(queries) * 1000, 3),
+                    "python_heap_bytes": heap, "empty_results": sum(not r for r in results)}, results
+        finally: db.close()
+
+    tfidf = MedicalKnowledgeSystem()
+    res_t, ids_t = run(tfidf, tfidf.rebuild)
+    fts = FTSKnowledgeSystem()
+    res_f, ids_f = run(fts, lambda db: install_fts(database.engine))
+    with database.engine.connect() as c:
+        res_f["index_bytes"] = c.execute(text("SELECT sum(length(block)) FROM knowledge_fts_data")).scalar()
+
+    # Overlap: same top hit, and shared results among the top `limit` (Jaccard), by case
+    # id and by diagnosis (the generated corpus repeats texts, so equal-score ties are common)
+    both = [(a, b) for a, b in zip(ids_t, ids_f) if a or b]
+    def overlap(key):
+        top1 = sum(bool(a) and bool(b) and key(a[0]) == key(b[0]) for a, b in both) / max(1, len(both))
+        jac = sum(len({key(x) for x in a} & {key(x) for x in b}) / len({key(x) for x in a} | {key(x) for x in b}) for a, b in both) / max(1, len(both))
+        return {"top1_agreement": round(top1, 4), "mean_jaccard": round(jac, 4)}
+    out = {"meta": {"python": sys.version.split()[0], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "dataset": data,
+                    "queries": len(queries), "limit": args.limit},
+           "tfidf": res_t, "fts5": res_f, "overlap": {"case": overlap(lambda x: x[0]), "diagnosis": overlap(lambda x: x[1])}}
+    text_ = json.dumps(out, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text_ + "\n")
+    else: print(text_)
+    return out
+
+if __name__ == "__main__":
+    main()
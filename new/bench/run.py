@@ -0,0 +1,68 @@
+import argparse, json, os, platform, random, subprocess, sys, tempfile, time
+from types import SimpleNamespace
+
+# Usage (from the new/ directory):
+#   python -m bench.run --doctors 50 --patients 2000 --appointments 20000 --knowledge 2000 --out bench.json
+# The app runs against a throwaway SQLite file so the real medmatch.db is never touched.
+def git_rev():
+    try: return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception: return None
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="MedMatch benchmark suite")
+    p.add_argument("--doctors", type=int, default=20); p.add_argument("--patients", type=int, default=200)
+    p.add_argument("--appointments", type=int, default=2000); p.add_argument("--knowledge", type=int, default=500)
+    p.add_argument("--days", type=int, default=60); p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--start", help="first generated day, YYYY-MM-DD (default: bench.datagen.START)")
+    p.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--scenarios", default="all", help="comma separated scenario names")
+    p.add_argument("--db", help="SQLite file to use instead of a temporary one (must not exist)")
+    p.add_argument("--rate-limits", action="store_true", help="keep per-user rate limits (all bench traffic is one client)")
+    p.add_argument("--out", help="write JSON results here instead of stdout")
+    args = p.parse_args(argv)
+
+    path = args.db or os.path.join(tempfile.mkdtemp(prefix="medmatch-bench-"), "bench.db")
+    if os.path.exists(path): p.error(f"{path} already exists")
+    os.environ["MEDMATCH_DB_URL"] = f"sqlite:///{path}"
+
+    import database
+    from bench import datagen
+    from bench.scenarios import SCENARIOS
+    names = list(SCENARIOS) if args.scenarios == "all" else args.scenarios.split(",")
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown: p.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal(); t0 = time.perf_counter()
+    try: data = datagen.generate(db, args.doctors, args.patients, args.appointments, args.knowledge, args.seed, start=args.start or datagen.START, days=args.days)
+    finally: db.close()
+    database.init_db()  # the migration step (indexes, search tables); the clinic is already seeded
+    gen_s = time.perf_counter() - t0
+
+    if not args.rate_limits:
+        import admission, config
+        config.get_config()["admission"] = {n: {**config.get_config().get("admission", {}).get(n, {}), "rate": 0} for n in admission.DEFAULTS}
+    import main as app_module
+    from fastapi.testclient import TestClient
+    results = []
+    with TestClient(app_module.app) as client:
+        ctx = SimpleNamespace(app=app_module.app, client=client, session=database.SessionLocal, data=data,
+                              rng=random.Random(args.seed), n=args.requests, concurrency=args.concurrency)
+        for name in names:
+            print(f"running {name}...", file=sys.stderr)
+            ctx.rng = random.Random(f"{args.seed}:{name}")
+            results.append(SCENARIOS[name](ctx))
+
+    out = {"meta": {"git_rev": git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "dataset": data, "generate_s": round(gen_s, 3),
+                    "requests": args.requests, "concurrency": args.concurrency, "db": path},
+           "results": results}
+    text = json.dumps(out, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else: print(text)
+    return out
+
+if __name__ == "__main__":
+    main()
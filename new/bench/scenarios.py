@@ -0,0 +1,105 @@
+from bench.driver import run_concurrent, run_sequential
+from bench.datagen import BENCH_PASSWORD, SPECIALTIES, SLOTS, symptom_text
+from database import Appointment
+from datetime import date, timedelta
+from sqlalchemy import func
+
+# Each scenario takes the bench context and returns one result dict.
+def login_storm(ctx):
+    reqs = [("POST", "/auth/login", {"json": {"role": "Patient", "email": f"pat{ctx.rng.randrange(ctx.data['patients']) + 1}@bench.test",
+                                              "password": BENCH_PASSWORD}}) for _ in range(ctx.n)]
+    return run_concurrent(ctx.app, "login_storm", reqs, ctx.concurrency)
+
+def slot_requests(ctx):
+    # Skewed towards a handful of popular doctors, like clinic opening time
+    hot = max(1, ctx.data["doctors"] // 10); reqs = []
+    for _ in range(ctx.n):
+        d = ctx.rng.randrange(hot) + 1 if ctx.rng.random() < 0.7 else ctx.rng.randrange(ctx.data["doctors"]) + 1
+        day = (date.fromisoformat(ctx.data["start"]) + timedelta(days=ctx.rng.randrange(ctx.data["days"]))).isoformat()
+        reqs.append(("GET", "/calendar/slots", {"params": {"doctor_id": d, "date": day}}))
+    return reqs
+
+def slot_browsing(ctx):
+    return run_concurrent(ctx.app, "slot_browsing", slot_requests(ctx), ctx.concurrency)
+
+def availability_browsing(ctx):
+    # Same traffic as slot_browsing, answered from the compact calendar
+    reqs = [("GET", "/calendar/availability", kw) for _, _, kw in slot_requests(ctx)]
+    return run_concurrent(ctx.app, "availability_browsing", reqs, ctx.concurrency)
+
+def booking_contention(ctx):
+    # Many patients race for the same few slots on a day outside the generated range
+    day = (date.fromisoformat(ctx.data["start"]) + timedelta(days=ctx.data["days"] + 30)).isoformat()
+    targets = [(ctx.rng.randrange(ctx.data["doctors"]) + 1, t) for t in SLOTS[:4]]
+    reqs = []
+    for i in range(ctx.n):
+        d, t = targets[i % len(targets)]
+        reqs.append(("POST", "/calendar/book", {"json": {"patient_id": ctx.rng.randrange(ctx.data["patients"]) + 1, "doctor_id": d,
+                                                          "date": day, "time": t, "symptoms": "bench contention"}}))
+    res = run_concurrent(ctx.app, "booking_contention", reqs, ctx.concurrency, accept=(200, 400))
+    db = ctx.session()
+    try:
+        booked = db.query(Appointment.doctor_id, Appointment.appt_time, func.count(Appointment.id)).filter(Appointment.appt_date == day)\
+            .group_by(Appointment.doctor_id, Appointment.appt_time).all()
+    finally: db.close()
+    res["slots"] = len(targets); res["double_bookings"] = sum(max(0, n - 1) for _, _, n in booked)
+    return res
+
+def report_generation(ctx):
+    start = ctx.data["start"]; reqs = []
+    for i in range(ctx.n):
+        f = {"start_date": start}
+        if i % 3 == 1: f["doctor_id"] = ctx.rng.randrange(ctx.data["doctors"]) + 1
+        if i % 3 == 2: f["specialty_id"] = ctx.rng.randrange(len(SPECIALTIES)) + 1
+        reqs.append(("POST", "/reports/advanced", {"json": f}))
+    return run_sequential(ctx.client, "report_generation", reqs)
+
+def knowledge_search(ctx):
+    specs = list(SPECIALTIES)
+    reqs = [("POST", "/knowledge/query", {"json": {"description": symptom_text(ctx.rng, ctx.rng.choice(specs))}}) for _ in range(ctx.n)]
+    return run_concurrent(ctx.app, "knowledge_search", reqs, ctx.concurrency)
+
+def symptom_routing(ctx):
+    specs = list(SPECIALTIES)
+    reqs = [("POST", "/analyze/doctors", {"json": {"description": symptom_text(ctx.rng, ctx.rng.choice(specs))}}) for _ in range(ctx.n)]
+    return run_concurrent(ctx.app, "symptom_routing", reqs, ctx.concurrency)
+
+def triage_batch(ctx, batch_size=50):
+    # The same intake forms routed and searched one call at a time, then in batches
+    import time
+    specs = list(SPECIALTIES)
+    texts = [symptom_text(ctx.rng, ctx.rng.choice(specs)) for _ in range(ctx.n)]
+    for url in ("/analyze/doctors/batch", "/knowledge/query/batch"): ctx.client.post(url, json={"descriptions": texts[:1]})  # warm up
+    seq = [r for t in texts for r in (("POST", "/analyze/doctors", {"json": {"description": t}}),
+                                      ("POST", "/knowledge/query", {"json": {"description": t}}))]
+    res = run_sequential(ctx.client, "triage_batch", seq)
+    chunks = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    t0 = time.perf_counter(); errors = 0
+    for c in chunks:
+        for url in ("/analyze/doctors/batch", "/knowledge/query/batch"):
+            errors += ctx.client.post(url, json={"descriptions": c}).status_code >= 400
+    batch_s = time.perf_counter() - t0
+    res.update(forms=len(texts), batch_size=batch_size, sequential_forms_per_s=round(len(texts) / res["wall_s"], 2) if res["wall_s"] else None,
+               batch_wall_s=round(batch_s, 4), batch_errors=errors, batch_forms_per_s=round(len(texts) / batch_s, 2) if batch_s else None,
+               speedup=round(res["wall_s"] / batch_s, 2) if batch_s else None)
+    return res
+
+def pdf_rendering(ctx):
+    db = ctx.session()
+    try: ids = [i for (i,) in db.query(Appointment.id).filter(Appointment.status == "COMPLETED").order_by(Appointment.id).limit(200)]
+    finally: db.close()
+    if not ids: return {"scenario": "pdf_rendering", "skipped": "no completed appointments"}
+    reqs = [("GET", f"/appointment/{ctx.rng.choice(ids)}/pdf", {}) for _ in range(ctx.n)]
+    return run_concurrent(ctx.app, "pdf_rendering", reqs, ctx.concurrency)
+
+SCENARIOS = {
+    "login_storm": login_storm,
+    "slot_browsing": slot_browsing,
+    "availability_browsing": availability_browsing,
+    "booking_contention": booking_contention,
+    "report_generation": report_generation,
+    "knowledge_search": knowledge_search,
+    "symptom_routing": symptom_routing,
+    "triage_batch": triage_batch,
+    "pdf_rendering": pdf_rendering,
+}
@@ -0,0 +1,61 @@
+import argparse, json, os, sys, tempfile, time, statistics
+
+# /reports/advanced at scale: the endpoint as shipped (column tuples, response
+# class chosen in main) against the previous implementation (ORM rows, dicts
+# through jsonable_encoder and json.dumps), on the same generated clinic.
+#   python -m bench.serialization --appointments 100000 --runs 5
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Report serialization benchmark")
+    p.add_argument("--doctors", type=int, default=50); p.add_argument("--patients", type=int, default=2000)
+    p.add_argument("--appointments", type=int, default=100000); p.add_argument("--days", type=int, default=180)
+    p.add_argument("--runs", type=int, default=5); p.add_argument("--seed", type=int, default=42); p.add_argument("--out")
+    p.add_argument("--start", help="first generated day, YYYY-MM-DD (default: bench.datagen.START)")
+    args = p.parse_args(argv)
+    tmp = tempfile.mkdtemp(prefix="medmatch-ser-")
+    os.environ["MEDMATCH_DB_URL"] = f"sqlite:///{os.path.join(tmp, 'ser.db')}"
+
+    import database
+    from database import Appointment, Doctor, Patient, Specialty
+    from bench import datagen
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try: data = datagen.generate(db, args.doctors, args.patients, args.appointments, 0, args.seed, start=args.start or datagen.START, days=args.days)
+    finally: db.close()
+    database.init_db()
+
+    import main as app_module
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+    from fastapi.testclient import TestClient
+
+    def legacy():
+        db = database.SessionLocal()
+        try:
+            q = db.query(Appointment, Doctor, Patient, Specialty).select_from(Appointment).join(Doctor).outerjoin(Patient).outerjoin(Specialty, Doctor.specialty_id == Specialty.id)
+            rows = [{"ID": a.id, "Date": a.appt_date, "Time": a.appt_time, "Doctor": d.name, "Specialty": s.name if s else "General",
+                     "Patient": p.name if p else "Blocked", "Status": a.status, "Fee": a.charges or 0.0, "Diagnosis": a.diagnosis or "",
+                     "Receipt": a.receipt_number or ""} for a, d, p, s in q.all()]
+            return JSONResponse(jsonable_encoder(rows)).body
+        finally: db.close()
+
+    def timeit(fn):
+        out = []
+        for _ in range(args.runs):
+            s = time.perf_counter(); body = fn(); out.append(time.perf_counter() - s)
+        return {"median_ms": round(statistics.median(out) * 1000, 1), "min_ms": round(min(out) * 1000, 1), "bytes": len(body)}
+
+    with TestClient(app_module.app) as client:
+        current = lambda: client.post("/reports/advanced", json={}).content
+        rows = len(client.post("/reports/advanced", json={}).json())
+        res = {"current": timeit(current), "legacy": timeit(legacy)}
+    res["speedup"] = round(res["legacy"]["median_ms"] / res["current"]["median_ms"], 2)
+    out = {"meta": {"python": sys.version.split()[0], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "dataset": data, "rows": rows,
+                    "runs": args.runs, "response_class": app_module.FastJSONResponse.__name__}, "results": res}
+    text = json.dumps(out, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else: print(text)
+    return out
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse, json, os, subprocess, sys, tempfile, time, statistics
+
+# Cold start timing: each sample is a fresh interpreter that imports main, runs the
+# lifespan startup and serves one /calendar/slots request.
+#   python -m bench.startup --runs 5 --out startup.json
+PROBE = r"""
+import json, time, sys
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as c:
+    t_started = time.perf_counter()
+    r = c.get("/calendar/slots", params={"doctor_id": 1, "date": "2030-01-01"})
+    t_ready = time.perf_counter()
+heavy = [m for m in ("sklearn", "scipy", "fpdf", "numpy", "passlib") if m in sys.modules]
+print(json.dumps({"import_s": t_import - t0, "startup_s": t_started - t_import, "first_request_s": t_ready - t_started,
+                  "ready_s": t_ready - t0, "status": r.status_code, "heavy_modules_loaded": heavy}))
+"""
+
+def sample(db_path):
+    env = dict(os.environ, MEDMATCH_DB_URL=f"sqlite:///{db_path}")
+    out = subprocess.run([sys.executable, "-c", PROBE], env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="MedMatch cold start benchmark")
+    p.add_argument("--runs", type=int, default=5); p.add_argument("--out")
+    args = p.parse_args(argv)
+    db_path = os.path.join(tempfile.mkdtemp(prefix="medmatch-startup-"), "startup.db")
+    env = dict(os.environ, MEDMATCH_DB_URL=f"sqlite:///{db_path}")
+    subprocess.run([sys.executable, "database.py"], env=env, check=True)  # the one-off migration step
+    first = sample(db_path)
+    runs = [sample(db_path) for _ in range(args.runs)]
+    agg = {k: round(statistics.median(r[k] for r in runs), 4) for k in ("import_s", "startup_s", "first_request_s", "ready_s")}
+    out = {"meta": {"python": sys.version.split()[0], "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": args.runs},
+           "first_boot": {k: round(v, 4) if isinstance(v, float) else v for k, v in first.items()},
+           "median": agg, "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"]}
+    text = json.dumps(out, indent=2)
+    if args.out:
+        with open(args.out, "w") as f: f.write(text + "\n")
+    else: print(text)
+    return out
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from database import SessionLocal, CacheVersion, ScheduleChange
+from sqlalchemy import event, insert, update, delete, func
+import os, socket, threading, logging
+
+log = logging.getLogger(__name__)
+
+# Cross-process invalidation. Writers bump a named counter in cache_versions inside
+# their own transaction; every worker polls the (tiny) table from its own scheduler
+# thread and drops or refreshes in-memory caches whose version moved. Readers only
+# compare integers in memory.
+class CacheVersions:
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+        self.shared = {}; self.local = {}; self.listeners = {}
+        self.lock = threading.Lock()
+
+        @event.listens_for(session_factory, "after_commit")
+        def _committed(session):
+            names = session.info.pop("cache_bumps", None)
+            if names:
+                with self.lock:
+                    for n in names: self.local[n] = self.local.get(n, 0) + 1
+
+        @event.listens_for(session_factory, "after_rollback")
+        def _rolled_back(session):
+            session.info.pop("cache_bumps", None)
+
+    def get(self, name):
+        return (self.shared.get(name, 0), self.local.get(name, 0))
+
+    def on_change(self, name, fn):
+        self.listeners.setdefault(name, []).append(fn)
+
+    def bump(self, db, *names):
+        for n in names:
+            db.execute(insert(CacheVersion).prefix_with("OR IGNORE").values(name=n, version=0))
+            db.execute(update(CacheVersion).where(CacheVersion.name == n).values(version=CacheVersion.version + 1))
+        db.info.setdefault("cache_bumps", set()).update(names)
+
+    def poll(self, db=None):
+        own = db is None; db = db or self.session_factory()
+        try:
+            rows = dict(db.query(CacheVersion.name, CacheVersion.version).all())
+            changed = [n for n, v in rows.items() if self.shared.get(n) != v]
+            for n in changed:
+                # publish only after the listeners refreshed, so readers never pair the new
+                # version with old data; a failed refresh is retried on the next poll
+                ok = True
+                for fn in self.listeners.get(n, []):
+                    try: fn(db)
+                    except Exception: log.exception("Cache refresh for %s failed", n); ok = False
+                if ok: self.shared[n] = rows[n]
+            return changed
+        finally:
+            if own: db.close()
+
+class VersionedCache:
+    def __init__(self, versions, name, loader):
+        self.versions = versions; self.name = name; self.loader = loader
+        self.key = None; self.value = None
+
+    def get(self, db):
+        key = self.versions.get(self.name) if self.versions else None
+        if self.value is None or key != self.key or key is None:
+            # read the version before loading so a concurrent bump is never missed
+            self.value = self.loader(db); self.key = key
+        return self.value
+
+# Doctor-day changelog behind the "schedule" version. Writers record the days they
+# touched in the bump's transaction; on a version change each worker replays only the
+# days other workers changed (its own were applied in place) into every target, and
+# falls back to a full load on first sync, after pruning overtook it, or for big batches.
+class ScheduleSync:
+    def __init__(self, versions, targets, max_days=500, keep=20000):
+        # targets: (full_load(db), reload_days(db, {(doctor_id, day)})) pairs
+        self.versions = versions; self.targets = targets; self.max_days = max_days; self.keep = keep
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"; self.last = None
+        self.full_loads = 0; self.partial_loads = 0; self.days_reloaded = 0
+        versions.on_change("schedule", self.sync)
+
+    def changed(self, db, doctor_id, *days, origin=None):
+        # origin="job" for writes nobody applied in place (e.g. housekeeping): every worker replays them
+        db.execute(insert(ScheduleChange), [{"doctor_id": doctor_id, "appt_date": d, "origin": origin or self.origin} for d in sorted(set(days))])
+        self.versions.bump(db, "schedule")
+
+    def sync(self, db):
+        top = db.query(func.max(ScheduleChange.id)).scalar() or 0
+        first = db.query(func.min(ScheduleChange.id)).scalar()
+        days = None
+        if self.last is not None and (first is None or first <= self.last + 1):
+            days = {(d, day) for d, day in db.query(ScheduleChange.doctor_id, ScheduleChange.appt_date)
+                    .filter(ScheduleChange.id > self.last, ScheduleChange.id <= top, ScheduleChange.origin != self.origin)}
+        if days is None or len(days) > self.max_days:
+            for load, _ in self.targets: load(db)
+            self.full_loads += 1
+        elif days:
+            for _, reload_days in self.targets: reload_days(db, days)
+            self.partial_loads += 1; self.days_reloaded += len(days)
+        self.last = top
+
+    def prune(self, db):
+        top = db.query(func.max(ScheduleChange.id)).scalar() or 0
+        return db.execute(delete(ScheduleChange).where(ScheduleChange.id <= top - self.keep)).rowcount
+
+    def stats(self):
+        return {"origin": self.origin, "last_change": self.last, "full_loads": self.full_loads,
+                "partial_loads": self.partial_loads, "days_reloaded": self.days_reloaded}
@@ -0,0 +1,146 @@
+from database import Appointment
+from metrics import timed
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+import sys, threading
+
+# Time of day in 5 minute units; a day is 288 bits of occupancy
+UNIT = 5
+CODES = {"PENDING": 1, "CONFIRMED": 2, "COMPLETED": 3, "BLOCKED": 4, "EXPIRED": 5}
+NAMES = {v: k for k, v in CODES.items()}
+
+def to_unit(t):
+    try: h, m = t.split(":"); m = int(h) * 60 + int(m)
+    except (ValueError, AttributeError): return None
+    return m // UNIT if m % UNIT == 0 and 0 <= m < 1440 else None
+
+def to_time(u):
+    return f"{u * UNIT // 60:02d}:{u * UNIT % 60:02d}"
+
+class DayRow:
+    # One doctor-day: an int bitmask for O(1) occupancy tests plus the occupied
+    # units, their status codes and patient ids as parallel arrays sorted by unit
+    __slots__ = ("occ", "units", "codes", "pids")
+    def __init__(self):
+        self.occ = 0; self.units = array("H"); self.codes = bytearray(); self.pids = array("i")
+
+    def put(self, u, code, pid):
+        i = bisect_left(self.units, u)
+        if i < len(self.units) and self.units[i] == u: self.codes[i] = code; self.pids[i] = pid or 0; return
+        self.units.insert(i, u); self.codes.insert(i, code); self.pids.insert(i, pid or 0); self.occ |= 1 << u
+
+    def drop(self, u):
+        i = bisect_left(self.units, u)
+        if i < len(self.units) and self.units[i] == u:
+            del self.units[i]; del self.codes[i]; del self.pids[i]; self.occ &= ~(1 << u)
+
+    def nbytes(self):
+        return sys.getsizeof(self.occ) + sys.getsizeof(self.units) + sys.getsizeof(self.codes) + sys.getsizeof(self.pids) + 56
+
+# Optional in-process calendar: occupancy for every doctor-day from `history_days`
+# ago onwards, loaded with one column query (no ORM objects). Writes update it in
+# place after commit; other workers reload the doctor-days they changed (ScheduleSync).
+# Days before the window, or times off the 5 minute grid, are not covered and
+# callers fall back to the database.
+class CalendarEngine:
+    def __init__(self, history_days=30):
+        self.history_days = history_days; self.lock = threading.Lock()
+        self.rows = {}; self.patients = {}; self.start = None; self.loaded = False
+
+    @timed("calendar_load")
+    def load(self, db):
+        start = date.today() - timedelta(days=self.history_days)
+        rows, patients = {}, {}
+        q = db.query(Appointment.doctor_id, Appointment.appt_date, Appointment.appt_time, Appointment.status, Appointment.patient_id)\
+            .filter(Appointment.appt_date >= start.isoformat())
+        for d, day, t, st, pid in q:
+            u = to_unit(t)
+            if u is None: continue
+            k = (d, day); r = rows.get(k)
+            if r is None: r = rows[k] = DayRow()
+            r.put(u, CODES.get(st, 1), pid)
+            if pid: patients[(pid, day)] = patients.get((pid, day), 0) | 1 << u
+        with self.lock: self.rows, self.patients, self.start, self.loaded = rows, patients, start.isoformat(), True
+
+    @timed("calendar_reload_days")
+    def reload_days(self, db, days):
+        # Re-reads the given (doctor_id, day) pairs, e.g. after another worker's writes
+        days = {k for k in days if self.loaded and k[1] >= self.start}
+        if not days: return
+        fresh = {k: DayRow() for k in days}
+        q = db.query(Appointment.doctor_id, Appointment.appt_date, Appointment.appt_time, Appointment.status, Appointment.patient_id)\
+            .filter(Appointment.doctor_id.in_({d for d, _ in days}), Appointment.appt_date.in_({day for _, day in days}))
+        for d, day, t, st, pid in q:
+            r = fresh.get((d, day)); u = to_unit(t)
+            if r is not None and u is not None: r.put(u, CODES.get(st, 1), pid)
+        with self.lock:
+            for k, r in fresh.items():
+                old = self.rows.pop(k, None); day = k[1]
+                for u, pid in zip(old.units, old.pids) if old else ():
+                    if pid:
+                        p = self.patients.get((pid, day), 0) & ~(1 << u)
+                        if p: self.patients[(pid, day)] = p
+                        else: self.patients.pop((pid, day), None)
+                for u, pid in zip(r.units, r.pids):
+                    if pid: self.patients[(pid, day)] = self.patients.get((pid, day), 0) | 1 << u
+                if r.units: self.rows[k] = r
+
+    def covers(self, day, time=None):
+        return self.loaded and day >= self.start and (time is None or to_unit(time) is not None)
+
+    def _put(self, doctor_id, day, u, patient_id, status):
+        r = self.rows.get((doctor_id, day))
+        if r is None: r = self.rows[(doctor_id, day)] = DayRow()
+        r.put(u, CODES[status], patient_id)
+        if patient_id: self.patients[(patient_id, day)] = self.patients.get((patient_id, day), 0) | 1 << u
+
+    def reserve(self, doctor_id, day, time, patient_id=None, status="PENDING"):
+        # Atomic check-and-set; returns None on success or the reason the slot is taken
+        u = to_unit(time); bit = 1 << u
+        with self.lock:
+            r = self.rows.get((doctor_id, day))
+            if r is not None and r.occ & bit: return "Doctor Busy"
+            if patient_id and self.patients.get((patient_id, day), 0) & bit: return "You have another appointment"
+            self._put(doctor_id, day, u, patient_id, status)
+        return None
+
+    def occupy(self, doctor_id, day, time, patient_id=None, status="PENDING"):
+        u = to_unit(time)
+        if u is None or not self.loaded or day < self.start: return
+        with self.lock: self._put(doctor_id, day, u, patient_id, status)
+
+    def release(self, doctor_id, day, time):
+        u = to_unit(time)
+        if u is None: return
+        with self.lock:
+            r = self.rows.get((doctor_id, day))
+            if r is None: return
+            i = bisect_left(r.units, u)
+            if i < len(r.units) and r.units[i] == u and r.pids[i]:
+                k = (r.pids[i], day); self.patients[k] = self.patients.get(k, 0) & ~(1 << u)
+                if not self.patients[k]: del self.patients[k]
+            r.drop(u)
+
+    def set_status(self, doctor_id, day, time, status):
+        u = to_unit(time)
+        with self.lock:
+            r = self.rows.get((doctor_id, day))
+            if r is None or u is None or not r.occ & 1 << u: return
+            r.codes[bisect_left(r.units, u)] = CODES[status]
+
+    def is_free(self, doctor_id, day, time):
+        r = self.rows.get((doctor_id, day)); u = to_unit(time)
+        return r is None or not r.occ >> u & 1
+
+    def day(self, doctor_id, day):
+        # -> {time: {"status", "patient_id"}} for occupied slots
+        r = self.rows.get((doctor_id, day))
+        if r is None: return {}
+        with self.lock: items = list(zip(r.units, r.codes, r.pids))
+        return {to_time(u): {"status": NAMES[c], "patient_id": p or None} for u, c, p in items}
+
+    def stats(self):
+        with self.lock: rows = list(self.rows.values()); np_ = len(self.patients)
+        return {"loaded": self.loaded, "window_start": self.start, "doctor_days": len(rows), "slots": sum(len(r.units) for r in rows),
+                "patient_days": np_, "approx_bytes": sum(r.nbytes() for r in rows) + np_ * 100}
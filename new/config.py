@@ -0,0 +1,20 @@
+import json
+
+CONFIG_FILE = "clinic_config.json"
+_cached = None
+# Never returned by /config/read
+SECRET_KEYS = ("profile_token", "report_replica_url")
+
+# clinic_config.json is read once and refreshed by the scheduler instead of on every request
+def refresh_config():
+    global _cached
+    try:
+        with open(CONFIG_FILE, "r") as f: _cached = json.load(f)
+    except: _cached = {}
+    return _cached
+
+def get_config():
+    return _cached if _cached is not None else refresh_config()
+
+def public_config():
+    return {k: v for k, v in get_config().items() if k not in SECRET_KEYS}
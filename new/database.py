@@ -1,11 +1,16 @@
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Float
+from sqlalchemy import create_engine, event, Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from passlib.context import CryptContext 
+import os
 
-DATABASE_URL = "sqlite:///./medmatch.db"
+DATABASE_URL = os.environ.get("MEDMATCH_DB_URL", "sqlite:///./medmatch.db")
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+if engine.dialect.name == "sqlite":
+    # WAL: readers (report snapshots, analytics) never block writers and vice versa
+    @event.listens_for(engine, "connect")
+    def _sqlite_wal(conn, _):
+        conn.execute("PRAGMA journal_mode=WAL")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -72,6 +77,34 @@ class Appointment(Base):
     
     patient = relationship("Patient", back_populates="appointments")
     doctor = relationship("Doctor", back_populates="appointments")
+    # AUTOINCREMENT: archive.py moves rows out, and plain SQLite rowids would hand an
+    # archived max id out again
+    __table_args__ = (Index("ix_appointments_doctor_date", "doctor_id", "appt_date", "appt_time"),
+                      Index("ix_appointments_patient_date", "patient_id", "appt_date", "appt_time", "id"),
+                      {"sqlite_autoincrement": True})
+
+class ArchivedAppointment(Base):
+    # Completed appointments past archive_after_days, moved here by archive.py (same ids)
+    __tablename__ = "appointments_archive"
+    id = Column(Integer, primary_key=True)
+    patient_id = Column(Integer, ForeignKey("patients.id"), nullable=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"))
+    appt_date = Column(String)
+    appt_time = Column(String)
+    symptoms = Column(String, nullable=True)
+    status = Column(String)
+    cancellation_reason = Column(String, nullable=True)
+    diagnosis = Column(String, nullable=True)
+    doctor_comments = Column(Text, nullable=True)
+    medications = Column(Text, nullable=True)
+    charges = Column(Float, nullable=True)
+    receipt_number = Column(String, nullable=True)
+    archived_at = Column(String)
+
+    patient = relationship("Patient", viewonly=True)
+    doctor = relationship("Doctor", viewonly=True)
+    __table_args__ = (Index("ix_archive_date", "appt_date"),
+                      Index("ix_archive_patient_date", "patient_id", "appt_date", "appt_time", "id"))
 
 class KnowledgeEntry(Base):
     __tablename__ = "knowledge_base"
@@ -81,6 +114,31 @@ class KnowledgeEntry(Base):
     treatment_plan = Column(Text)
     medication_plan = Column(Text, nullable=True)
     doctor_name = Column(String)
+    # set by /doctor/consult; the entry id then orders completions (see specialty_classifier)
+    appointment_id = Column(Integer, nullable=True, index=True)
+
+class KnowledgeOutbox(Base):
+    __tablename__ = "knowledge_outbox"
+    id = Column(Integer, primary_key=True)
+    entry_id = Column(Integer, ForeignKey("knowledge_base.id"))
+    status = Column(String, default="PENDING", index=True)
+    attempts = Column(Integer, default=0)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(String)
+    next_attempt_at = Column(String)
+    processed_at = Column(String, nullable=True)
+
+class ScheduledJob(Base):
+    __tablename__ = "scheduled_jobs"
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=True)
+    locked_until = Column(String, nullable=True)
+    last_started_at = Column(String, nullable=True)
+    last_finished_at = Column(String, nullable=True)
+    last_duration_ms = Column(Float, nullable=True)
+    last_status = Column(String, nullable=True)
+    last_error = Column(Text, nullable=True)
+    run_count = Column(Integer, default=0)
 
 class AdhocReceipt(Base):
     __tablename__ = "adhoc_receipts"
@@ -91,15 +149,96 @@ class AdhocReceipt(Base):
     amount = Column(Float)
     created_at = Column(String)
 
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0)
+
+class ScheduleChange(Base):
+    # Doctor-days touched by each "schedule" bump, so workers reload only those (cache_sync.ScheduleSync)
+    __tablename__ = "schedule_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+    id = Column(Integer, primary_key=True)
+    doctor_id = Column(Integer)
+    appt_date = Column(String)
+    origin = Column(String)
+
+class ReceiptSequence(Base):
+    __tablename__ = "receipt_sequences"
+    day = Column(String, primary_key=True)
+    last_value = Column(Integer, default=0)
+
+class SlotTemplate(Base):
+    # Working hours; doctor_id NULL is the clinic default, weekday NULL (0=Monday) every day
+    __tablename__ = "slot_templates"
+    id = Column(Integer, primary_key=True)
+    doctor_id = Column(Integer, ForeignKey("doctors.id"), nullable=True, index=True)
+    weekday = Column(Integer, nullable=True)
+    start_time = Column(String, default="09:00")
+    end_time = Column(String, default="17:00")
+    slot_minutes = Column(Integer, default=30)
+    breaks = Column(String, default="")  # "13:00-14:00,16:00-16:15"
+    is_off = Column(Boolean, default=False)
+
+def _autoincrement_appointments():
+    # Databases created before appointments used AUTOINCREMENT: rebuild the table (SQLite
+    # cannot alter it in place) and start the sequence past every hot and archived id
+    # pysqlite does not open a transaction for DDL, so take the write lock explicitly: the
+    # rebuild is all or nothing and a second process waits, then sees it done
+    from sqlalchemy.schema import CreateTable
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor(); cur.execute("BEGIN IMMEDIATE")
+        try:
+            sql = cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='appointments'").fetchone()
+            if not sql or "AUTOINCREMENT" in sql[0].upper(): conn.rollback(); return
+            have = {r[1] for r in cur.execute("PRAGMA table_info(appointments)")}
+            cols = ", ".join(c.name for c in Appointment.__table__.columns if c.name in have)
+            create = str(CreateTable(Appointment.__table__).compile(engine)).replace("TABLE appointments ", "TABLE appointments_new ", 1)
+            cur.execute("DROP TABLE IF EXISTS appointments_new")
+            cur.execute(create)
+            cur.execute(f"INSERT INTO appointments_new ({cols}) SELECT {cols} FROM appointments")
+            cur.execute("DROP TABLE appointments")
+            cur.execute("ALTER TABLE appointments_new RENAME TO appointments")
+            tables = ["appointments"] + [r[0] for r in cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='appointments_archive'")]
+            top = max(cur.execute(f"SELECT coalesce(max(id), 0) FROM {t}").fetchone()[0] for t in tables)
+            cur.execute("DELETE FROM sqlite_sequence WHERE name = 'appointments'")
+            cur.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('appointments', ?)", (top,))
+            conn.commit()
+        except BaseException:
+            conn.rollback(); raise
+    finally: conn.close()
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add nullable columns and indexes declared since
+    from sqlalchemy import inspect
+    if engine.dialect.name == "sqlite": _autoincrement_appointments()
+    insp = inspect(engine)
+    with engine.begin() as conn:
+        for t in Base.metadata.sorted_tables:
+            have = {c["name"] for c in insp.get_columns(t.name)}
+            for c in t.columns:
+                if c.name not in have and c.nullable:
+                    conn.exec_driver_sql(f'ALTER TABLE {t.name} ADD COLUMN {c.name} {c.type.compile(engine.dialect)}')
+    for t in Base.metadata.sorted_tables:
+        for ix in t.indexes: ix.create(bind=engine, checkfirst=True)
+    if engine.dialect.name == "sqlite":
+        import user_search, knowledge_engine
+        from config import get_config
+        user_search.install(engine); knowledge_engine.install_fts(engine, get_config().get("knowledge_engine", "tfidf") == "fts5")
     db = SessionLocal()
     if not db.query(Specialty).first():
         s1 = Specialty(name="Cardiology"); db.add(s1); db.commit(); db.refresh(s1)
         db.add(Symptom(keyword="chest", specialty_id=s1.id))
-        pwd_ctx = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+        from security_utils import pwd_context
+        pwd_ctx = pwd_context()
         db.add(Admin(name="System Admin", email="admin@med.com", password_hash=pwd_ctx.hash("12345")))
         db.add(Doctor(name="Dr. House", email="house@med.com", password_hash=pwd_ctx.hash("12345"), qualification="MD", specialty_id=1, default_fee=150.0, phone_number="555-0101"))
         db.add(Patient(name="John Doe", email="john@test.com", password_hash=pwd_ctx.hash("12345"), age=30, dob="1995-01-01", phone="555-0202"))
         db.commit()
-    db.close()
\ No newline at end of file
+    db.close()
+
+# Explicit migration step: python database.py
+if __name__ == "__main__":
+    init_db()
@@ -0,0 +1,71 @@
+from database import Appointment, ArchivedAppointment, Patient, Doctor
+from metrics import counter, timed
+from collections import OrderedDict
+import threading
+
+KB_CACHE = counter("medmatch_daysheet_kb_cache_total", "Day-sheet knowledge match lookups", ("result",))
+
+def case_view(x):
+    return {
+        "diagnosis": x['data'].diagnosis,
+        "treatment": x['data'].treatment_plan,
+        "medication": x['data'].medication_plan or "None",
+        "symptom": x['data'].symptom_text, # Added context
+        "doc": x['data'].doctor_name,
+        "score": x['score']
+    }
+
+# A doctor's day in one response: the schedule, who each patient is, their previous
+# visits and the closest knowledge-base cases for their symptoms. Matches are kept per
+# appointment and reused until its symptoms/status change or the knowledge version
+# moves; whatever is missing is scored in a single batched search.
+class DaySheetBuilder:
+    def __init__(self, knowledge_sys, versions=None, max_entries=2000, history=3):
+        self.knowledge_sys = knowledge_sys; self.versions = versions
+        self.max_entries = max_entries; self.history = history
+        self.cache = OrderedDict(); self.lock = threading.Lock()
+
+    def kb_matches(self, appts, db):
+        kb = self.versions.get("knowledge") if self.versions else None
+        out, missing = {}, []
+        with self.lock:
+            for a in appts:
+                key = (a.symptoms, a.status, kb); hit = self.cache.get(a.id)
+                if hit and hit[0] == key: out[a.id] = hit[1]; self.cache.move_to_end(a.id)
+                else: missing.append((a, key))
+        KB_CACHE.inc(len(out), result="hit"); KB_CACHE.inc(len(missing), result="miss")
+        if missing:
+            found = self.knowledge_sys.search_many([a.symptoms for a, _ in missing], db)
+            with self.lock:
+                for (a, key), m in zip(missing, found):
+                    out[a.id] = [case_view(x) for x in m]; self.cache[a.id] = (key, out[a.id]); self.cache.move_to_end(a.id)
+                while len(self.cache) > self.max_entries: self.cache.popitem(last=False)
+        return out
+
+    def previous_visits(self, patient_ids, day, db):
+        res = {p: {"count": 0, "recent": []} for p in patient_ids}
+        if not patient_ids: return res
+        rows = []
+        for m in (Appointment, ArchivedAppointment):
+            rows += db.query(m.patient_id, m.appt_date, m.appt_time, m.diagnosis, Doctor.name).join(Doctor, m.doctor_id == Doctor.id)\
+                .filter(m.patient_id.in_(patient_ids), m.status == "COMPLETED", m.appt_date < day).all()
+        rows.sort(key=lambda r: (r[0], r[1], r[2]), reverse=True)
+        for pid, d, _, diag, doc in rows:
+            r = res[pid]; r["count"] += 1
+            if len(r["recent"]) < self.history: r["recent"].append({"date": d, "doctor": doc, "diagnosis": diag or ""})
+        return res
+
+    @timed("build_daysheet")
+    def build(self, doctor_id, day, db):
+        rows = db.query(Appointment, Patient).outerjoin(Patient, Appointment.patient_id == Patient.id)\
+            .filter(Appointment.doctor_id == doctor_id, Appointment.appt_date == day).order_by(Appointment.appt_time).all()
+        consults = [a for a, p in rows if p is not None and a.symptoms and a.status not in ("BLOCKED", "EXPIRED")]
+        matches = self.kb_matches(consults, db)
+        visits = self.previous_visits(sorted({a.patient_id for a, p in rows if p is not None}), day, db)
+        items = []
+        for a, p in rows:
+            items.append({"id": a.id, "time": a.appt_time, "status": a.status, "patient_id": a.patient_id,
+                          "patient_name": p.name if p else "Blocked", "age": p.age if p else None, "symptoms": a.symptoms,
+                          "cancellation_reason": a.cancellation_reason, "diagnosis": a.diagnosis, "receipt": a.receipt_number,
+                          "previous_visits": visits.get(a.patient_id, {"count": 0, "recent": []}), "kb_matches": matches.get(a.id, [])})
+        return {"doctor_id": doctor_id, "date": day, "appointments": items}
@@ -0,0 +1,64 @@
+from database import SessionLocal, Appointment, Doctor
+from datetime import datetime, date, timedelta
+from slot_templates import SlotGrid
+import threading
+
+# In-memory ranking signals per doctor: fee and the set of occupied slots over the
+# next `horizon_days`. Booking endpoints update it in place; other workers reload the
+# doctor-days they changed (ScheduleSync). Ranking never queries the DB
+# (apart from reloading slot templates when the "templates" version moves).
+class DoctorSignals:
+    def __init__(self, horizon_days=14, grid=None):
+        self.horizon_days = horizon_days; self.lock = threading.Lock()
+        self.fees = {}; self.booked = {}; self.loaded = False
+        self.grid = grid or SlotGrid()
+
+    def rebuild(self, db):
+        today = date.today(); end = today + timedelta(days=self.horizon_days)
+        fees = {i: f for i, f in db.query(Doctor.id, Doctor.default_fee)}
+        booked = {}
+        q = db.query(Appointment.doctor_id, Appointment.appt_date, Appointment.appt_time)\
+            .filter(Appointment.appt_date >= today.isoformat(), Appointment.appt_date <= end.isoformat(), Appointment.status != "EXPIRED")
+        for d, day, t in q: booked.setdefault(d, {}).setdefault(day, set()).add(t)
+        with self.lock: self.fees, self.booked, self.loaded = fees, booked, True
+
+    def reload_days(self, db, days):
+        today = date.today().isoformat(); end = (date.today() + timedelta(days=self.horizon_days)).isoformat()
+        days = {k for k in days if today <= k[1] <= end}
+        if not days: return
+        fresh = {k: set() for k in days}
+        q = db.query(Appointment.doctor_id, Appointment.appt_date, Appointment.appt_time)\
+            .filter(Appointment.doctor_id.in_({d for d, _ in days}), Appointment.appt_date.in_({day for _, day in days}), Appointment.status != "EXPIRED")
+        for d, day, t in q:
+            if (d, day) in fresh: fresh[(d, day)].add(t)
+        with self.lock:
+            for (d, day), ts in fresh.items(): self.booked.setdefault(d, {})[day] = ts
+
+    def occupy(self, doctor_id, day, time):
+        with self.lock: self.booked.setdefault(doctor_id, {}).setdefault(day, set()).add(time)
+
+    def release(self, doctor_id, day, time):
+        with self.lock: self.booked.get(doctor_id, {}).get(day, set()).discard(time)
+
+    def signals(self, doctor_id, now=None):
+        now = now or datetime.now(); today = now.date()
+        # copy the upcoming bookings under the lock; the slot search runs on the copy
+        with self.lock:
+            days = {d: set(ts) for d, ts in self.booked.get(doctor_id, {}).items() if d >= today.isoformat()}
+            fee = self.fees.get(doctor_id)
+        load = sum(len(ts) for ts in days.values())
+        nxt = self.grid.next_free(doctor_id, lambda day, t: t in days.get(day, ()), now, self.horizon_days)
+        return {"next_open": nxt, "upcoming_load": load, "fee": fee}
+
+    def rank(self, doctors, db=None, page=1, page_size=20):
+        if not self.loaded:
+            own = db is None; db = db or SessionLocal()
+            try: self.rebuild(db)
+            finally:
+                if own: db.close()
+        now = datetime.now()
+        rows = [{**d, **self.signals(d["id"], now)} for d in doctors]
+        # soonest availability first, then the lighter schedule, then the lower fee
+        rows.sort(key=lambda r: (r["next_open"] is None, r["next_open"] or "", r["upcoming_load"], r["fee"] if r["fee"] is not None else float("inf"), r["id"]))
+        start = max(0, (page - 1) * page_size)
+        return rows[start:start + page_size], len(rows)
@@ -3,7 +3,7 @@ import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from streamlit_autorefresh import st_autorefresh
 
 API_URL = "http://127.0.0.1:8000"
@@ -21,20 +21,17 @@ def get_sess():
     s=requests.Session(); r=Retry(total=3, backoff_factor=0.2, status_forcelist=[500]); s.mount('http://', HTTPAdapter(max_retries=r)); return s
 http=get_sess()
 
-def get_slots(dt_str):
-    s=[]; t=datetime.strptime("09:00","%H:%M"); e=datetime.strptime("17:00","%H:%M")
-    sel_dt = datetime.strptime(dt_str, "%Y-%m-%d").date()
-    now = datetime.now()
-    while t<e:
-        tm_str = t.strftime("%H:%M")
-        is_past = False
-        # Calculate if past
-        slot_dt = datetime.combine(sel_dt, t.time())
-        if slot_dt < now: is_past = True
-        
-        s.append({"time": tm_str, "is_past": is_past})
-        t+=timedelta(minutes=30)
-    return s
+def get_pages(url, params, pages):
+    # Follows next_cursor for up to `pages` pages -> (items, cursor of the next page or None)
+    items, cur = [], None
+    for _ in range(pages):
+        r=http.get(url,params={**params,**({"cursor":cur} if cur else {})}).json(); items+=r['items']; cur=r.get('next_cursor')
+        if not cur: break
+    return items, cur
+
+def get_slots(did, dt_str):
+    # The doctor's slot grid for the day (from their working-hour template), with occupancy
+    return http.get(f"{API_URL}/calendar/grid",params={"doctor_id":did,"date":dt_str}).json()
 
 # CSS
 st.markdown("""<style>
@@ -62,6 +59,7 @@ if not st.session_state.user:
                 try:
                     rs=http.post(f"{API_URL}/auth/login", json={"role":r,"email":e,"password":p})
                     if rs.status_code==200: st.session_state.user=rs.json(); st.rerun()
+                    elif rs.status_code==429: st.error(f"Too many attempts, try again in {rs.headers.get('Retry-After','a few')}s")
                     else: st.error("Invalid")
                 except: st.error("Connection Failed")
     with t2:
@@ -81,6 +79,7 @@ if not st.session_state.user:
 else:
     st_autorefresh(interval=5000)
     user=st.session_state.user
+    if user.get('token'): http.headers["X-User-Token"]=user['token']
     with st.sidebar:
         st.header(user['role']); st.info(user['name'])
         if st.button("Logout"): logout()
@@ -95,9 +94,9 @@ else:
                  if st.session_state.pat_search:
                      r=st.session_state.pat_search; st.success(r['specialty']); dm={d['name']:d['id'] for d in r['doctors']}; sd=st.selectbox("Doc", list(dm.keys()))
                      if sd:
-                         did=dm[sd]; dt=st.date_input("Dt",datetime.today()).strftime("%Y-%m-%d"); sl=http.get(f"{API_URL}/calendar/slots",params={"doctor_id":did,"date":dt}).json(); c=st.columns(4)
-                         for i, ob in enumerate(get_slots(dt)):
-                             t=ob['time']; inf=sl.get(t)
+                         did=dm[sd]; dt=st.date_input("Dt",datetime.today()).strftime("%Y-%m-%d"); c=st.columns(4)
+                         for i, ob in enumerate(get_slots(did, dt)):
+                             t=ob['time']; inf=ob if ob['status'] else None
                              with c[i%4]:
                                  if ob['is_past']: st.markdown(f"<div class='slot-card status-past'>{t}<br>Past</div>",unsafe_allow_html=True)
                                  elif not inf:
@@ -111,8 +110,9 @@ else:
         with t2:
              # Get all my history
              try:
-                 rp=http.post(f"{API_URL}/reports/advanced",json={"start_date":"2020-01-01","patient_name":user['name']}).json()
-                 act=[x for x in rp if x['Status'] in ['PENDING','CONFIRMED']]; hst=[x for x in rp if x['Status']=='COMPLETED']
+                 pa=f"{API_URL}/patients/{user['id']}/appointments"
+                 act,_=get_pages(pa,{"status":"PENDING,CONFIRMED","order":"asc","limit":100},20)
+                 hst,more=get_pages(pa,{"status":"COMPLETED","limit":20},st.session_state.get('hst_pages',1))
                  
                  st.write("##### Active")
                  if act:
@@ -134,6 +134,7 @@ else:
                      for idx,r in df.iterrows():
                          if st.button(f"🧾 Receipt {r['Date']}",key=f"pd{idx}"):
                              b=http.get(f"{API_URL}/appointment/{r['ID']}/pdf").content; st.download_button("Save PDF",b,f"R.pdf","application/pdf")
+                 if more and st.button("Load more", key="hst_more"): st.session_state['hst_pages']=st.session_state.get('hst_pages',1)+1; st.rerun()
              except:pass
         
         with t3:
@@ -148,8 +149,19 @@ else:
                 n=st.text_input("Nm",user['name']); f=st.number_input("Fee",float(user.get('fee',100))); w=st.text_input("PW",type="password")
                 if st.form_submit_button("Upd"): http.put(f"{API_URL}/auth/update_profile",json={"role":"Doctor","user_id":user['id'],"name":n,"email":user['email'],"fee":f,"password":w}); logout()
         with t1:
-            dt=st.date_input("Date",datetime.today()).strftime("%Y-%m-%d"); sl=http.get(f"{API_URL}/calendar/slots",params={"doctor_id":user['id'],"date":dt}).json(); c=st.columns(4)
-            for i,ob in enumerate(get_slots(dt)):
+            dt=st.date_input("Date",datetime.today()).strftime("%Y-%m-%d"); ds=http.get(f"{API_URL}/doctor/{user['id']}/daysheet",params={"date":dt}).json()
+            sl={x['time']:{**x,"symptom":x['symptoms']} for x in ds['appointments']}; c=st.columns(4)
+            with st.expander("Block / unblock a range"):
+                rg=st.date_input("Days",(datetime.today(),datetime.today()),key="rg"); rc=st.columns(2)
+                ra=rc[0].text_input("From","00:00",key="ra"); rb=rc[1].text_input("To","24:00",key="rb")
+                if len(rg)==2:
+                    pl={"doctor_id":user['id'],"start_date":str(rg[0]),"end_date":str(rg[1]),"start_time":ra,"end_time":rb}
+                    if rc[0].button("Block range"):
+                        res=http.post(f"{API_URL}/calendar/block_range",json=pl)
+                        if res.status_code==200: st.success(f"Blocked {res.json()['blocked']} slots"); st.rerun()
+                        else: st.error(str(res.json()['detail']))
+                    if rc[1].button("Unblock range"): res=http.post(f"{API_URL}/calendar/unblock_range",json=pl); st.success(f"Unblocked {res.json()['unblocked']} slots"); st.rerun()
+            for i,ob in enumerate(get_slots(user['id'], dt)):
                 t=ob['time']; inf=sl.get(t)
                 with c[i%4]:
                     if ob['is_past']: st.markdown(f"<div class='slot-card status-blocked'>{t}<br>Past</div>",unsafe_allow_html=True)
@@ -165,6 +177,9 @@ else:
                     elif inf['status']=='CONFIRMED':
                         st.markdown(f"<div class='slot-card status-confirmed'>{t}<br>Pat</div>",unsafe_allow_html=True)
                         with st.popover("Consult"):
+                            pv=inf['previous_visits']; st.caption(f"{inf['patient_name']} ({inf['age']}) · {pv['count']} previous visits"); st.write(inf['symptom'])
+                            for v in pv['recent']: st.caption(f"{v['date']} Dr. {v['doctor']}: {v['diagnosis']}")
+                            for k in inf['kb_matches']: st.info(f"{k['diagnosis']} ({k['score']}%) · {k['medication']}")
                             with st.form(f"f{t}"):
                                 d=st.text_input("Diag"); n=st.text_area("Notes"); m=st.text_area("Rx Meds"); f=st.number_input("Fee",value=user.get('fee',100.0))
                                 if st.form_submit_button("Finish"): http.post(f"{API_URL}/doctor/consult",json={"appt_id":inf['id'],"diagnosis":d,"notes":n,"medications":m,"charges":f}); st.rerun()
@@ -180,7 +195,10 @@ else:
 
         with t2:
              q=st.text_input("Query History"); 
-             if st.button("Search"): st.session_state.doc_ai_res=http.post(f"{API_URL}/knowledge/query",json={"description":q}).json()
+             if st.button("Search"):
+                 r=http.post(f"{API_URL}/knowledge/query",json={"description":q})
+                 if r.status_code==429: st.warning(f"Too many searches, try again in {r.headers.get('Retry-After','a few')}s")
+                 else: st.session_state.doc_ai_res=r.json()
              if st.button("Clr"): st.session_state.doc_ai_res=None; st.rerun()
              if st.session_state.doc_ai_res:
                  for x in st.session_state.doc_ai_res: st.info(f"{x['diagnosis']} | Rx: {x['medication']}")
@@ -194,12 +212,17 @@ else:
              did=next((x['id'] for x in alld if x['name']==sd),None) if sd!="All" else None
              sid=next((x['id'] for x in alls if x['name']==ss),None) if ss!="All" else None
              if st.button("Gen"):
-                 st.session_state.admin_report_data = http.post(f"{API_URL}/reports/advanced",json={"start_date":str(d1) if d1 else None,"end_date":str(d2) if d2 else None,"doctor_id":did,"specialty_id":sid}).json()
+                 r=http.post(f"{API_URL}/reports/advanced",json={"start_date":str(d1) if d1 else None,"end_date":str(d2) if d2 else None,"doctor_id":did,"specialty_id":sid})
+                 if r.status_code==429: st.warning(f"Reports are busy, try again in {r.headers.get('Retry-After','a few')}s")
+                 else: st.session_state.admin_report_data = r.json(); st.session_state.admin_report_asof = r.headers.get("X-Snapshot-Taken-At")
              if st.session_state.admin_report_data:
+                 if st.session_state.get("admin_report_asof"): st.caption(f"Data as of {st.session_state.admin_report_asof}")
                  df=pd.DataFrame(st.session_state.admin_report_data); st.dataframe(df, use_container_width=True); st.download_button("CSV",df.to_csv().encode(),"r.csv")
         with a2:
              rl=st.radio("Role",["Patient","Doctor","Admin"],horizontal=True)
-             us=http.get(f"{API_URL}/users/all",params={"role":rl}).json()
+             uq=st.text_input("Search name, email or phone",key="uq")
+             us=http.get(f"{API_URL}/users/search",params={"q":uq,"role":rl,"limit":50}).json()['items'] if uq.strip() else []
+             if uq.strip() and not us: st.caption("No matches.")
              if us: 
                  st.dataframe(pd.DataFrame(us))
                  n_l=[f"{u['name']} (ID:{u['id']})" for u in us]
@@ -0,0 +1,30 @@
+from database import Appointment, KnowledgeOutbox
+from config import get_config
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_, update
+
+def expire_stale_pending(db, schedule=None):
+    now = datetime.now(); today = now.strftime("%Y-%m-%d")
+    gone = db.execute(update(Appointment).where(Appointment.status=="PENDING", or_(
+        Appointment.appt_date < today,
+        and_(Appointment.appt_date == today, Appointment.appt_time < now.strftime("%H:%M")),
+    )).values(status="EXPIRED", cancellation_reason="Not confirmed before slot time")
+      .returning(Appointment.doctor_id, Appointment.appt_date)).all()
+    # in the same transaction, so every worker's calendar and ranking signals pick the days up
+    days = {}
+    for d, day in gone: days.setdefault(d, set()).add(day)
+    for d, ds in days.items():
+        if schedule: schedule.changed(db, d, *ds, origin="job")
+    return len(gone)
+
+def purge_outbox(db, keep_days=1):
+    cutoff = (datetime.now() - timedelta(days=keep_days)).isoformat()
+    return db.query(KnowledgeOutbox).filter(KnowledgeOutbox.status=="DONE", KnowledgeOutbox.processed_at < cutoff).delete(synchronize_session=False)
+
+def receipt_cutoff():
+    days = get_config().get("receipt_download_days")
+    return (datetime.now() - timedelta(days=int(days))).strftime("%Y-%m-%d") if days else None
+
+def receipt_downloadable(date_str):
+    cutoff = receipt_cutoff()
+    return cutoff is None or not date_str or date_str[:10] >= cutoff
@@ -0,0 +1,73 @@
+from database import SessionLocal, KnowledgeEntry, KnowledgeOutbox
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from metrics import ERRORS
+import threading, logging
+
+log = logging.getLogger(__name__)
+
+# Outbox worker: /doctor/consult only writes a KnowledgeOutbox row in its own
+# transaction; indexing happens here, off the request path.
+class IngestionQueue:
+    def __init__(self, knowledge_sys, session_factory=SessionLocal, poll_interval=2.0, batch_size=50, max_attempts=5, prewarm=True, versions=None):
+        self.knowledge_sys = knowledge_sys; self.session_factory = session_factory
+        self.poll_interval = poll_interval; self.batch_size = batch_size; self.max_attempts = max_attempts
+        self.wake = threading.Event(); self.stopping = threading.Event(); self.thread = None
+        self.prewarm = prewarm; self.versions = versions
+        self.processed = 0; self.failures = 0; self.last_lag = 0.0
+
+    def start(self):
+        if self.thread and self.thread.is_alive(): return
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self._run, name="kb-ingest", daemon=True); self.thread.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set(); self.wake.set()
+        if self.thread: self.thread.join(timeout)
+
+    def notify(self): self.wake.set()
+
+    def _run(self):
+        if self.prewarm:
+            db = self.session_factory()
+            try: self.knowledge_sys.rebuild(db)
+            except Exception: log.exception("Knowledge index build failed"); ERRORS.inc(component="kb_ingest")
+            finally: db.close()
+        while not self.stopping.is_set():
+            try: n = self.drain()
+            except Exception: log.exception("Knowledge ingestion failed"); ERRORS.inc(component="kb_ingest"); n = 0
+            if n < self.batch_size:
+                self.wake.wait(self.poll_interval); self.wake.clear()
+
+    def drain(self):
+        db = self.session_factory()
+        try:
+            now = datetime.now()
+            items = db.query(KnowledgeOutbox).filter(KnowledgeOutbox.status=="PENDING", KnowledgeOutbox.next_attempt_at<=now.isoformat())\
+                .order_by(KnowledgeOutbox.id).limit(self.batch_size).all()
+            if not items: return 0
+            entries = db.query(KnowledgeEntry).filter(KnowledgeEntry.id.in_([i.entry_id for i in items])).all()
+            try:
+                if not self.knowledge_sys.loaded: self.knowledge_sys.rebuild(db)
+                self.knowledge_sys.add_entries(entries)
+                for i in items: i.status = "DONE"; i.processed_at = now.isoformat()
+                # other workers catch their own index up when they see the new version
+                if self.versions: self.versions.bump(db, "knowledge")
+                self.processed += len(items)
+                self.last_lag = (now - datetime.fromisoformat(min(i.created_at for i in items))).total_seconds()
+            except Exception as e:
+                log.warning("Indexing %d outbox items failed: %s", len(items), e); ERRORS.inc(component="kb_ingest")
+                self.failures += 1
+                for i in items:
+                    i.attempts += 1; i.last_error = str(e)[:500]
+                    i.next_attempt_at = (now + timedelta(seconds=2 ** i.attempts)).isoformat()
+                    if i.attempts >= self.max_attempts: i.status = "FAILED"
+            db.commit(); return len(items)
+        finally: db.close()
+
+    def stats(self, db):
+        depth, oldest = db.query(func.count(KnowledgeOutbox.id), func.min(KnowledgeOutbox.created_at)).filter(KnowledgeOutbox.status=="PENDING").one()
+        failed = db.query(func.count(KnowledgeOutbox.id)).filter(KnowledgeOutbox.status=="FAILED").scalar()
+        lag = (datetime.now() - datetime.fromisoformat(oldest)).total_seconds() if oldest else 0.0
+        return {"depth": depth, "lag_seconds": round(lag, 3), "failed": failed, "processed": self.processed,
+                "failures": self.failures, "last_batch_lag_seconds": round(self.last_lag, 3)}
@@ -1,31 +1,209 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 from database import KnowledgeEntry
+from metrics import timed, counter, ERRORS
+from sqlalchemy import text
+from collections import OrderedDict
+import threading, logging, re, time
 
-class MedicalKnowledgeSystem:
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer(stop_words='english')
+log = logging.getLogger(__name__)
+KB_QUERY_CACHE = counter("medmatch_knowledge_cache_total", "Knowledge search query cache lookups", ("result",))
+
+def entry_text(e):
+    return f"{e.symptom_text} {e.diagnosis} {e.medication_plan or ''}"
+
+def normalize_query(q):
+    # Case and spacing do not change the ranking of either engine
+    return " ".join((q or "").lower().split())
+
+# Ranked (entry id, score) lists per normalized query, tagged with the "knowledge"
+# cache version they were computed under. /doctor/consult and the ingestion worker
+# bump that version, so an answer is dropped as soon as the knowledge base changes
+# (other workers see the bump on their next poll); the TTL bounds anything else.
+class QueryCache:
+    def __init__(self, versions, max_entries=1000, ttl=600):
+        self.versions = versions; self.max_entries = max_entries; self.ttl = ttl
+        self.entries = OrderedDict(); self.lock = threading.Lock()
+        self.hits = 0; self.misses = 0; self.stale = 0
+
+    def get_many(self, queries, limit, rank):
+        # rank(queries) -> hit lists; only called for the queries not answered from cache
+        version = self.versions.get("knowledge") if self.versions else None
+        now = time.monotonic(); out, missing = {}, []
+        with self.lock:
+            for i, q in enumerate(queries):
+                key = (normalize_query(q), limit); e = self.entries.get(key)
+                if e and e[0] == version and e[1] > now: out[i] = e[2]; self.entries.move_to_end(key); self.hits += 1; continue
+                if e: del self.entries[key]; self.stale += 1
+                missing.append(i); self.misses += 1
+        KB_QUERY_CACHE.inc(len(out), result="hit"); KB_QUERY_CACHE.inc(len(missing), result="miss")
+        if missing:
+            found = rank([queries[i] for i in missing])
+            with self.lock:
+                for i, h in zip(missing, found):
+                    out[i] = h; self.entries[(normalize_query(queries[i]), limit)] = (version, now + self.ttl, h)
+                while len(self.entries) > self.max_entries: self.entries.popitem(last=False)
+        return [out[i] for i in range(len(queries))]
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {"entries": len(self.entries), "max_entries": self.max_entries, "ttl": self.ttl, "hits": self.hits, "misses": self.misses,
+                    "stale": self.stale, "hit_ratio": round(self.hits / total, 4) if total else 0.0}
+
+class KnowledgeSearch:
+    # Engines implement rank_many(queries, db, limit) -> [[(entry id, score 0-1)]]
+    cache = None
 
+    @timed("search_similar_cases")
     def search_similar_cases(self, query, db, limit=3):
+        return self.search_many([query], db, limit)[0]
+
+    @timed("search_similar_cases_batch")
+    def search_many(self, queries, db, limit=3):
+        # Matching entries for every query are fetched with one query; results come back in order
         try:
-            entries = db.query(KnowledgeEntry).all()
-            # CRITICAL FIX: Return empty if no history exists (prevents crash)
-            if not entries or len(entries) == 0: 
-                return []
-
-            corpus = [f"{e.symptom_text} {e.diagnosis} {e.medication_plan or ''}" for e in entries]
-            
-            # Fit vectorizer with at least the query and one doc
-            tfidf_matrix = self.vectorizer.fit_transform(corpus + [query])
-            
-            # Compare query (last item) against all docs (previous items)
-            cosine_sim = cosine_similarity(tfidf_matrix[-1], tfidf_matrix[:-1])
-            
-            sim_scores = sorted(list(enumerate(cosine_sim[0])), key=lambda x: x[1], reverse=True)[:limit]
-            
-            # Only return matches with some relevance
-            results = [{"score": round(score*100, 1), "data": entries[i]} for i, score in sim_scores if score > 0.05]
-            return results
-        except Exception as e:
-            print(f"RAG Error: {e}")
-            return []
\ No newline at end of file
+            if self.cache: hits = self.cache.get_many(queries, limit, lambda qs: self.rank_many(qs, db, limit))
+            else: hits = self.rank_many(queries, db, limit)
+            want = {i for h in hits for i, _ in h}
+            rows = {e.id: e for e in db.query(KnowledgeEntry).filter(KnowledgeEntry.id.in_(want))} if want else {}
+            return [[{"score": round(score*100, 1), "data": rows[i]} for i, score in h if i in rows] for h in hits]
+        except Exception:
+            log.exception("Knowledge search failed"); ERRORS.inc(component="knowledge_search")
+            return [[] for _ in queries]
+
+class MedicalKnowledgeSystem(KnowledgeSearch):
+    # The TF-IDF index is built once and then extended by the ingestion queue,
+    # so a search only transforms the query instead of refitting the corpus.
+    # New entries are transformed with the fitted vocabulary and appended; the
+    # vocabulary and IDF weights are refit at most once per refit_seconds unless
+    # refit_every entries were appended since, and in full by the nightly rebuild.
+    # scikit-learn is imported on first build to keep worker start-up fast.
+    def __init__(self, refit_every=500, refit_seconds=300):
+        self.lock = threading.Lock()
+        self.ids = []; self.corpus = []
+        self.vectorizer = None; self.matrix = None
+        self.loaded = False
+        self.refit_every = refit_every; self.refit_seconds = refit_seconds
+        self.appended = 0; self.fitted_at = 0.0; self.refits = 0
+
+    def _fit(self, ids, corpus):
+        vec, mat = None, None
+        if corpus:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            try:
+                vec = TfidfVectorizer(stop_words='english'); mat = vec.fit_transform(corpus)
+            except ValueError: vec, mat = None, None  # empty vocabulary (stop words only)
+        with self.lock:
+            self.ids, self.corpus, self.vectorizer, self.matrix = ids, corpus, vec, mat
+            self.loaded = True; self.appended = 0; self.fitted_at = time.monotonic(); self.refits += 1
+
+    def rebuild(self, db):
+        entries = db.query(KnowledgeEntry).order_by(KnowledgeEntry.id).all()
+        self._fit([e.id for e in entries], [entry_text(e) for e in entries])
+
+    def add_entries(self, entries):
+        while True:
+            with self.lock: ids, corpus, vec, mat, appended = self.ids, self.corpus, self.vectorizer, self.matrix, self.appended
+            known = set(ids); new = [e for e in entries if e.id not in known]
+            if not new: return 0
+            new_ids = [e.id for e in new]; texts = [entry_text(e) for e in new]
+            if vec is None or appended + len(new) >= self.refit_every or time.monotonic() - self.fitted_at >= self.refit_seconds:
+                self._fit(ids + new_ids, corpus + texts)
+                return len(new)
+            from scipy.sparse import vstack
+            rows = vec.transform(texts)
+            with self.lock:
+                # the index may have been refit or extended meanwhile; then start over
+                if self.ids is ids:
+                    self.ids = ids + new_ids; self.corpus = corpus + texts
+                    self.matrix = vstack([mat, rows], format="csr"); self.appended += len(new)
+                    return len(new)
+
+    def catch_up(self, db):
+        # Pick up entries indexed by another worker (fired on a "knowledge" version change)
+        if not self.loaded: return 0
+        with self.lock: known = set(self.ids)
+        missing = [i for (i,) in db.query(KnowledgeEntry.id) if i not in known]
+        if not missing: return 0
+        return self.add_entries(db.query(KnowledgeEntry).filter(KnowledgeEntry.id.in_(missing)).order_by(KnowledgeEntry.id).all())
+
+    def rank_many(self, queries, db, limit=3):
+        # All queries are scored with one sparse product against the index
+        if not self.loaded: self.rebuild(db)
+        with self.lock: ids, vec, mat = self.ids, self.vectorizer, self.matrix
+        # Return empty if no history exists (prevents crash)
+        if vec is None or not queries: return [[] for _ in queries]
+
+        import numpy as np
+        # TF-IDF rows are L2 normalised, so the dot product is the cosine similarity
+        sims = (vec.transform(queries) @ mat.T).toarray()
+        k = min(limit, sims.shape[1])
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k] if k < sims.shape[1] else np.tile(np.arange(sims.shape[1]), (len(queries), 1))
+
+        # Only return matches with some relevance
+        hits = []
+        for row, cand in zip(sims, top):
+            best = sorted(cand, key=lambda i: (-row[i], i))
+            hits.append([(ids[i], float(row[i])) for i in best if row[i] > 0.05])
+        return hits
+
+# Same interface, but search runs inside SQLite against an FTS5 index that triggers
+# keep in step with knowledge_base, so there is no per-process vector state to build,
+# extend or catch up. Enabled with "knowledge_engine": "fts5" (then run python database.py).
+FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS knowledge_fts USING fts5(symptom_text, diagnosis, medication_plan, "
+    "content='knowledge_base', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS knowledge_fts_ins AFTER INSERT ON knowledge_base BEGIN "
+    "INSERT INTO knowledge_fts(rowid, symptom_text, diagnosis, medication_plan) VALUES (new.id, new.symptom_text, new.diagnosis, new.medication_plan); END",
+    "CREATE TRIGGER IF NOT EXISTS knowledge_fts_del AFTER DELETE ON knowledge_base BEGIN "
+    "INSERT INTO knowledge_fts(knowledge_fts, rowid, symptom_text, diagnosis, medication_plan) VALUES ('delete', old.id, old.symptom_text, old.diagnosis, old.medication_plan); END",
+    "CREATE TRIGGER IF NOT EXISTS knowledge_fts_upd AFTER UPDATE OF symptom_text, diagnosis, medication_plan ON knowledge_base BEGIN "
+    "INSERT INTO knowledge_fts(knowledge_fts, rowid, symptom_text, diagnosis, medication_plan) VALUES ('delete', old.id, old.symptom_text, old.diagnosis, old.medication_plan); "
+    "INSERT INTO knowledge_fts(rowid, symptom_text, diagnosis, medication_plan) VALUES (new.id, new.symptom_text, new.diagnosis, new.medication_plan); END",
+]
+# bm25 column weights (symptom_text, diagnosis, medication_plan); queries are symptom descriptions
+BM25 = "bm25(knowledge_fts, 2.0, 1.0, 0.5)"
+# BM25 is unbounded, so scores are squashed to 0-100 as s / (s + BM25_HALF)
+BM25_HALF = 5.0
+
+def install_fts(engine, enabled=True):
+    # Only kept while "knowledge_engine" is fts5, so TF-IDF deployments pay no trigger
+    # work on knowledge_base writes; turning it back on rebuilds the index from scratch
+    with engine.begin() as c:
+        if not enabled:
+            for t in ("knowledge_fts_ins", "knowledge_fts_del", "knowledge_fts_upd"): c.execute(text(f"DROP TRIGGER IF EXISTS {t}"))
+            c.execute(text("DROP TABLE IF EXISTS knowledge_fts")); return
+        fresh = not c.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'knowledge_fts'")).first()
+        for s in FTS_DDL: c.execute(text(s))
+        if fresh: c.execute(text("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('rebuild')"))
+
+class FTSKnowledgeSystem(KnowledgeSearch):
+    def __init__(self):
+        self.loaded = True; self.stop_words = None
+
+    def rebuild(self, db):
+        # Nightly: merge the index segments written by single-row inserts
+        db.execute(text("INSERT INTO knowledge_fts(knowledge_fts) VALUES ('optimize')")); db.commit()
+
+    def add_entries(self, entries): return len(entries)  # indexed by trigger in the consult transaction
+    def catch_up(self, db): return 0
+
+    def match_expr(self, query):
+        if self.stop_words is None:
+            from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+            self.stop_words = ENGLISH_STOP_WORDS
+        words = {w for w in re.findall(r"\w\w+", (query or "").lower()) if w not in self.stop_words}
+        return " OR ".join(f'"{w}"' for w in sorted(words))
+
+    def rank_many(self, queries, db, limit=3):
+        sql = text(f"SELECT rowid, -{BM25} FROM knowledge_fts WHERE knowledge_fts MATCH :q ORDER BY {BM25}, rowid LIMIT :k")
+        hits = []
+        for q in queries:
+            expr = self.match_expr(q)
+            rows = db.execute(sql, {"q": expr, "k": limit}).all() if expr else []
+            hits.append([(i, s / (s + BM25_HALF)) for i, s in rows if s / (s + BM25_HALF) > 0.05])
+        return hits
+
+def knowledge_system(kind, cache=None, refit_every=500, refit_seconds=300):
+    ks = FTSKnowledgeSystem() if kind == "fts5" else MedicalKnowledgeSystem(refit_every, refit_seconds)
+    ks.cache = cache
+    return ks
@@ -1,17 +1,162 @@
 from database import Symptom
+from metrics import timed
+from cache_sync import VersionedCache
+import os, re, threading, logging
+
+log = logging.getLogger(__name__)
+
+# Lay terms patients type -> words the symptom vocabulary is written in
+SYNONYMS = {
+    "heartburn": "acid reflux", "tummy": "stomach", "belly": "stomach", "abdominal": "stomach", "abdomen": "stomach",
+    "puke": "nausea", "vomit": "nausea", "vomiting": "nausea", "throwing": "nausea", "queasy": "nausea",
+    "migraines": "migraine", "dizzy": "dizziness", "lightheaded": "dizziness", "breathlessness": "breathless",
+    "wheeze": "wheezing", "itchy": "itch", "itching": "itch", "pimples": "acne", "spots": "acne",
+    "hbp": "blood pressure", "hypertension": "blood pressure", "palpitations": "palpitation", "runs": "diarrhea",
+}
+WORD = re.compile(r"[a-z]+")
+SUFFIXES = (("ies", "y"), ("ing", ""), ("es", ""), ("ed", ""), ("s", ""))
+
+def stem(w):
+    if len(w) > 4:
+        for suf, rep in SUFFIXES:
+            if w.endswith(suf): return w[:-len(suf)] + rep
+    return w
+
+def normalize(text, synonyms):
+    out = []
+    for w in WORD.findall((text or "").lower()): out += synonyms.get(w, w).split()
+    return [stem(w) for w in out]
+
+class FuzzyMatcher:
+    # Every query token votes for at most one keyword. A keyword spelled out in the query
+    # (after stemming and synonyms, spanning up to 3 words) always wins the tokens it
+    # covers; tokens left over vote for their closest keyword with the same number of words,
+    # by hashed character 2-3-gram cosine, if that clears the threshold. Keywords under
+    # MIN_FUZZY_LEN letters are exact-only ("year" is not "ear") and those under SHORT_LEN
+    # need short_threshold. A specialty scores the sum of its voted keywords' weights: 1
+    # for exact hits, the similarity for fuzzy ones.
+    MIN_FUZZY_LEN = 4
+    SHORT_LEN = 5
+
+    def __init__(self, pairs, synonyms=None, threshold=0.6, short_threshold=0.75):
+        import numpy as np
+        from sklearn.feature_extraction.text import HashingVectorizer
+        self.synonyms = {**SYNONYMS, **(synonyms or {})}; self.threshold = threshold; self.short_threshold = max(threshold, short_threshold)
+        pairs = [(" ".join(normalize(k, {})), s) for k, s in pairs]
+        pairs = [(k, s) for k, s in pairs if k and s is not None]
+        self.specs = sorted({s for _, s in pairs})
+        self.keywords = [k for k, _ in pairs]; self.kw_spec = [s for _, s in pairs]
+        self.exact = {}
+        for i, k in enumerate(self.keywords): self.exact.setdefault(k, []).append(i)
+        self.max_words = min(3, max((len(k.split()) for k in self.keywords), default=1))
+        # hashed, so a query keeps all of its n-grams, not just those some keyword happens to share
+        self.vec = HashingVectorizer(analyzer="char_wb", ngram_range=(2, 3), n_features=2**18, alternate_sign=False, dtype=np.float32)
+        # fuzzy candidates per word count: an n-word query gram is only compared with n-word keywords
+        self.fuzzy = {}
+        for n in range(1, self.max_words + 1):
+            idx = np.array([i for i, k in enumerate(self.keywords) if len(k.split()) == n and len(k) >= self.MIN_FUZZY_LEN], dtype=np.int64)
+            if len(idx): self.fuzzy[n] = (idx, self.vec.transform([self.keywords[i] for i in idx]).T.tocsr())
+
+    def spans(self, text):
+        # -> [(start, end, "word n-gram")] for every 1..max_words window of the normalized query
+        toks = normalize(text, self.synonyms)
+        return len(toks), [(i, i + n, " ".join(toks[i:i + n])) for n in range(1, self.max_words + 1) for i in range(len(toks) - n + 1)]
+
+    def fuzzy_best(self, grams):
+        # -> (keyword index or -1, similarity) of the closest fuzzy-eligible keyword per n-gram
+        import numpy as np
+        best = np.full(len(grams), -1, dtype=np.int64); sim = np.zeros(len(grams), dtype=np.float32)
+        for n, (idx, K) in self.fuzzy.items():
+            todo = [j for j, g in enumerate(grams) if g.count(" ") == n - 1 and len(g) >= self.MIN_FUZZY_LEN - 1]
+            if not todo: continue
+            S = (self.vec.transform([grams[j] for j in todo]) @ K).tocsr()
+            best[todo] = idx[np.asarray(S.argmax(axis=1)).ravel()]; sim[todo] = S.max(axis=1).toarray().ravel()
+        return best, sim
+
+    def vote(self, n_tokens, spans, best, sim):
+        votes = {}; claimed = [False] * n_tokens
+        # exact hits first, longest n-gram first
+        for a, b, g in sorted(spans, key=lambda s: s[0] - s[1]):
+            if g in self.exact and not any(claimed[a:b]):
+                for k in self.exact[g]: votes[k] = 1.0
+                claimed[a:b] = [True] * (b - a)
+        for t in range(n_tokens):
+            if claimed[t]: continue
+            # the token's single best fuzzy keyword over the n-grams covering it
+            cand = [(sim[j], best[j]) for j, (a, b, _) in enumerate(spans) if a <= t < b and best[j] >= 0 and not any(claimed[a:b])]
+            if not cand: continue
+            s, k = max(cand)
+            if s >= (self.threshold if len(self.keywords[k]) >= self.SHORT_LEN else self.short_threshold):
+                for kk in self.exact[self.keywords[k]]: votes[kk] = max(votes.get(kk, 0.0), float(s))
+        scores = {}
+        for k, w in votes.items(): scores[self.kw_spec[k]] = scores.get(self.kw_spec[k], 0.0) + w
+        return scores
+
+    def scores(self, text):
+        return self.scores_many([text])[0]
+
+    def scores_many(self, texts):
+        # one sparse product for all n-grams of all texts
+        parsed = [self.spans(t) for t in texts]
+        flat = [g for _, sp in parsed for _, _, g in sp]
+        best, sim = self.fuzzy_best(flat); res = []; row = 0
+        for n, sp in parsed:
+            res.append(self.vote(n, sp, best[row:row + len(sp)], sim[row:row + len(sp)])); row += len(sp)
+        return res
 
 class SymptomRouter:
+    def __init__(self, versions=None, model_path=None, min_confidence=0.5, synonyms=None, fuzzy_threshold=0.6):
+        # Fuzzy keyword matcher, rebuilt only when the symptoms version moves
+        self.symptoms = VersionedCache(versions, "symptoms", lambda db: FuzzyMatcher(
+            [(s.keyword, s.specialty_id) for s in db.query(Symptom).all()], synonyms, fuzzy_threshold))
+        self.model_path = model_path; self.min_confidence = min_confidence
+        self._model = None; self._model_checked = False; self.lock = threading.Lock()
+
+    def model(self):
+        # The trained classifier is loaded once (lazily) and swapped on a "classifier" version bump
+        if not self._model_checked:
+            with self.lock:
+                if not self._model_checked:
+                    if self.model_path and os.path.exists(self.model_path):
+                        from specialty_classifier import SpecialtyClassifier
+                        try: self._model = SpecialtyClassifier.load(self.model_path)
+                        except Exception: log.exception("Could not load specialty model %s", self.model_path)
+                    self._model_checked = True
+        return self._model
+
+    def reload_model(self, db=None):
+        with self.lock: self._model = None; self._model_checked = False
+
+    def keyword_scores(self, user_input, db_session):
+        return self.symptoms.get(db_session).scores(user_input)
+
+    @timed("predict_specialty")
+    def classify(self, user_input, db_session):
+        # -> (specialty_id or None, confidence 0..1, "model" | "keywords")
+        m = self.model()
+        if m is not None:
+            sid, conf = m.predict(user_input)
+            if sid is not None and conf >= self.min_confidence: return sid, round(conf, 4), "model"
+        scores = self.keyword_scores(user_input, db_session)
+        if not scores: return None, 0.0, "keywords"
+        sid = max(scores, key=scores.get)
+        return sid, round(scores[sid] / sum(scores.values()), 4), "keywords"
+
+    @timed("predict_specialty_batch")
+    def classify_many(self, texts, db_session):
+        # Same decision as classify() for every text, but the model and the fuzzy
+        # matcher each score the whole batch in a single matrix product
+        m = self.model(); out = [None] * len(texts)
+        if m is not None:
+            for k, (sid, conf) in enumerate(m.predict_many(texts)):
+                if sid is not None and conf >= self.min_confidence: out[k] = (sid, round(conf, 4), "model")
+        rest = [k for k, r in enumerate(out) if r is None]
+        if rest:
+            for k, scores in zip(rest, self.symptoms.get(db_session).scores_many([texts[k] for k in rest])):
+                if not scores: out[k] = (None, 0.0, "keywords"); continue
+                sid = max(scores, key=scores.get)
+                out[k] = (sid, round(scores[sid] / sum(scores.values()), 4), "keywords")
+        return out
+
     def predict_specialty(self, user_input, db_session):
-        user_input = user_input.lower()
-        all_symptoms = db_session.query(Symptom).all()
-        scores = {}
-        
-        for sym in all_symptoms:
-            # Loose string matching
-            if sym.keyword.lower() in user_input:
-                if sym.specialty_id not in scores: 
-                    scores[sym.specialty_id] = 0
-                scores[sym.specialty_id] += 1
-        
-        if not scores: return None
-        return max(scores, key=scores.get)
\ No newline at end of file
+        return self.classify(user_input, db_session)[0]
@@ -1,26 +1,133 @@
-from fastapi import FastAPI, Depends, HTTPException, Response
+from fastapi import FastAPI, Depends, HTTPException, Response, Header
+from fastapi.responses import PlainTextResponse, FileResponse, JSONResponse, ORJSONResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
 import database
-from database import Doctor, Patient, Appointment, Admin, SessionLocal, Specialty, Symptom, KnowledgeEntry, AdhocReceipt
-from security_utils import get_password_hash, verify_password, validate_password_complexity
+from database import Doctor, Patient, Appointment, ArchivedAppointment, Admin, SessionLocal, Specialty, Symptom, KnowledgeEntry, KnowledgeOutbox, AdhocReceipt
+from security_utils import get_password_hash, verify_password, validate_password_complexity, sign_user
 from logic_engine import SymptomRouter
-from knowledge_engine import MedicalKnowledgeSystem
+from knowledge_engine import knowledge_system, normalize_query, QueryCache
+from ingest_queue import IngestionQueue
+from scheduler import Scheduler
+from receipts import ReceiptNumberService
+from cache_sync import CacheVersions, VersionedCache, ScheduleSync
+from doctor_ranking import DoctorSignals
+from calendar_engine import CalendarEngine
+from slot_templates import SlotGrid
+from read_snapshot import ReadSnapshot
+from admission import AdmissionControl
+from singleflight import SingleFlight
+import slot_templates
+from daysheet import DaySheetBuilder, case_view
+from config import get_config, refresh_config, public_config
+import housekeeping
+import archive
+import user_search
+import metrics
+import profiling
+from profiling import profiled
 from pdf_generator import generate_medical_report, generate_adhoc_receipt
+from contextlib import asynccontextmanager
+from sqlalchemy import tuple_, func, insert, delete
 from datetime import datetime, timedelta
-import json
+import importlib.util, logging, re
+# orjson is optional; several times faster than json.dumps
+FastJSONResponse = ORJSONResponse if importlib.util.find_spec("orjson") else JSONResponse
 
-app = FastAPI()
-database.init_db()
-router = SymptomRouter()
-knowledge_sys = MedicalKnowledgeSystem()
+log = logging.getLogger("medmatch")
+
+metrics.instrument_engine(database.engine)
+profiling.instrument_engine(database.engine)
+versions = CacheVersions()
+router = SymptomRouter(versions, get_config().get("classifier_model", "specialty_model.npz"), get_config().get("classifier_min_confidence", 0.5),
+                       get_config().get("symptom_synonyms"), get_config().get("fuzzy_threshold", 0.6))
+kb_engine = get_config().get("knowledge_engine", "tfidf")
+kb_cache = QueryCache(versions, get_config().get("knowledge_cache_size", 1000), get_config().get("knowledge_cache_ttl", 600)) if get_config().get("knowledge_cache_size", 1000) else None
+knowledge_sys = knowledge_system(kb_engine, kb_cache, get_config().get("knowledge_refit_entries", 500), get_config().get("knowledge_refit_seconds", 300))
+grid = SlotGrid(versions)
+signals = DoctorSignals(get_config().get("ranking_horizon_days", 14), grid)
+calendar = CalendarEngine(get_config().get("calendar_history_days", 30)) if get_config().get("calendar_engine", True) else None
+daysheets = DaySheetBuilder(knowledge_sys, versions, get_config().get("daysheet_cache_size", 2000))
+ingest_queue = IngestionQueue(knowledge_sys, prewarm=get_config().get("knowledge_prewarm", True) and kb_engine != "fts5", versions=versions)
+snapshot = ReadSnapshot(get_config().get("report_snapshot_path"), get_config().get("report_replica_url") or None)
+# Expensive endpoints get per-user rate limits and bounded concurrency (429 + Retry-After)
+admission = AdmissionControl(get_config().get("admission"))
+# Identical concurrent reads (same doctor/day, same knowledge query) share one computation
+flights = {n: SingleFlight(n) for n in ("calendar_slots", "calendar_grid", "knowledge_query")}
+receipts = ReceiptNumberService(block_size=get_config().get("receipt_block_size", 1))
+
+# --- HOUSEKEEPING JOBS ---
+scheduler = Scheduler()
+scheduler.register("expire_pending", lambda db: housekeeping.expire_stale_pending(db, schedule), every=300)
+scheduler.register("purge_outbox", housekeeping.purge_outbox, cron="30 3 * * *")
+scheduler.register("archive_appointments", archive.archive_completed, cron="45 3 * * *", lease=3600)
+scheduler.register("refresh_config", lambda db: refresh_config(), every=60, exclusive=False)
+scheduler.register("refresh_report_snapshot", snapshot.refresh, every=get_config().get("report_snapshot_seconds", 120), lease=600)
+scheduler.register("rebuild_knowledge_index", knowledge_sys.rebuild, cron="0 3 * * *", exclusive=False)
+scheduler.register("sync_caches", versions.poll, every=get_config().get("cache_poll_seconds", 1), exclusive=False, thread="cache-sync")
+
+# --- SHARED CACHES (kept coherent across workers through cache_versions) ---
+specialties_cache = VersionedCache(versions, "specialties", lambda db: [{"id":s.id,"name":s.name} for s in db.query(Specialty).all()])
+doctors_cache = VersionedCache(versions, "doctors", lambda db: [{"id":d.id,"name":d.name,"specialty_id":d.specialty_id} for d in db.query(Doctor).all()])
+symptoms_cache = VersionedCache(versions, "symptoms", lambda db: [{"id":s.id,"keyword":s.keyword} for s in db.query(Symptom).all()])
+versions.on_change("knowledge", knowledge_sys.catch_up)
+versions.on_change("config", lambda db: refresh_config())
+versions.on_change("classifier", router.reload_model)
+versions.on_change("doctors", signals.rebuild)
+# other workers' bookings reload just the doctor-days they touched
+schedule = ScheduleSync(versions, [(signals.rebuild, signals.reload_days)] + ([(calendar.load, calendar.reload_days)] if calendar else []),
+                        get_config().get("schedule_sync_max_days", 500))
+scheduler.register("prune_schedule_changes", schedule.prune, every=3600)
+scheduler.register("rebuild_doctor_signals", signals.rebuild, cron="1 0 * * *", exclusive=False)
+
+def train_classifier(db):
+    import specialty_classifier
+    _, n = specialty_classifier.train(db, router.model_path)
+    if n: versions.bump(db, "classifier")
+scheduler.register("train_classifier", train_classifier, cron="15 2 * * *", lease=3600)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Schema creation and seeding run once via `python database.py`; auto_migrate runs them
+    # here instead, which is only safe for a single process (workers would race the DDL)
+    if get_config().get("auto_migrate", False): database.init_db()
+    versions.poll()
+    if schedule.last is None:
+        # first load of the calendar and ranking signals; later syncs replay the changelog
+        db = SessionLocal()
+        try: schedule.sync(db)
+        finally: db.close()
+    ingest_queue.start(); scheduler.start()
+    yield
+    scheduler.stop(); ingest_queue.stop()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+if metrics.ENABLED: app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(profiling.ProfilingMiddleware)
+
+def _queue_stat(key):
+    def read():
+        db = SessionLocal()
+        try: return ingest_queue.stats(db)[key]
+        finally: db.close()
+    return read
+metrics.gauge("medmatch_kb_queue_depth", "Knowledge outbox entries waiting to be indexed", _queue_stat("depth"))
+metrics.gauge("medmatch_kb_queue_lag_seconds", "Age of the oldest pending knowledge outbox entry", _queue_stat("lag_seconds"))
+metrics.gauge("medmatch_kb_queue_failed", "Knowledge outbox entries that exhausted retries", _queue_stat("failed"))
+metrics.gauge("medmatch_knowledge_cache_entries", "Cached knowledge search answers", lambda: len(kb_cache.entries) if kb_cache else 0)
+metrics.gauge("medmatch_report_snapshot_age_seconds", "Age of the snapshot reports read from", lambda: snapshot.age() or 0.0)
 
 def get_db():
     db = SessionLocal()
     try: yield db
     finally: db.close()
 
+def get_read_db():
+    # Reports: read-only snapshot/replica when configured, else the primary
+    db = snapshot.session()
+    try: yield db
+    finally: db.close()
 # --- DTOs ---
 class RegisterModel(BaseModel):
     role: str; name: str; email: EmailStr; password: str; extra_field: str = ""; fee: float = 0.0; phone: str = ""; dob: str = ""
@@ -33,15 +140,43 @@ class AdminUpdateUserModel(BaseModel):
 class ReportFilter(BaseModel):
     start_date: Optional[str] = None; end_date: Optional[str] = None; doctor_id: Optional[int] = None; specialty_id: Optional[int] = None; patient_name: Optional[str] = None
 class SymptomInput(BaseModel): description: str
+class AnalyzeInput(SymptomInput): page: int = 1; page_size: int = 20
+class BatchSymptomInput(BaseModel): descriptions: List[str]; page_size: int = 20
 class BookSlotModel(BaseModel): patient_id: int; doctor_id: int; date: str; time: str; symptoms: str
+class BlockRangeModel(BaseModel):
+    # Every grid slot from start_date to end_date (inclusive) whose time is in [start_time, end_time)
+    doctor_id: int; start_date: str; end_date: str; start_time: str = "00:00"; end_time: str = "24:00"; skip_conflicts: bool = False
 class ConsultModel(BaseModel): appt_id: int; diagnosis: str; notes: str; medications: str; charges: float
 class ActionModel(BaseModel): appt_id: int; action: str; reason: str = ""
 class AdhocModel(BaseModel): recipient: str; description: str; amount: float
 class EditBookingModel(BaseModel): appt_id: int; new_symptoms: str
+class SlotTemplateModel(BaseModel): weekday: Optional[int] = None; start_time: str = "09:00"; end_time: str = "17:00"; slot_minutes: int = 30; breaks: str = ""; is_off: bool = False
+
+# --- RESPONSES ---
+class IdName(BaseModel): id: int; name: str
+class DoctorItem(IdName): specialty_id: Optional[int] = None
+class SymptomItem(BaseModel): id: int; keyword: str
+class RankedDoctor(IdName): next_open: Optional[str] = None; upcoming_load: int = 0; fee: Optional[float] = None
+class AnalyzeResult(BaseModel):
+    specialty: str; doctors: List[RankedDoctor]; total: int; page: int; page_size: int; confidence: float; source: str
+class CaseItem(BaseModel): diagnosis: Optional[str] = None; treatment: Optional[str] = None; medication: str; symptom: Optional[str] = None; doc: Optional[str] = None; score: float
+class AppointmentRow(BaseModel):
+    ID: int; Date: str; Time: str; Doctor: str; Specialty: str; Status: str; Fee: float; Diagnosis: str; Receipt: str
+class ReportRow(AppointmentRow): Patient: str
+class PatientAppointment(AppointmentRow): Symptoms: Optional[str] = None
+class PatientAppointmentPage(BaseModel): items: List[PatientAppointment]; next_cursor: Optional[str] = None
+class GridSlot(BaseModel): time: str; is_past: bool; status: Optional[str] = None; patient_id: Optional[int] = None
+class SlotTemplateItem(SlotTemplateModel): id: int; doctor_id: Optional[int] = None
+class UserHit(BaseModel): role: str; id: int; name: Optional[str] = None; email: Optional[str] = None; phone: Optional[str] = None
+class UserSearchPage(BaseModel): items: List[UserHit]; has_more: bool; offset: int
 
 # --- AUTH ---
 @app.post("/auth/register")
 def register(reg: RegisterModel, db: Session = Depends(get_db)):
+    # Keyed on the email: every browser reaches the API through the frontend's one address
+    with admission.admit("auth", f"email:{reg.email.lower()}"): return _register(reg, db)
+
+def _register(reg, db):
     if not validate_password_complexity(reg.password): raise HTTPException(400, "Password weak")
     hashed = get_password_hash(reg.password)
     
@@ -52,6 +187,7 @@ def register(reg: RegisterModel, db: Session = Depends(get_db)):
         if db.query(Doctor).filter(Doctor.email==reg.email).first(): raise HTTPException(400, "Email used")
         sid = int(reg.extra_field) if reg.extra_field.isdigit() else 1
         db.add(Doctor(name=reg.name, email=reg.email, password_hash=hashed, specialty_id=sid, default_fee=reg.fee, phone_number=reg.phone, qualification="MD"))
+        versions.bump(db, "doctors")
     elif reg.role == "Admin":
         if db.query(Admin).filter(Admin.email==reg.email).first(): raise HTTPException(400, "Email used")
         db.add(Admin(name=reg.name, email=reg.email, password_hash=hashed))
@@ -59,6 +195,9 @@ def register(reg: RegisterModel, db: Session = Depends(get_db)):
 
 @app.post("/auth/login")
 def login(creds: LoginModel, db: Session = Depends(get_db)):
+    with admission.admit("auth", f"email:{creds.email.lower()}"): return _login(creds, db)
+
+def _login(creds, db):
     user = None
     if creds.role=="Patient": user=db.query(Patient).filter(Patient.email==creds.email).first()
     elif creds.role=="Doctor": user=db.query(Doctor).filter(Doctor.email==creds.email).first()
@@ -66,7 +205,7 @@ def login(creds: LoginModel, db: Session = Depends(get_db)):
     
     if not user or not verify_password(creds.password, user.password_hash): raise HTTPException(401, "Invalid Credentials")
     
-    res={"id":user.id, "name":user.name, "role":creds.role, "email":user.email}
+    res={"id":user.id, "name":user.name, "role":creds.role, "email":user.email, "token":sign_user(creds.role, user.id)}
     if creds.role=="Patient": res.update({"phone":user.phone, "dob":user.dob})
     if creds.role=="Doctor": res.update({"phone":user.phone_number, "fee":user.default_fee, "qual":user.qualification})
     return res
@@ -81,7 +220,7 @@ def update_profile(d: UpdateProfileModel, db: Session = Depends(get_db)):
     u.name = d.name; u.email = d.email
     if d.password: u.password_hash = get_password_hash(d.password)
     if d.role == "Patient": u.phone=d.phone; u.dob=d.dob
-    elif d.role == "Doctor": u.phone_number=d.phone; u.default_fee=d.fee; u.qualification=d.qualification
+    elif d.role == "Doctor": u.phone_number=d.phone; u.default_fee=d.fee; u.qualification=d.qualification; versions.bump(db, "doctors")
     db.commit(); return {"msg": "Updated"}
 
 # --- ADMIN ---
@@ -106,7 +245,7 @@ def admin_upd(d: AdminUpdateUserModel, db: Session = Depends(get_db)):
     u.name=d.name; u.email=d.email
     if d.password: u.password_hash=get_password_hash(d.password)
     if d.target_role=="Patient": u.phone=d.phone
-    elif d.target_role=="Doctor": u.phone_number=d.phone
+    elif d.target_role=="Doctor": u.phone_number=d.phone; versions.bump(db, "doctors")
     db.commit(); return {"msg":"OK"}
 
 @app.delete("/admin/delete_user")
@@ -116,6 +255,7 @@ def adm_del(role: str, id: int, db: Session = Depends(get_db)):
     elif role=="Doctor": r=db.query(Doctor).get(id)
     elif role=="Admin": r=db.query(Admin).get(id)
     if not r: raise HTTPException(404)
+    if role=="Doctor": versions.bump(db, "doctors")
     try: db.delete(r); db.commit()
     except: raise HTTPException(400, "Linked Data Conflict")
     return {"msg":"Deleted"}
@@ -126,48 +266,75 @@ def m_sp(action: str, name: str, id: int=0, db: Session=Depends(get_db)):
     if action=="add": db.add(Specialty(name=name))
     elif action=="update": s=db.query(Specialty).get(id); s.name=name if s else None
     elif action=="delete": s=db.query(Specialty).get(id); db.delete(s) if s else None
-    db.commit(); return {"msg":"OK"}
+    versions.bump(db, "specialties"); db.commit(); return {"msg":"OK"}
 
 @app.post("/master/symptom")
 def m_sy(action: str, keyword: str, id: int=0, spec_id: int=0, db: Session=Depends(get_db)):
     if action=="add": db.add(Symptom(keyword=keyword, specialty_id=spec_id))
     elif action=="update": s=db.query(Symptom).get(id); s.keyword=keyword if s else None
     elif action=="delete": s=db.query(Symptom).get(id); db.delete(s) if s else None
-    db.commit(); return {"msg":"OK"}
+    versions.bump(db, "symptoms"); db.commit(); return {"msg":"OK"}
 
 # --- CALENDAR & BOOKING ---
-@app.post("/analyze/doctors")
-def find(i: SymptomInput, db: Session=Depends(get_db)):
-    sid = router.predict_specialty(i.description, db)
+def match_doctors(sid, conf, src, page, page_size, db):
+    page, page_size = max(1, page), min(max(1, page_size), 100)
     if sid:
-        s = db.query(Specialty).get(sid)
-        docs = db.query(Doctor).filter(Doctor.specialty_id==sid).all()
-        return {"specialty": s.name, "doctors": [{"id": d.id, "name": d.name} for d in docs]}
-    return {"specialty":"General", "doctors":[]}
+        s = next((x for x in specialties_cache.get(db) if x["id"]==sid), None)
+        docs = [{"id": d["id"], "name": d["name"]} for d in doctors_cache.get(db) if d["specialty_id"]==sid]
+        ranked, total = signals.rank(docs, db, page, page_size)
+        return {"specialty": s["name"] if s else "General", "doctors": ranked, "total": total, "page": page, "page_size": page_size, "confidence": conf, "source": src}
+    return {"specialty":"General", "doctors":[], "total": 0, "page": page, "page_size": page_size, "confidence": 0.0, "source": src}
+
+def check_batch(items):
+    limit = get_config().get("batch_max_items", 500)
+    if len(items) > limit: raise HTTPException(413, f"At most {limit} descriptions per batch")
+
+@app.post("/analyze/doctors", response_model=AnalyzeResult)
+def find(i: AnalyzeInput, db: Session=Depends(get_db)):
+    sid, conf, src = router.classify(i.description, db)
+    return match_doctors(sid, conf, src, i.page, i.page_size, db)
+
+@app.post("/analyze/doctors/batch", response_model=List[AnalyzeResult])
+def find_batch(i: BatchSymptomInput, db: Session=Depends(get_db)):
+    check_batch(i.descriptions)
+    return [match_doctors(sid, conf, src, 1, i.page_size, db) for sid, conf, src in router.classify_many(i.descriptions, db)]
 
 @app.get("/calendar/slots")
 def slots(doctor_id: int, date: str, db: Session=Depends(get_db)):
-    appts = db.query(Appointment).filter(Appointment.doctor_id==doctor_id, Appointment.appt_date==date).all()
-    res = {}
-    for a in appts:
-        pname = a.patient.name if a.patient else "Blocked"
-        res[a.appt_time] = {
-            "status": a.status, "id": a.id, "patient_id": a.patient_id, 
-            "patient_name": pname, "symptom": a.symptoms, "cancellation_reason": a.cancellation_reason
-        }
-    return res
+    def load():
+        appts = db.query(Appointment).filter(Appointment.doctor_id==doctor_id, Appointment.appt_date==date).all()
+        res = {}
+        for a in appts:
+            pname = a.patient.name if a.patient else "Blocked"
+            res[a.appt_time] = {
+                "status": a.status, "id": a.id, "patient_id": a.patient_id, 
+                "patient_name": pname, "symptom": a.symptoms, "cancellation_reason": a.cancellation_reason
+            }
+        return res
+    return flights["calendar_slots"].do((doctor_id, date), load)
 
 @app.post("/calendar/book")
 def book(d: BookSlotModel, db: Session=Depends(get_db)):
-    # 1. Check Doc Availability
-    if db.query(Appointment).filter(Appointment.doctor_id==d.doctor_id, Appointment.appt_date==d.date, Appointment.appt_time==d.time).first(): 
-        raise HTTPException(400, "Doctor Busy")
-    # 2. Check Patient Availability (No double booking)
-    if db.query(Appointment).filter(Appointment.patient_id==d.patient_id, Appointment.appt_date==d.date, Appointment.appt_time==d.time).first():
-        raise HTTPException(400, "You have another appointment")
-        
-    db.add(Appointment(patient_id=d.patient_id, doctor_id=d.doctor_id, appt_date=d.date, appt_time=d.time, symptoms=d.symptoms, status="PENDING"))
-    db.commit(); return {"msg":"OK"}
+    # 0. Hold the slot in the in-process calendar so concurrent requests for it are serialised
+    if not grid.is_slot(d.doctor_id, d.date, d.time, db): raise HTTPException(400, "Not a bookable slot")
+    held = calendar is not None and calendar.covers(d.date, d.time)
+    if held:
+        err = calendar.reserve(d.doctor_id, d.date, d.time, d.patient_id)
+        if err: raise HTTPException(400, err)
+    try:
+        # 1. Check Doc Availability
+        if db.query(Appointment).filter(Appointment.doctor_id==d.doctor_id, Appointment.appt_date==d.date, Appointment.appt_time==d.time).first(): 
+            raise HTTPException(400, "Doctor Busy")
+        # 2. Check Patient Availability (No double booking)
+        if db.query(Appointment).filter(Appointment.patient_id==d.patient_id, Appointment.appt_date==d.date, Appointment.appt_time==d.time).first():
+            raise HTTPException(400, "You have another appointment")
+            
+        db.add(Appointment(patient_id=d.patient_id, doctor_id=d.doctor_id, appt_date=d.date, appt_time=d.time, symptoms=d.symptoms, status="PENDING"))
+        schedule.changed(db, d.doctor_id, d.date); db.commit()
+    except Exception:
+        if held: calendar.release(d.doctor_id, d.date, d.time)
+        raise
+    signals.occupy(d.doctor_id, d.date, d.time); return {"msg":"OK"}
 
 @app.post("/calendar/edit_symptom")
 def edit_sym(d: EditBookingModel, db: Session=Depends(get_db)):
@@ -187,92 +354,278 @@ def pat_cancel(d: ActionModel, db: Session=Depends(get_db)):
         if datetime.now() > (dt - timedelta(hours=12)):
              raise HTTPException(400, "Cancellation allowed up to 12h before")
     except: pass
-    db.delete(a); db.commit(); return {"msg":"OK"}
+    slot = (a.doctor_id, a.appt_date, a.appt_time)
+    db.delete(a); schedule.changed(db, a.doctor_id, a.appt_date); db.commit(); signals.release(*slot)
+    if calendar: calendar.release(*slot)
+    return {"msg":"OK"}
 
 @app.post("/calendar/action")
 def action(d: ActionModel, db: Session=Depends(get_db)):
     a=db.query(Appointment).get(d.appt_id)
     if not a: raise HTTPException(404)
+    slot = (a.doctor_id, a.appt_date, a.appt_time)
     if d.action=="approve": a.status="CONFIRMED"
     elif d.action=="cancel": db.delete(a)
-    db.commit(); return {"msg":"OK"}
+    schedule.changed(db, a.doctor_id, a.appt_date)
+    db.commit()
+    if d.action=="cancel": signals.release(*slot)
+    if calendar: calendar.release(*slot) if d.action=="cancel" else calendar.set_status(*slot, a.status)
+    return {"msg":"OK"}
 
 @app.post("/calendar/block")
 def block(doc_id: int, date: str, time: str, db: Session=Depends(get_db)):
     db.add(Appointment(patient_id=None, doctor_id=doc_id, appt_date=date, appt_time=time, status="BLOCKED", symptoms="Blocked"))
-    db.commit(); return {"msg":"OK"}
+    schedule.changed(db, doc_id, date); db.commit(); signals.occupy(doc_id, date, time)
+    if calendar: calendar.occupy(doc_id, date, time, None, "BLOCKED")
+    return {"msg":"OK"}
+
+def occupied(doctor_id, day, db):
+    if calendar and calendar.covers(day): return calendar.day(doctor_id, day)
+    q = db.query(Appointment.appt_time, Appointment.status, Appointment.patient_id).filter(Appointment.doctor_id==doctor_id, Appointment.appt_date==day)
+    return {t: {"status": s, "patient_id": p} for t, s, p in q}
+
+@app.get("/calendar/grid", response_model=List[GridSlot])
+def slot_grid(doctor_id: int, date: str, db: Session=Depends(get_db)):
+    def load():
+        taken = occupied(doctor_id, date, db); now = datetime.now().strftime("%Y-%m-%d %H:%M")
+        return [{"time": t, "is_past": f"{date} {t}" < now, **taken.get(t, {"status": None, "patient_id": None})} for t in grid.slots(doctor_id, date, db)]
+    return flights["calendar_grid"].do((doctor_id, date), load)
+
+@app.get("/calendar/next_free")
+def next_free(doctor_id: int, db: Session=Depends(get_db)):
+    if not signals.loaded: signals.rebuild(db)
+    return {"doctor_id": doctor_id, "next_open": signals.signals(doctor_id)["next_open"]}
+
+@app.get("/slot_templates", response_model=List[SlotTemplateItem])
+def get_templates(doctor_id: Optional[int]=None, db: Session=Depends(get_db)):
+    return [{"id": t.id, "doctor_id": t.doctor_id, "weekday": t.weekday, "start_time": t.start_time, "end_time": t.end_time, "slot_minutes": t.slot_minutes,
+             "breaks": t.breaks, "is_off": t.is_off} for t in db.query(database.SlotTemplate).filter(database.SlotTemplate.doctor_id==doctor_id).all()]
+
+@app.put("/slot_templates")
+def put_templates(rows: List[SlotTemplateModel], doctor_id: Optional[int]=None, db: Session=Depends(get_db)):
+    # Replaces the doctor's (or, without doctor_id, the clinic default) templates
+    for r in rows:
+        err = slot_templates.validate(r.model_dump())
+        if err: raise HTTPException(400, err)
+    db.query(database.SlotTemplate).filter(database.SlotTemplate.doctor_id==doctor_id).delete(synchronize_session=False)
+    for r in rows: db.add(database.SlotTemplate(doctor_id=doctor_id, **r.model_dump()))
+    versions.bump(db, "templates"); db.commit(); return {"msg":"OK"}
+
+def range_slots(r, db):
+    try: d0 = datetime.strptime(r.start_date, "%Y-%m-%d").date(); d1 = datetime.strptime(r.end_date, "%Y-%m-%d").date()
+    except ValueError: raise HTTPException(400, "Dates must be YYYY-MM-DD")
+    if not 0 <= (d1 - d0).days < get_config().get("block_range_max_days", 62): raise HTTPException(400, "Invalid or too long date range")
+    # times are compared as strings below, so they must be zero-padded HH:MM
+    if not all(re.fullmatch(r"\d\d:[0-5]\d", x) for x in (r.start_time, r.end_time)) \
+            or not 0 <= slot_templates.minutes(r.start_time) < slot_templates.minutes(r.end_time) <= 1440:
+        raise HTTPException(400, "Times must be HH:MM with start_time before end_time")
+    days = [(d0 + timedelta(days=k)).isoformat() for k in range((d1 - d0).days + 1)]
+    return [(day, t) for day in days for t in grid.slots(r.doctor_id, day, db) if r.start_time <= t < r.end_time]
+
+@app.post("/calendar/block_range")
+def block_range(r: BlockRangeModel, db: Session=Depends(get_db)):
+    want = range_slots(r, db)
+    # one query for everything already in the range
+    taken = {(d, t): s for d, t, s in db.query(Appointment.appt_date, Appointment.appt_time, Appointment.status)
+             .filter(Appointment.doctor_id==r.doctor_id, Appointment.appt_date>=r.start_date, Appointment.appt_date<=r.end_date)}
+    conflicts = [{"date": d, "time": t, "status": taken[(d, t)]} for d, t in want if (d, t) in taken and taken[(d, t)] != "BLOCKED"]
+    if conflicts and not r.skip_conflicts: raise HTTPException(409, {"msg": "Slots already booked", "conflicts": conflicts})
+    new = [(d, t) for d, t in want if (d, t) not in taken]
+    if new:
+        db.execute(insert(Appointment), [{"patient_id": None, "doctor_id": r.doctor_id, "appt_date": d, "appt_time": t, "status": "BLOCKED", "symptoms": "Blocked"} for d, t in new])
+        schedule.changed(db, r.doctor_id, *[d for d, _ in new])
+    db.commit()
+    for d, t in new:
+        signals.occupy(r.doctor_id, d, t)
+        if calendar: calendar.occupy(r.doctor_id, d, t, None, "BLOCKED")
+    return {"blocked": len(new), "skipped": conflicts}
+
+@app.post("/calendar/unblock_range")
+def unblock_range(r: BlockRangeModel, db: Session=Depends(get_db)):
+    range_slots(r, db)  # validates the range
+    gone = db.execute(delete(Appointment).where(Appointment.doctor_id==r.doctor_id, Appointment.status=="BLOCKED", Appointment.appt_date>=r.start_date,
+                                                Appointment.appt_date<=r.end_date, Appointment.appt_time>=r.start_time, Appointment.appt_time<r.end_time)
+                      .returning(Appointment.appt_date, Appointment.appt_time)).all()
+    if gone: schedule.changed(db, r.doctor_id, *[d for d, _ in gone])
+    db.commit()
+    for d, t in gone:
+        signals.release(r.doctor_id, d, t)
+        if calendar: calendar.release(r.doctor_id, d, t)
+    return {"unblocked": len(gone)}
+
+@app.get("/calendar/availability")
+def availability(doctor_id: int, date: str, db: Session=Depends(get_db)):
+    # Occupied slots only ({time: {status, patient_id}}), from the compact calendar when it covers the day
+    return occupied(doctor_id, date, db)
+
+@app.get("/doctor/{did}/daysheet")
+def day_sheet(did: int, date: str, db: Session=Depends(get_db)):
+    if not any(d["id"]==did for d in doctors_cache.get(db)): raise HTTPException(404)
+    return daysheets.build(did, date, db)
 
 @app.post("/doctor/consult")
 def consult(d: ConsultModel, db: Session=Depends(get_db)):
     a=db.query(Appointment).get(d.appt_id)
-    # Generate Receipt Logic
-    dt = datetime.now().strftime("%Y%m%d"); n = f"RCP-{dt}-{a.id:04d}"
+    if not a: raise HTTPException(404)
+    n = a.receipt_number or receipts.next_number()
     
     a.status="COMPLETED"; a.diagnosis=d.diagnosis; a.doctor_comments=d.notes; 
     a.medications=d.medications; a.charges=d.charges; a.receipt_number=n
     
     doc = db.query(Doctor).get(a.doctor_id)
-    db.add(KnowledgeEntry(symptom_text=a.symptoms, diagnosis=d.diagnosis, treatment_plan=d.notes, medication_plan=d.medications, doctor_name=doc.name))
-    db.commit(); return {"msg":"Saved"}
+    k = KnowledgeEntry(symptom_text=a.symptoms, diagnosis=d.diagnosis, treatment_plan=d.notes, medication_plan=d.medications, doctor_name=doc.name, appointment_id=a.id)
+    db.add(k); db.flush()
+    # Indexing is picked up from the outbox by the ingestion worker
+    now = datetime.now().isoformat()
+    db.add(KnowledgeOutbox(entry_id=k.id, status="PENDING", attempts=0, created_at=now, next_attempt_at=now))
+    # drops cached knowledge answers; the ingestion worker bumps it again once indexed
+    versions.bump(db, "knowledge"); schedule.changed(db, a.doctor_id, a.appt_date)
+    db.commit(); ingest_queue.notify()
+    if calendar: calendar.set_status(a.doctor_id, a.appt_date, a.appt_time, "COMPLETED")
+    return {"msg":"Saved"}
 
 # --- AI KNOWLEDGE (UPDATED TO RETURN CONTEXT) ---
-@app.post("/knowledge/query")
+@app.post("/knowledge/query", response_model=List[CaseItem], dependencies=[Depends(admission.guard("knowledge"))])
+@profiled
 def k_query(input: SymptomInput, db: Session = Depends(get_db)):
-    m = knowledge_sys.search_similar_cases(input.description, db)
-    return [{
-        "diagnosis": x['data'].diagnosis, 
-        "treatment": x['data'].treatment_plan, 
-        "medication": x['data'].medication_plan or "None",
-        "symptom": x['data'].symptom_text, # Added context
-        "doc": x['data'].doctor_name, 
-        "score": x['score']
-    } for x in m]
+    return flights["knowledge_query"].do(normalize_query(input.description), lambda: [case_view(x) for x in knowledge_sys.search_similar_cases(input.description, db)])
+
+@app.post("/knowledge/query/batch", response_model=List[List[CaseItem]], dependencies=[Depends(admission.guard("knowledge"))])
+@profiled
+def k_query_batch(input: BatchSymptomInput, db: Session = Depends(get_db)):
+    check_batch(input.descriptions)
+    return [[case_view(x) for x in m] for m in knowledge_sys.search_many(input.descriptions, db)]
+
+@app.get("/knowledge/queue")
+def k_queue(db: Session = Depends(get_db)): return ingest_queue.stats(db)
 
 # --- REPORTS & PDF ---
-@app.post("/reports/advanced")
-def get_reports(f: ReportFilter, db: Session=Depends(get_db)):
-    q=db.query(Appointment, Doctor, Patient, Specialty).select_from(Appointment).join(Doctor).outerjoin(Patient).outerjoin(Specialty, Doctor.specialty_id==Specialty.id)
-    if f.doctor_id: q=q.filter(Appointment.doctor_id==f.doctor_id)
+REPORT_KEYS = ("ID", "Date", "Time", "Doctor", "Specialty", "Patient", "Status", "Fee", "Diagnosis", "Receipt")
+
+def report_query(db, m, f):
+    q=db.query(m.id, m.appt_date, m.appt_time, Doctor.name, func.coalesce(Specialty.name, "General"), func.coalesce(Patient.name, "Blocked"),
+               m.status, func.coalesce(m.charges, 0.0), func.coalesce(m.diagnosis, ""), func.coalesce(m.receipt_number, ""))\
+        .select_from(m).join(Doctor, m.doctor_id==Doctor.id).outerjoin(Patient, m.patient_id==Patient.id).outerjoin(Specialty, Doctor.specialty_id==Specialty.id)
+    if f.doctor_id: q=q.filter(m.doctor_id==f.doctor_id)
     if f.specialty_id: q=q.filter(Doctor.specialty_id==f.specialty_id)
-    if f.start_date: q=q.filter(Appointment.appt_date>=f.start_date)
+    if f.start_date: q=q.filter(m.appt_date>=f.start_date)
     if f.patient_name: q=q.filter(Patient.name==f.patient_name)
+    return q
+
+@app.post("/reports/advanced", response_model=List[ReportRow], dependencies=[Depends(admission.guard("reports"))])
+@profiled
+def get_reports(f: ReportFilter, db: Session=Depends(get_read_db)):
+    # Plain column tuples (no ORM objects), returned as a ready Response so FastAPI
+    # skips per-row validation; ReportRow still documents the shape
+    q=report_query(db, Appointment, f)
+    # archived history is only read when the range reaches back into it
+    if archive.needs_archive(db, f.start_date): q=report_query(db, ArchivedAppointment, f).union_all(q)
     try:
-        res=q.all(); data=[]
-        for a, d, p, s in res:
-            pn=p.name if p else "Blocked"; sn=s.name if s else "General"
-            data.append({"ID":a.id,"Date":a.appt_date,"Time":a.appt_time,"Doctor":d.name,"Specialty":sn,"Patient":pn,"Status":a.status,"Fee":a.charges or 0.0, "Diagnosis":a.diagnosis or "", "Receipt":a.receipt_number or ""})
-        return data
-    except: return []
-
-@app.get("/appointment/{aid}/pdf")
+        return FastJSONResponse([dict(zip(REPORT_KEYS, r)) for r in q.tuples()], headers=snapshot.headers(db))
+    except Exception:
+        log.exception("Report query failed"); metrics.ERRORS.inc(component="reports")
+        return []
+
+@app.get("/patients/{pid}/appointments", response_model=PatientAppointmentPage)
+def patient_appointments(pid: int, status: Optional[str]=None, cursor: Optional[str]=None, limit: int=20, order: str="desc", db: Session=Depends(get_db)):
+    # Keyset pagination on (date, time, id) served by ix_appointments_patient_date
+    # (and its archive twin, merged when completed visits are asked for); the
+    # cursor is the last row's "date|time|id" as returned in next_cursor
+    limit = min(max(1, limit), 100); asc = order == "asc"
+    statuses = [s.strip().upper() for s in status.split(",") if s.strip()] if status else None
+    if cursor:
+        try: cd, ct, ci = cursor.split("|"); ci = int(ci)
+        except ValueError: raise HTTPException(400, "Invalid cursor")
+    rows = []
+    for m in (Appointment, ArchivedAppointment) if statuses is None or "COMPLETED" in statuses else (Appointment,):
+        key = tuple_(m.appt_date, m.appt_time, m.id); cols = (m.appt_date, m.appt_time, m.id)
+        q = db.query(m.id, m.appt_date, m.appt_time, m.doctor_id, m.status, m.symptoms, m.charges, m.diagnosis, m.receipt_number).filter(m.patient_id==pid)
+        if statuses: q = q.filter(m.status.in_(statuses))
+        if cursor: q = q.filter(key > tuple_(cd, ct, ci) if asc else key < tuple_(cd, ct, ci))
+        rows += q.order_by(*(cols if asc else [c.desc() for c in cols])).limit(limit + 1).all()
+    rows.sort(key=lambda r: (r.appt_date, r.appt_time, r.id), reverse=not asc); rows = rows[:limit + 1]
+    docs = {d["id"]: d for d in doctors_cache.get(db)}; specs = {s["id"]: s["name"] for s in specialties_cache.get(db)}
+    items = []
+    for r in rows[:limit]:
+        d = docs.get(r.doctor_id, {})
+        items.append({"ID":r.id,"Date":r.appt_date,"Time":r.appt_time,"Doctor":d.get("name",""),"Specialty":specs.get(d.get("specialty_id"),"General"),
+                      "Status":r.status,"Symptoms":r.symptoms,"Fee":r.charges or 0.0,"Diagnosis":r.diagnosis or "","Receipt":r.receipt_number or ""})
+    last = rows[limit - 1] if len(rows) > limit else None
+    return {"items": items, "next_cursor": f"{last.appt_date}|{last.appt_time}|{last.id}" if last else None}
+
+@app.get("/appointment/{aid}/pdf", dependencies=[Depends(admission.guard("pdf"))])
 def mpdf(aid: int, db: Session=Depends(get_db)):
-    a=db.query(Appointment).get(aid)
+    a=db.query(Appointment).get(aid) or db.query(ArchivedAppointment).get(aid)
+    if not a: raise HTTPException(404)
+    if not housekeeping.receipt_downloadable(a.appt_date): raise HTTPException(403, "Receipt download window expired")
     rn = a.receipt_number if a.receipt_number else "PENDING"
     pn=a.patient.name if a.patient else "Walk-In"; pa=a.patient.age if a.patient else 0
     b=generate_medical_report(rn, a.doctor.name, a.doctor.qualification, pn, pa, a.appt_date, a.diagnosis, a.doctor_comments, a.medications, a.charges)
     return Response(content=b, media_type="application/pdf")
 
 @app.get("/config/read")
-def cr(): 
-    try: return json.load(open("clinic_config.json"))
-    except: return {}
-@app.get("/doctors/all")
-def ld(db:Session=Depends(get_db)): return [{"id":d.id,"name":d.name,"specialty_id":d.specialty_id} for d in db.query(Doctor).all()]
-@app.get("/specialties/all")
-def ls(db:Session=Depends(get_db)): return [{"id":s.id,"name":s.name} for s in db.query(Specialty).all()]
-@app.get("/symptoms/all")
-def lsy(db:Session=Depends(get_db)): return [{"id":s.id,"keyword":s.keyword} for s in db.query(Symptom).all()]
-@app.get("/users/all")
+def cr(): return public_config()
+@app.get("/metrics", response_class=PlainTextResponse)
+def prom():
+    if not metrics.ENABLED: raise HTTPException(404)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# --- PROFILING ---
+def require_profile_token(x_profile_token: str = Header("")):
+    if not profiling.token_matches(x_profile_token): raise HTTPException(403, "Profiling not permitted")
+@app.get("/admin/profiles", dependencies=[Depends(require_profile_token)])
+def prof_list(): return profiling.list_profiles()
+@app.get("/admin/profiles/{pid}", dependencies=[Depends(require_profile_token)])
+def prof_get(pid: str):
+    p = profiling.artifact_path(pid, "json")
+    if not p: raise HTTPException(404)
+    return FileResponse(p, media_type="application/json")
+@app.get("/admin/profiles/{pid}/download", dependencies=[Depends(require_profile_token)])
+def prof_download(pid: str):
+    p = profiling.artifact_path(pid, "prof")
+    if not p: raise HTTPException(404)
+    return FileResponse(p, media_type="application/octet-stream", filename=f"{pid}.prof")
+@app.post("/admin/config/reload")
+def config_reload(db: Session=Depends(get_db)):
+    refresh_config(); versions.bump(db, "config"); db.commit(); return public_config()
+@app.get("/admin/jobs")
+def jobs(db: Session=Depends(get_db)): return scheduler.stats(db)
+@app.get("/admin/archive")
+def archive_stats(db: Session=Depends(get_db)): return archive.stats(db)
+@app.get("/admin/knowledge_cache")
+def kb_cache_stats(): return kb_cache.stats() if kb_cache else {"enabled": False}
+@app.get("/admin/singleflight")
+def singleflight_stats(): return {n: f.stats() for n, f in flights.items()}
+@app.get("/admin/admission")
+def admission_stats(): return admission.stats()
+@app.get("/admin/snapshot")
+def snapshot_stats(): return snapshot.stats()
+@app.get("/admin/calendar")
+def cal_stats(): return {**(calendar.stats() if calendar else {"loaded": False}), "sync": schedule.stats()}
+@app.get("/doctors/all", response_model=List[DoctorItem])
+def ld(db:Session=Depends(get_db)): return doctors_cache.get(db)
+@app.get("/specialties/all", response_model=List[IdName])
+def ls(db:Session=Depends(get_db)): return specialties_cache.get(db)
+@app.get("/symptoms/all", response_model=List[SymptomItem])
+def lsy(db:Session=Depends(get_db)): return symptoms_cache.get(db)
+@app.get("/users/all", response_model=List[IdName])
 def lu(role: str, db:Session=Depends(get_db)):
-    if role=="Patient": return [{"id":x.id, "name":x.name} for x in db.query(Patient).all()]
-    elif role=="Doctor": return [{"id":x.id, "name":x.name} for x in db.query(Doctor).all()]
-    return [{"id":x.id, "name":x.name} for x in db.query(Admin).all()]
+    m = Patient if role=="Patient" else Doctor if role=="Doctor" else Admin
+    return [{"id":i, "name":n} for i, n in db.query(m.id, m.name)]
+@app.get("/users/search", response_model=UserSearchPage)
+def user_lookup(q: str, role: Optional[str]=None, limit: int=20, offset: int=0, db: Session=Depends(get_db)):
+    # Ranked prefix search over name, email and phone (FTS5, kept in sync by triggers)
+    limit = min(max(1, limit), 100); offset = max(0, offset)
+    items, more = user_search.search(db, q, role, limit, offset)
+    return {"items": items, "has_more": more, "offset": offset}
 @app.post("/financial/adhoc")
 def adhoc(d: AdhocModel, db: Session=Depends(get_db)):
-    n = f"RCP-{datetime.now().strftime('%Y%m%d')}-{db.query(AdhocReceipt).count()+1:03d}"
+    n = receipts.next_number()
     rec=AdhocReceipt(receipt_number=n, recipient_name=d.recipient, description=d.description, amount=d.amount, created_at=datetime.now().isoformat())
     db.add(rec); db.commit(); return {"id":rec.id}
-@app.get("/financial/adhoc/{rid}/pdf")
+@app.get("/financial/adhoc/{rid}/pdf", dependencies=[Depends(admission.guard("pdf"))])
 def apdf(rid: int, db: Session=Depends(get_db)):
     r=db.query(AdhocReceipt).get(rid)
+    if not r: raise HTTPException(404)
+    if not housekeeping.receipt_downloadable(r.created_at): raise HTTPException(403, "Receipt download window expired")
     return Response(content=generate_adhoc_receipt(r.receipt_number, r.created_at[:10], r.recipient_name, r.description, r.amount), media_type="application/pdf")
\ No newline at end of file
@@ -0,0 +1,145 @@
+from config import get_config
+import contextvars, functools, threading, time, bisect
+
+# Prometheus text exposition without extra dependencies. When metrics_enabled is
+# false in clinic_config.json, @timed returns the function untouched and the
+# middleware / SQL hooks are never installed, so the hot paths pay nothing.
+ENABLED = bool(get_config().get("metrics_enabled", True))
+DEFAULT_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+_request = contextvars.ContextVar("medmatch_request_stats", default=None)
+
+def _esc(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+def _fmt_labels(names, values, extra=""):
+    parts = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    kind = "counter"
+    def __init__(self, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.values = {}; self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self.lock: self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        with self.lock: items = list(self.values.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {v}" for k, v in items]
+
+class Histogram:
+    kind = "histogram"
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, tuple(labelnames), tuple(buckets)
+        self.values = {}; self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        i = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            st = self.values.get(key)
+            if st is None: st = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            st[0][i] += 1; st[1] += value; st[2] += 1
+
+    def samples(self):
+        with self.lock: items = [(k, list(c), s, n) for k, (c, s, n) in self.values.items()]
+        out = []
+        for key, counts, total, n in items:
+            acc = 0
+            for b, c in zip(self.buckets + ("+Inf",), counts):
+                le = 'le="%s"' % b
+                acc += c; out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return out
+
+class Gauge:
+    kind = "gauge"
+    # fn returns a number, or a dict of label-value tuples -> number
+    def __init__(self, name, help, fn, labelnames=()):
+        self.name, self.help, self.fn, self.labelnames = name, help, fn, tuple(labelnames)
+
+    def samples(self):
+        v = self.fn()
+        if isinstance(v, dict): return [f"{self.name}{_fmt_labels(self.labelnames, k)} {x}" for k, x in v.items()]
+        return [f"{self.name} {v}"]
+
+REGISTRY = {}
+
+def _register(m):
+    return REGISTRY.setdefault(m.name, m)
+
+def counter(name, help, labelnames=()): return _register(Counter(name, help, labelnames))
+def histogram(name, help, labelnames=(), buckets=DEFAULT_BUCKETS): return _register(Histogram(name, help, labelnames, buckets))
+def gauge(name, help, fn, labelnames=()): return _register(Gauge(name, help, fn, labelnames))
+
+def render():
+    lines = []
+    for m in list(REGISTRY.values()):
+        try: samples = m.samples()
+        except Exception: continue
+        lines += [f"# HELP {m.name} {m.help}", f"# TYPE {m.name} {m.kind}"] + samples
+    return "\n".join(lines) + "\n"
+
+# --- STANDARD METRICS ---
+HTTP_SECONDS = histogram("medmatch_http_request_seconds", "Request latency by endpoint", ("method", "path", "status"))
+HTTP_SQL_QUERIES = histogram("medmatch_http_request_sql_queries", "SQL statements per request", ("path",), (0, 1, 2, 5, 10, 25, 50, 100, 250))
+HTTP_SQL_SECONDS = histogram("medmatch_http_request_sql_seconds", "SQL time per request", ("path",))
+SQL_SECONDS = histogram("medmatch_sql_query_seconds", "Individual SQL statement latency")
+FUNC_SECONDS = histogram("medmatch_function_seconds", "Time spent in instrumented functions", ("fn",))
+ERRORS = counter("medmatch_errors_total", "Handled errors by component", ("component",))
+
+def timed(name):
+    def wrap(fn):
+        if not ENABLED: return fn
+        @functools.wraps(fn)
+        def inner(*a, **kw):
+            t0 = time.perf_counter()
+            try: return fn(*a, **kw)
+            finally: FUNC_SECONDS.observe(time.perf_counter() - t0, fn=name)
+        return inner
+    return wrap
+
+def current_request():
+    return _request.get()
+
+# --- SQLALCHEMY HOOKS ---
+def instrument_engine(engine):
+    if not ENABLED: return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("medmatch_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        dt = time.perf_counter() - conn.info["medmatch_t0"].pop()
+        SQL_SECONDS.observe(dt)
+        st = _request.get()
+        if st is not None:
+            st["queries"] += 1; st["sql_seconds"] += dt
+
+# --- ASGI MIDDLEWARE ---
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http": return await self.app(scope, receive, send)
+        stats = {"queries": 0, "sql_seconds": 0.0, "status": 500}
+        token = _request.set(stats); t0 = time.perf_counter()
+
+        async def _send(msg):
+            if msg["type"] == "http.response.start": stats["status"] = msg["status"]
+            await send(msg)
+        try: await self.app(scope, receive, _send)
+        finally:
+            _request.reset(token)
+            route = scope.get("route"); path = getattr(route, "path", "unmatched")
+            HTTP_SECONDS.observe(time.perf_counter() - t0, method=scope["method"], path=path, status=stats["status"])
+            HTTP_SQL_QUERIES.observe(stats["queries"], path=path); HTTP_SQL_SECONDS.observe(stats["sql_seconds"], path=path)
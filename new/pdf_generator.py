@@ -1,41 +1,43 @@
-from fpdf import FPDF
-import json
-import os
-
-CONFIG_FILE = "clinic_config.json"
+from functools import lru_cache
+import config
+from metrics import timed
 
 def get_config():
-    try:
-        with open(CONFIG_FILE, "r") as f: return json.load(f)
-    except:
-        return {"platform_title": "MEDMATCH HEALTH", "address": "Clinic Address", "phone": "000"}
+    return config.get_config() or {"platform_title": "MEDMATCH HEALTH", "address": "Clinic Address", "phone": "000"}
+
+# fpdf is only imported when the first PDF is rendered
+@lru_cache(maxsize=None)
+def _pdf_class():
+    from fpdf import FPDF
 
-class BasePDF(FPDF):
-    def __init__(self):
-        super().__init__()
-        self.conf = get_config()
-        self.set_auto_page_break(auto=True, margin=15)
+    class BasePDF(FPDF):
+        def __init__(self):
+            super().__init__()
+            self.conf = get_config()
+            self.set_auto_page_break(auto=True, margin=15)
 
-    def header(self):
-        self.set_fill_color(245, 245, 245)
-        self.rect(0, 0, 210, 40, 'F')
-        self.set_font('Arial', 'B', 18)
-        self.set_text_color(0, 51, 102)
-        self.cell(0, 10, self.conf.get('platform_title').upper(), 0, 1, 'C')
-        self.set_font('Arial', '', 10)
-        self.set_text_color(100, 100, 100)
-        contact = f"{self.conf.get('address')} | Tel: {self.conf.get('phone')}"
-        self.cell(0, 5, contact, 0, 1, 'C')
-        self.ln(20)
+        def header(self):
+            self.set_fill_color(245, 245, 245)
+            self.rect(0, 0, 210, 40, 'F')
+            self.set_font('Arial', 'B', 18)
+            self.set_text_color(0, 51, 102)
+            self.cell(0, 10, self.conf.get('platform_title').upper(), 0, 1, 'C')
+            self.set_font('Arial', '', 10)
+            self.set_text_color(100, 100, 100)
+            contact = f"{self.conf.get('address')} | Tel: {self.conf.get('phone')}"
+            self.cell(0, 5, contact, 0, 1, 'C')
+            self.ln(20)
 
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.set_text_color(128)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+        def footer(self):
+            self.set_y(-15)
+            self.set_font('Arial', 'I', 8)
+            self.set_text_color(128)
+            self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
+    return BasePDF
 
+@timed("pdf_medical_report")
 def generate_medical_report(rec_num, d_name, d_qual, p_name, p_age, date, diag, treat, meds, fee):
-    pdf = BasePDF()
+    pdf = _pdf_class()()
     pdf.add_page()
     
     # --- RECEIPT HEADER ---
@@ -87,8 +89,9 @@ def generate_medical_report(rec_num, d_name, d_qual, p_name, p_age, date, diag,
 
     return bytes(pdf.output())
 
+@timed("pdf_adhoc_receipt")
 def generate_adhoc_receipt(num, date, rec, desc, amt):
-    pdf = BasePDF()
+    pdf = _pdf_class()()
     pdf.add_page()
     pdf.set_font('Arial', 'B', 14)
     pdf.cell(0, 10, "PAYMENT RECEIPT", 0, 1, 'C')
@@ -0,0 +1,106 @@
+from config import get_config
+from urllib.parse import parse_qs
+from datetime import datetime
+import contextvars, functools, cProfile, pstats, io, json, os, time, uuid, hmac
+
+# Opt-in request profiling. A request carrying the admin profile token (header
+# X-Profile-Token or ?profile=<token>) runs its @profiled endpoint under cProfile,
+# records every SQL statement with its timing, and stores the artifact under
+# profile_dir. Unprofiled requests only pay a header lookup and a ContextVar read.
+_active = contextvars.ContextVar("medmatch_profile", default=None)
+
+def profile_token():
+    # MEDMATCH_PROFILE_TOKEN wins over the config file
+    return os.environ.get("MEDMATCH_PROFILE_TOKEN") or get_config().get("profile_token") or ""
+
+def token_matches(value):
+    token = profile_token()
+    return bool(token) and hmac.compare_digest((value or "").encode(), token.encode())
+
+def profile_dir():
+    return get_config().get("profile_dir", "profiles")
+
+def profiled(fn):
+    @functools.wraps(fn)
+    def inner(*a, **kw):
+        ctx = _active.get()
+        if ctx is None: return fn(*a, **kw)
+        prof = cProfile.Profile(); prof.enable()
+        try: return fn(*a, **kw)
+        finally:
+            prof.disable(); ctx["profile"] = prof
+    return inner
+
+def instrument_engine(engine):
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _active.get() is not None: conn.info["medmatch_prof_t0"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        ctx = _active.get()
+        if ctx is not None and "medmatch_prof_t0" in conn.info:
+            ctx["sql"].append({"statement": statement, "ms": round((time.perf_counter() - conn.info.pop("medmatch_prof_t0")) * 1000, 3)})
+
+def _requested(scope):
+    if not profile_token(): return False
+    for k, v in scope["headers"]:
+        if k == b"x-profile-token": return token_matches(v.decode())
+    if b"profile=" in scope.get("query_string", b""):
+        return token_matches(parse_qs(scope["query_string"].decode()).get("profile", [""])[0])
+    return False
+
+def _save(ctx):
+    d = profile_dir(); os.makedirs(d, exist_ok=True)
+    meta = {k: ctx[k] for k in ("id", "method", "path", "query", "status", "started_at", "duration_ms")}
+    meta["sql"] = ctx["sql"]; meta["sql_count"] = len(ctx["sql"]); meta["sql_ms"] = round(sum(s["ms"] for s in ctx["sql"]), 3)
+    prof = ctx.get("profile")
+    if prof:
+        prof.dump_stats(os.path.join(d, f"{ctx['id']}.prof"))
+        buf = io.StringIO(); pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(40)
+        meta["top"] = buf.getvalue()
+    with open(os.path.join(d, f"{ctx['id']}.json"), "w") as f: json.dump(meta, f, indent=1)
+    keep = int(get_config().get("profile_keep", 50))
+    old = sorted((p for p in os.listdir(d) if p.endswith(".json")), reverse=True)[keep:]
+    for p in old:
+        for ext in (".json", ".prof"):
+            try: os.remove(os.path.join(d, p[:-5] + ext))
+            except OSError: pass
+
+def list_profiles():
+    d = profile_dir()
+    if not os.path.isdir(d): return []
+    out = []
+    for p in sorted((p for p in os.listdir(d) if p.endswith(".json")), reverse=True):
+        with open(os.path.join(d, p)) as f: m = json.load(f)
+        out.append({k: m.get(k) for k in ("id", "method", "path", "status", "started_at", "duration_ms", "sql_count", "sql_ms")})
+    return out
+
+def artifact_path(pid, ext):
+    if not pid.replace("-", "").isalnum(): return None
+    p = os.path.join(profile_dir(), f"{pid}.{ext}")
+    return p if os.path.exists(p) else None
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope): return await self.app(scope, receive, send)
+        now = datetime.now()
+        ctx = {"id": f"{now.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}", "method": scope["method"], "path": scope["path"],
+               "query": scope.get("query_string", b"").decode(), "status": 500, "started_at": now.isoformat(), "sql": []}
+
+        async def _send(msg):
+            if msg["type"] == "http.response.start":
+                ctx["status"] = msg["status"]
+                msg = dict(msg, headers=list(msg.get("headers", [])) + [(b"x-profile-id", ctx["id"].encode())])
+            await send(msg)
+        token = _active.set(ctx); t0 = time.perf_counter()
+        try: await self.app(scope, receive, _send)
+        finally:
+            _active.reset(token)
+            ctx["duration_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+            _save(ctx)
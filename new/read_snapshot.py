@@ -0,0 +1,106 @@
+from database import engine as primary_engine, SessionLocal
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from metrics import timed
+from datetime import datetime
+import os, sqlite3, threading, time
+
+# Read routing for analytics. Heavy report queries run on a separate read-only engine
+# so they never hold the primary database's locks or pool connections:
+#   - replica_url: a server deployment's read replica, used as is
+#   - otherwise (SQLite): a file snapshot refreshed by the scheduler with VACUUM INTO,
+#     which reads one consistent WAL snapshot of the primary so writers carry on. Each
+#     refresh writes a new file, <path>.<unix ms>; every worker moves its read engine to
+#     the newest file and disposes the old one, so no file is replaced while open.
+# Sessions carry where they read from and how old that data is (see headers()).
+class ReadSnapshot:
+    def __init__(self, path=None, replica_url=None, keep=2, max_duty=0.05):
+        # keep: snapshot files left on disk (older ones may still be open in a worker)
+        # max_duty: at most this share of wall time goes to VACUUM INTO as the database grows
+        self.path = path; self.replica_url = replica_url; self.keep = max(1, keep); self.max_duty = max_duty
+        self.lock = threading.Lock(); self.engine = None; self.factory = None; self.current = None
+        self.last_seconds = 0.0; self.skipped = 0
+        if replica_url:
+            self.engine = create_engine(replica_url); self.factory = sessionmaker(bind=self.engine, autoflush=False)
+
+    @property
+    def enabled(self):
+        return bool(self.replica_url or (self.path and primary_engine.dialect.name == "sqlite"))
+
+    def _files(self):
+        # snapshot files, oldest first
+        d = os.path.dirname(os.path.abspath(self.path)); base = os.path.basename(self.path) + "."
+        try: names = os.listdir(d)
+        except OSError: return []
+        return sorted((os.path.join(d, f) for f in names if f.startswith(base) and f[len(base):].isdigit()), key=self._taken_at)
+
+    @staticmethod
+    def _taken_at(path):
+        return int(path.rsplit(".", 1)[1]) / 1000
+
+    def _source_mtime(self):
+        # last write to the primary; with WAL, commits land in the -wal file first
+        src = primary_engine.url.database
+        return max((os.path.getmtime(p) for p in (src, src + "-wal") if os.path.exists(p)), default=0.0)
+
+    @timed("snapshot_refresh")
+    def refresh(self, db=None):
+        if self.replica_url or not self.enabled: return False
+        files = self._files()
+        if files:
+            taken = self._taken_at(files[-1])
+            # nothing written since the newest snapshot, or refreshing now would exceed max_duty
+            if self._source_mtime() < taken or time.time() - taken < self.last_seconds / self.max_duty:
+                self.skipped += 1; return False
+        t0 = time.perf_counter()
+        out = f"{self.path}.{int(time.time() * 1000)}"; tmp = f"{out}.tmp"
+        src = sqlite3.connect(primary_engine.url.database)
+        try: src.execute("VACUUM INTO ?", (tmp,))
+        finally: src.close()
+        os.replace(tmp, out)  # a fresh name, so no reader has it open
+        self.last_seconds = time.perf_counter() - t0
+        for old in files[:len(files) + 1 - self.keep]:
+            try: os.remove(old)
+            except OSError: pass  # still open in some worker (Windows); removed by a later refresh
+        return True
+
+    def _latest(self):
+        # (session factory, taken_at) for the newest snapshot file, or (None, None) before the first one
+        files = self._files()
+        if not files: return None, None
+        with self.lock:
+            if files[-1] != self.current:
+                old = self.engine
+                self.engine = create_engine(f"sqlite:///file:{files[-1]}?mode=ro&uri=true", connect_args={"check_same_thread": False})
+                self.factory = sessionmaker(bind=self.engine, autoflush=False); self.current = files[-1]
+                # sessions still using the old file keep their connection until they close
+                if old: old.dispose()
+            return self.factory, self._taken_at(self.current)
+
+    def session(self):
+        # Falls back to the primary database when routing is off or no snapshot exists yet
+        if self.replica_url: db = self.factory(); db.info["read_source"] = "replica"; return db
+        factory, taken = self._latest() if self.enabled else (None, None)
+        if factory is None: db = SessionLocal(); db.info["read_source"] = "primary"; return db
+        db = factory(); db.info["read_source"] = "snapshot"; db.info["snapshot_at"] = taken
+        return db
+
+    def age(self):
+        # Seconds since the newest snapshot was taken; None when not reading from a snapshot
+        if self.replica_url or not self.enabled: return None
+        files = self._files()
+        return max(0.0, time.time() - self._taken_at(files[-1])) if files else None
+
+    def headers(self, db):
+        out = {"X-Read-Source": db.info.get("read_source", "primary")}
+        at = db.info.get("snapshot_at")
+        if at is not None:
+            out["X-Snapshot-Age"] = f"{max(0.0, time.time() - at):.1f}"
+            out["X-Snapshot-Taken-At"] = datetime.fromtimestamp(at).isoformat(timespec="seconds")
+        return out
+
+    def stats(self):
+        age = self.age(); files = self._files() if self.enabled and not self.replica_url else []
+        return {"enabled": self.enabled, "source": "replica" if self.replica_url else "snapshot" if self.enabled else "primary",
+                "path": files[-1] if files else self.path, "files": len(files), "age_seconds": round(age, 1) if age is not None else None,
+                "bytes": os.path.getsize(files[-1]) if files else None, "last_refresh_seconds": round(self.last_seconds, 3), "skipped": self.skipped}
@@ -0,0 +1,40 @@
+from database import engine, ReceiptSequence, Appointment, AdhocReceipt
+from sqlalchemy import select, insert, update
+from datetime import datetime
+import threading
+
+# One per-day counter shared by consult and ad-hoc receipts. Each allocation is a
+# single-row UPDATE ... RETURNING; with block_size > 1 a worker reserves a block
+# of numbers at once and hands them out from memory (numbers stay unique but are
+# not strictly increasing across workers, and unused ones are skipped on restart).
+class ReceiptNumberService:
+    def __init__(self, bind=engine, block_size=1, prefix="RCP"):
+        self.bind = bind; self.block_size = max(1, int(block_size)); self.prefix = prefix
+        self.lock = threading.Lock(); self.blocks = {}
+
+    def next_number(self, day=None):
+        day = day or datetime.now().strftime("%Y%m%d")
+        with self.lock:
+            blk = self.blocks.get(day)
+            if not blk or blk[0] > blk[1]:
+                hi = self._reserve(day, self.block_size)
+                self.blocks = {day: [hi - self.block_size + 1, hi]}
+                blk = self.blocks[day]
+            n = blk[0]; blk[0] += 1
+        return f"{self.prefix}-{day}-{n:04d}"
+
+    def _seed(self, conn, day):
+        # Numbers issued before the sequence table existed (same day only)
+        pat = f"{self.prefix}-{day}-%"; top = 0
+        for col in (Appointment.receipt_number, AdhocReceipt.receipt_number):
+            for (rn,) in conn.execute(select(col).where(col.like(pat))):
+                tail = rn.rsplit("-", 1)[-1]
+                if tail.isdigit(): top = max(top, int(tail))
+        return top
+
+    def _reserve(self, day, k):
+        with self.bind.begin() as conn:
+            if conn.execute(select(ReceiptSequence.day).where(ReceiptSequence.day == day)).first() is None:
+                conn.execute(insert(ReceiptSequence).prefix_with("OR IGNORE").values(day=day, last_value=self._seed(conn, day)))
+            return conn.execute(update(ReceiptSequence).where(ReceiptSequence.day == day)
+                                .values(last_value=ReceiptSequence.last_value + k).returning(ReceiptSequence.last_value)).scalar_one()
@@ -0,0 +1,153 @@
+from database import SessionLocal, ScheduledJob
+from sqlalchemy import insert, update, or_
+from datetime import datetime, timedelta
+from metrics import histogram, ERRORS
+import threading, socket, os, time, logging
+
+log = logging.getLogger(__name__)
+JOB_SECONDS = histogram("medmatch_job_seconds", "Scheduled job run time", ("job", "status"))
+
+# --- CRON ---
+class Cron:
+    # Five fields: minute hour day-of-month month day-of-week (0=Sunday).
+    # Each field accepts *, */n, a, a/n (a to the end), a-b, a-b/n and comma separated
+    # lists. As in standard cron, when both day fields are restricted a day matching
+    # either one fires.
+    RANGES = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+    def __init__(self, expr):
+        parts = expr.split()
+        if len(parts) != 5: raise ValueError(f"Bad cron expression: {expr}")
+        self.expr = expr
+        self.minute, self.hour, self.dom, self.month, self.dow = [self._field(p, lo, hi) for p, (lo, hi) in zip(parts, self.RANGES)]
+        self.any_dom = parts[2].startswith("*"); self.any_dow = parts[4].startswith("*")
+
+    @staticmethod
+    def _field(text, lo, hi):
+        vals = set()
+        for part in text.split(","):
+            rng, _, step = part.partition("/")
+            if rng == "*": a, b = lo, hi
+            elif "-" in rng: a, b = map(int, rng.split("-"))
+            else: a = int(rng); b = hi if step else a
+            if a < lo or b > hi or a > b: raise ValueError(f"Cron field out of range: {text}")
+            vals.update(range(a, b + 1, int(step) if step else 1))
+        return vals
+
+    def next_after(self, dt):
+        t = dt.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 4)
+        while t < limit:
+            if t.month not in self.month:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1); continue
+            if not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1); continue
+            if t.hour not in self.hour:
+                t = t.replace(minute=0) + timedelta(hours=1); continue
+            if t.minute not in self.minute:
+                t += timedelta(minutes=1); continue
+            return t
+        raise ValueError(f"Cron expression never fires: {self.expr}")
+
+    def _day_matches(self, t):
+        dom = t.day in self.dom; dow = (t.weekday() + 1) % 7 in self.dow
+        if self.any_dom or self.any_dow: return dom and dow
+        return dom or dow
+
+# --- SCHEDULER ---
+class Job:
+    def __init__(self, name, fn, every=None, cron=None, exclusive=True, lease=300, thread="scheduler"):
+        if (every is None) == (cron is None): raise ValueError("Job needs exactly one of every= or cron=")
+        self.name = name; self.fn = fn; self.every = every; self.cron = Cron(cron) if cron else None
+        self.exclusive = exclusive; self.lease = lease; self.thread = thread
+        self.next_run = self.next_after(datetime.now())
+
+    def next_after(self, dt):
+        if self.cron: return self.cron.next_after(dt)
+        # Interval runs are aligned to the epoch so every worker computes the same slots
+        ts = dt.timestamp()
+        return datetime.fromtimestamp((int(ts // self.every) + 1) * self.every)
+
+class Scheduler:
+    # Exclusive jobs take a lease on their scheduled_jobs row, so with several
+    # uvicorn workers each slot runs once. Non-exclusive jobs (per-process cache
+    # refreshes) run in every worker. Jobs run on the thread named by thread=, so
+    # frequent light jobs can be kept off the thread running long ones.
+    def __init__(self, session_factory=SessionLocal, tick=1.0):
+        self.session_factory = session_factory; self.tick = tick
+        self.jobs = {}; self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event(); self.threads = {}
+        self.local_stats = {}
+
+    def register(self, name, fn, every=None, cron=None, exclusive=True, lease=300, thread="scheduler"):
+        self.jobs[name] = Job(name, fn, every, cron, exclusive, lease, thread)
+        return fn
+
+    def job(self, name, **kw):
+        return lambda fn: self.register(name, fn, **kw)
+
+    def start(self):
+        if any(t.is_alive() for t in self.threads.values()): return
+        db = self.session_factory()
+        try:
+            for name in self.jobs: db.execute(insert(ScheduledJob).prefix_with("OR IGNORE").values(name=name, run_count=0))
+            db.commit()
+        finally: db.close()
+        self.stopping.clear()
+        self.threads = {n: threading.Thread(target=self._run, args=(n,), name=n, daemon=True) for n in {j.thread for j in self.jobs.values()}}
+        for t in self.threads.values(): t.start()
+
+    def stop(self, timeout=5):
+        self.stopping.set()
+        for t in self.threads.values(): t.join(timeout)
+
+    def _run(self, thread="scheduler"):
+        while not self.stopping.is_set():
+            now = datetime.now()
+            for job in list(self.jobs.values()):
+                if job.thread != thread or now < job.next_run: continue
+                due = job.next_run; job.next_run = job.next_after(now)
+                try: self.run_job(job, due)
+                except Exception: log.exception("Scheduler failed running %s", job.name); ERRORS.inc(component="scheduler")
+            self.stopping.wait(self.tick)
+
+    def _acquire(self, db, job, due):
+        now = datetime.now()
+        res = db.execute(update(ScheduledJob).where(
+            ScheduledJob.name == job.name,
+            or_(ScheduledJob.locked_until == None, ScheduledJob.locked_until < now.isoformat()),
+            or_(ScheduledJob.last_started_at == None, ScheduledJob.last_started_at < due.isoformat()),
+        ).values(owner=self.owner, locked_until=(now + timedelta(seconds=job.lease)).isoformat(), last_started_at=now.isoformat()))
+        db.commit()
+        return res.rowcount == 1
+
+    def run_job(self, job, due=None):
+        due = due or datetime.now()
+        db = self.session_factory()
+        try:
+            if job.exclusive and not self._acquire(db, job, due): return False
+            t0 = time.perf_counter(); status, err = "OK", None
+            try: job.fn(db); db.commit()
+            except Exception as e: db.rollback(); status, err = "ERROR", str(e)[:500]
+            dt = time.perf_counter() - t0; ms = round(dt * 1000, 2)
+            JOB_SECONDS.observe(dt, job=job.name, status=status)
+            self.local_stats[job.name] = {"last_duration_ms": ms, "last_status": status, "last_run_at": due.isoformat()}
+            if job.exclusive:
+                db.execute(update(ScheduledJob).where(ScheduledJob.name == job.name, ScheduledJob.owner == self.owner).values(
+                    locked_until=None, last_finished_at=datetime.now().isoformat(), last_duration_ms=ms,
+                    last_status=status, last_error=err, run_count=ScheduledJob.run_count + 1))
+                db.commit()
+            if err: log.error("Job %s failed: %s", job.name, err); ERRORS.inc(component="job")
+            return True
+        finally: db.close()
+
+    def stats(self, db):
+        rows = {r.name: r for r in db.query(ScheduledJob).all()}
+        out = []
+        for name, job in self.jobs.items():
+            r = rows.get(name); local = self.local_stats.get(name, {})
+            out.append({"name": name, "schedule": job.cron.expr if job.cron else f"every {job.every}s", "exclusive": job.exclusive, "thread": job.thread,
+                        "next_run": job.next_run.isoformat(), "last_status": r.last_status if r and job.exclusive else local.get("last_status"),
+                        "last_duration_ms": r.last_duration_ms if r and job.exclusive else local.get("last_duration_ms"),
+                        "last_finished_at": r.last_finished_at if r else None, "run_count": r.run_count if r else 0})
+        return out
@@ -1,13 +1,40 @@
-from passlib.context import CryptContext
-import re
+from functools import lru_cache
+import re, os, hmac, hashlib, secrets, logging
+from metrics import timed
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+log = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def pwd_context():
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+@timed("password_hash")
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
+@timed("password_verify")
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
+
+@lru_cache(maxsize=None)
+def session_key():
+    # Workers must share MEDMATCH_SECRET_KEY for their user tokens to verify on each other
+    key = os.environ.get("MEDMATCH_SECRET_KEY")
+    if key: return key.encode()
+    log.warning("MEDMATCH_SECRET_KEY is not set; user tokens only verify on the worker that issued them")
+    return secrets.token_bytes(32)
+
+def sign_user(role, user_id):
+    # "Role:id:mac" returned at login and sent back as X-User-Token
+    body = f"{role}:{user_id}"
+    return f"{body}:{hmac.new(session_key(), body.encode(), hashlib.sha256).hexdigest()}"
+
+def verify_user_token(token):
+    # -> "Role:id" when the token was issued by sign_user, else None
+    body, _, mac = (token or "").rpartition(":")
+    if not body or not hmac.compare_digest(mac, hmac.new(session_key(), body.encode(), hashlib.sha256).hexdigest()): return None
+    return body
 
 def validate_password_complexity(password: str) -> bool:
     # Relaxed regex for ease of use in demo, stricter in production
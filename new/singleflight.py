@@ -0,0 +1,42 @@
+from metrics import counter
+import threading
+
+COALESCED = counter("medmatch_singleflight_total", "Reads that ran (leader) or shared an in-flight result (shared)", ("group", "result"))
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+    def __init__(self):
+        self.done = threading.Event(); self.result = None; self.error = None; self.waiters = 0
+
+# Request coalescing: concurrent calls with the same key share one execution of fn.
+# Only calls that overlap in time are merged; nothing is cached once the leader
+# finishes, so results are never staler than the request that computed them.
+# Shared results go to several responses and must not be mutated.
+class SingleFlight:
+    def __init__(self, group):
+        self.group = group; self.calls = {}; self.lock = threading.Lock()
+        self.leaders = 0; self.shared = 0
+
+    def do(self, key, fn):
+        with self.lock:
+            call = self.calls.get(key); leader = call is None
+            if leader: call = self.calls[key] = _Call(); self.leaders += 1
+            else: call.waiters += 1; self.shared += 1
+        COALESCED.inc(group=self.group, result="leader" if leader else "shared")
+        if not leader:
+            call.done.wait()
+            if call.error is not None: raise call.error
+            return call.result
+        try:
+            call.result = fn(); return call.result
+        except Exception as e:
+            call.error = e; raise
+        finally:
+            with self.lock: del self.calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self.lock:
+            total = self.leaders + self.shared
+            return {"leaders": self.leaders, "shared": self.shared, "in_flight": len(self.calls),
+                    "hit_rate": round(self.shared / total, 4) if total else 0.0}
@@ -0,0 +1,91 @@
+from database import SessionLocal, SlotTemplate
+from cache_sync import VersionedCache
+from datetime import date, datetime, timedelta
+import threading
+
+DEFAULT = {"start_time": "09:00", "end_time": "17:00", "slot_minutes": 30, "breaks": "", "is_off": False}
+
+def minutes(t):
+    h, m = t.split(":"); return int(h) * 60 + int(m)
+
+def parse_breaks(s):
+    out = []
+    for part in (s or "").split(","):
+        if part.strip():
+            a, b = part.strip().split("-"); out.append((minutes(a), minutes(b)))
+    return out
+
+def validate(t):
+    # -> error message or None
+    try:
+        s, e = minutes(t["start_time"]), minutes(t["end_time"]); br = parse_breaks(t.get("breaks"))
+    except (ValueError, AttributeError): return "Times must be HH:MM and breaks HH:MM-HH:MM"
+    if not 0 <= s < e <= 1440: return "start_time must be before end_time"
+    if not 5 <= t.get("slot_minutes", 30) <= 240 or t.get("slot_minutes", 30) % 5: return "slot_minutes must be a multiple of 5 between 5 and 240"
+    if t.get("weekday") is not None and not 0 <= t["weekday"] <= 6: return "weekday must be 0 (Monday) to 6"
+    if any(a >= b for a, b in br): return "Each break must end after it starts"
+    return None
+
+def expand(rows):
+    # Union of the slots of every template row for a day, as sorted "HH:MM" strings
+    out = set()
+    for r in rows:
+        if r["is_off"]: return ()
+        t, end, step = minutes(r["start_time"]), minutes(r["end_time"]), r["slot_minutes"] or 30
+        br = parse_breaks(r["breaks"])
+        while t + step <= end:
+            if not any(a < t + step and t < b for a, b in br): out.add(f"{t // 60:02d}:{t % 60:02d}")
+            t += step
+    return tuple(sorted(out))
+
+def load_templates(db):
+    res = {}
+    for t in db.query(SlotTemplate).all():
+        res.setdefault((t.doctor_id, t.weekday), []).append({"start_time": t.start_time, "end_time": t.end_time, "slot_minutes": t.slot_minutes,
+                                                            "breaks": t.breaks or "", "is_off": bool(t.is_off)})
+    return res
+
+# Slot grid per (doctor, date): the doctor's weekday rows, else their every-day rows,
+# else the clinic default rows, else DEFAULT. Grids are memoised per templates
+# version, so availability, booking validation and next-free-slot share one tuple.
+class SlotGrid:
+    def __init__(self, versions=None, max_entries=50000):
+        self.templates = VersionedCache(versions, "templates", load_templates)
+        self.max_entries = max_entries; self.memo = {}; self.memo_key = None; self.lock = threading.Lock()
+
+    def _templates(self, db):
+        own = db is None; db = db or SessionLocal()
+        try: return self.templates.get(db), self.templates.key
+        finally:
+            if own: db.close()
+
+    def rows_for(self, doctor_id, day, tpl):
+        wd = date.fromisoformat(day).weekday()
+        for k in ((doctor_id, wd), (doctor_id, None), (None, wd), (None, None)):
+            if k in tpl: return tpl[k]
+        return [DEFAULT]
+
+    def slots(self, doctor_id, day, db=None):
+        tpl, key = self._templates(db)
+        with self.lock:
+            if key != self.memo_key or key is None: self.memo = {}; self.memo_key = key
+            hit = self.memo.get((doctor_id, day))
+        if hit is not None: return hit
+        try: grid = expand(self.rows_for(doctor_id, day, tpl))
+        except ValueError: grid = ()
+        with self.lock:
+            if len(self.memo) >= self.max_entries: self.memo.clear()
+            self.memo[(doctor_id, day)] = grid
+        return grid
+
+    def is_slot(self, doctor_id, day, time, db=None):
+        return time in self.slots(doctor_id, day, db)
+
+    def next_free(self, doctor_id, is_taken, now=None, horizon_days=14, db=None):
+        now = now or datetime.now(); today = now.date(); hm = now.strftime("%H:%M")
+        for k in range(horizon_days + 1):
+            day = (today + timedelta(days=k)).isoformat()
+            for t in self.slots(doctor_id, day, db):
+                if k == 0 and t <= hm: continue
+                if not is_taken(day, t): return f"{day} {t}"
+        return None
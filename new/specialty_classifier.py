@@ -0,0 +1,153 @@
+from database import SessionLocal, Appointment, ArchivedAppointment, Doctor, KnowledgeEntry
+from sqlalchemy import func, literal
+from sqlalchemy.orm import aliased
+from metrics import timed
+from zlib import crc32
+import argparse, os, re, time, json
+
+# Multinomial logistic regression over hashed word unigrams + bigrams, trained
+# offline from completed appointments (symptoms -> treating doctor's specialty).
+# Scoring is a sparse row sum plus a softmax over a handful of specialties.
+TOKEN = re.compile(r"[a-z]+")
+
+def _np():
+    import numpy as np
+    return np
+
+class SpecialtyClassifier:
+    def __init__(self, n_features=2**16):
+        np = _np()
+        self.n_features = n_features; self.classes = []
+        self.W = np.zeros((n_features, 0), dtype=np.float32); self.b = np.zeros(0, dtype=np.float32)
+        self.seen = np.zeros(n_features, dtype=bool)
+        self.last_entry_id = None; self.n_examples = 0; self.trained_at = None
+
+    def features(self, text):
+        toks = TOKEN.findall((text or "").lower())
+        grams = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])]
+        return sorted({crc32(g.encode()) % self.n_features for g in grams})
+
+    def _add_class(self, label):
+        np = _np()
+        self.classes.append(label)
+        self.W = np.hstack([self.W, np.zeros((self.n_features, 1), dtype=np.float32)]); self.b = np.append(self.b, np.float32(0))
+
+    def _softmax(self, z):
+        np = _np(); z = z - z.max(); e = np.exp(z); return e / e.sum()
+
+    def partial_fit(self, texts, labels, epochs=5, lr=0.5, seed=0):
+        np = _np()
+        for y in labels:
+            if y not in self.classes: self._add_class(y)
+        col = {c: i for i, c in enumerate(self.classes)}
+        data = [(np.array(self.features(t), dtype=np.int64), col[y]) for t, y in zip(texts, labels)]
+        data = [(f, y) for f, y in data if len(f)]
+        for f, _ in data: self.seen[f] = True
+        rng = np.random.default_rng(seed)
+        for ep in range(epochs):
+            step = lr / (1 + ep)
+            for k in rng.permutation(len(data)):
+                idx, y = data[k]; scale = 1 / np.sqrt(len(idx))
+                g = self._softmax(self.W[idx].sum(0) * scale + self.b); g[y] -= 1
+                self.W[idx] -= (step * scale) * g; self.b -= step * g
+        self.n_examples += len(data)
+        return self
+
+    @timed("classify_specialty")
+    def predict(self, text):
+        # -> (specialty_id, confidence) or (None, 0.0) when nothing is known about the text
+        if len(self.classes) < 2: return None, 0.0
+        idx = [i for i in self.features(text) if self.seen[i]]
+        if not idx: return None, 0.0
+        p = self._softmax(self.W[idx].sum(0) / len(idx) ** 0.5 + self.b)
+        i = int(p.argmax()); return self.classes[i], float(p[i])
+
+    @timed("classify_specialty_batch")
+    def predict_many(self, texts):
+        # One sparse (texts x features) @ W product instead of a row sum per text
+        np = _np()
+        if len(self.classes) < 2: return [(None, 0.0) for _ in texts]
+        from scipy.sparse import csr_matrix
+        rows, cols, vals = [], [], []
+        for r, t in enumerate(texts):
+            idx = [i for i in self.features(t) if self.seen[i]]
+            if idx: rows += [r] * len(idx); cols += idx; vals += [len(idx) ** -0.5] * len(idx)
+        X = csr_matrix((np.array(vals, dtype=np.float32), (rows, cols)), shape=(len(texts), self.n_features))
+        Z = np.asarray(X @ self.W) + self.b
+        known = np.diff(X.indptr) > 0; out = []
+        for z, ok in zip(Z, known):
+            if not ok: out.append((None, 0.0)); continue
+            p = self._softmax(z); i = int(p.argmax()); out.append((self.classes[i], float(p[i])))
+        return out
+
+    def save(self, path):
+        np = _np(); tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, W=self.W, b=self.b, seen=self.seen, classes=np.array(self.classes, dtype=np.int64),
+                            meta=np.array(json.dumps({"n_features": self.n_features, "last_entry_id": self.last_entry_id,
+                                                      "n_examples": self.n_examples, "trained_at": self.trained_at})))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        np = _np()
+        with np.load(path) as z:
+            meta = json.loads(str(z["meta"]))
+            m = cls(meta["n_features"]); m.W = z["W"]; m.b = z["b"]; m.seen = z["seen"]; m.classes = [int(c) for c in z["classes"]]
+        # models saved before the completion watermark have none and are retrained from scratch
+        m.last_entry_id = meta.get("last_entry_id"); m.n_examples = meta["n_examples"]; m.trained_at = meta["trained_at"]
+        return m
+
+    def info(self):
+        return {"classes": len(self.classes), "n_features": self.n_features, "n_examples": self.n_examples,
+                "last_entry_id": self.last_entry_id, "trained_at": self.trained_at}
+
+def training_rows(db, after_entry=None, upto=None, limit=None):
+    # Appointments complete out of id order, so the watermark is the knowledge_base entry
+    # /doctor/consult writes in the same transaction: SQLite has one writer at a time, so
+    # entry ids follow commit order. A full run (after_entry=None) also takes completed
+    # appointments without an entry (seeded or from before the link), as seq 0.
+    # A repeat consult adds another entry for the same appointment; only the first counts.
+    rows = []; earlier = aliased(KnowledgeEntry)
+    first = ~db.query(earlier.id).filter(earlier.appointment_id == KnowledgeEntry.appointment_id, earlier.id < KnowledgeEntry.id).exists()
+    for m in (ArchivedAppointment, Appointment):
+        base = lambda seq: db.query(seq.label("seq"), m.id, m.symptoms, Doctor.specialty_id).join(Doctor, m.doctor_id == Doctor.id)\
+            .filter(m.status == "COMPLETED", m.symptoms != None, Doctor.specialty_id != None)
+        q = base(KnowledgeEntry.id).join(KnowledgeEntry, KnowledgeEntry.appointment_id == m.id)\
+            .filter(KnowledgeEntry.id > (after_entry or 0), first).order_by(KnowledgeEntry.id)
+        if upto is not None: q = q.filter(KnowledgeEntry.id <= upto)
+        rows += q.limit(limit).all() if limit else q.all()
+        if after_entry is None:
+            linked = db.query(KnowledgeEntry.id).filter(KnowledgeEntry.appointment_id == m.id).exists()
+            rows += base(literal(0)).filter(~linked).all()
+    rows.sort(key=lambda r: (r.seq, r.id))
+    return rows[:limit] if limit else rows
+
+def train(db, path, incremental=True, epochs=5):
+    # Incremental runs start from the saved model and only see appointments completed since
+    model = SpecialtyClassifier.load(path) if incremental and os.path.exists(path) else SpecialtyClassifier()
+    if model.last_entry_id is None: model = SpecialtyClassifier()
+    # read the top entry first: anything committed after it has a higher id and waits for the next run
+    top = db.query(func.max(KnowledgeEntry.id)).scalar() or 0
+    rows = training_rows(db, model.last_entry_id, top)
+    if rows:
+        model.partial_fit([r.symptoms for r in rows], [r.specialty_id for r in rows], epochs=epochs, seed=model.n_examples)
+        model.trained_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if rows or (model.classes and model.last_entry_id != top):
+        model.last_entry_id = top; model.save(path)
+    return model, len(rows)
+
+if __name__ == "__main__":
+    from config import get_config
+    p = argparse.ArgumentParser(description="Train the /analyze/doctors specialty classifier")
+    p.add_argument("--out", default=get_config().get("classifier_model", "specialty_model.npz"))
+    p.add_argument("--full", action="store_true", help="retrain from scratch instead of continuing the saved model")
+    p.add_argument("--epochs", type=int, default=5)
+    a = p.parse_args()
+    db = SessionLocal()
+    try:
+        model, n = train(db, a.out, incremental=not a.full, epochs=a.epochs)
+        if n:
+            from cache_sync import CacheVersions
+            CacheVersions().bump(db, "classifier"); db.commit()
+        print(json.dumps({"trained_on": n, **model.info()}))
+    finally: db.close()
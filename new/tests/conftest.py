@@ -0,0 +1,22 @@
+import os, sys, tempfile
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# database.engine is created at import; keep tests off the real medmatch.db
+os.environ.setdefault("MEDMATCH_DB_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='medmatch-tests-'), 'test.db')}")
+
+@pytest.fixture(scope="session")
+def schema():
+    import database
+    database.init_db()  # seeds doctor 1 and patient 1
+    return database
+
+@pytest.fixture
+def db(schema):
+    # A session on the test database; appointment, receipt and knowledge rows are cleared afterwards
+    s = schema.SessionLocal()
+    yield s
+    s.rollback()
+    for m in (schema.Appointment, schema.ArchivedAppointment, schema.ReceiptSequence, schema.AdhocReceipt, schema.KnowledgeEntry):
+        s.query(m).delete()
+    s.commit(); s.close()
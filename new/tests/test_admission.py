@@ -0,0 +1,50 @@
+import threading, time
+import pytest
+from fastapi import HTTPException
+from admission import TokenBuckets, Gate, AdmissionControl
+
+def test_token_bucket_allows_a_burst_then_reports_the_wait():
+    b = TokenBuckets(rate=2.0, burst=3)
+    assert [b.take("u", now=100.0) for _ in range(3)] == [0, 0, 0]
+    assert b.take("u", now=100.0) == pytest.approx(0.5)
+    assert b.take("other", now=100.0) == 0  # buckets are per key
+    assert b.take("u", now=100.5) == 0  # refilled one token
+
+def test_zero_rate_disables_the_limit():
+    b = TokenBuckets(rate=0, burst=1)
+    assert all(b.take("u") == 0 for _ in range(50))
+
+def shed(gate, key="u"):
+    with pytest.raises(HTTPException) as e: gate.enter(key)
+    return e.value
+
+def test_rate_limited_request_gets_429_with_retry_after():
+    g = Gate("t", concurrency=4, max_queue=4, queue_timeout=1, rate=0.5, burst=1)
+    g.enter("u"); g.leave()
+    err = shed(g)
+    assert err.status_code == 429 and err.headers["Retry-After"] == "2"
+
+def test_full_queue_is_shed_at_once():
+    g = Gate("t", concurrency=1, max_queue=0, queue_timeout=5, rate=0, burst=1)
+    g.enter("a")
+    t0 = time.perf_counter(); err = shed(g, "b")
+    assert err.status_code == 429 and "Retry-After" in err.headers and time.perf_counter() - t0 < 1
+    g.leave()
+
+def test_queued_request_times_out_then_a_released_slot_is_reused():
+    g = Gate("t", concurrency=1, max_queue=2, queue_timeout=0.1, rate=0, burst=1)
+    g.enter("a")
+    assert shed(g, "b").status_code == 429
+    threading.Timer(0.05, g.leave).start()
+    g2 = Gate("t2", concurrency=1, max_queue=2, queue_timeout=2, rate=0, burst=1); g2.enter("a")
+    threading.Timer(0.05, g2.leave).start()
+    g2.enter("b")  # waits for the slot instead of failing
+    assert g2.stats()["running"] == 1
+    g2.leave()
+
+def test_admit_releases_the_slot_on_error():
+    ac = AdmissionControl({"auth": {"concurrency": 1, "max_queue": 0, "rate": 0}})
+    with pytest.raises(ValueError):
+        with ac.admit("auth", "email:a@x"): raise ValueError
+    with ac.admit("auth", "email:a@x"): assert ac.stats()["auth"]["running"] == 1
+    assert ac.stats()["auth"]["running"] == 0
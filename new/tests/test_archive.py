@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+import pytest
+import archive
+from config import get_config
+
+def day(n): return (datetime.now() - timedelta(days=n)).strftime("%Y-%m-%d")
+
+@pytest.fixture
+def visits(db, schema):
+    A = schema.Appointment
+    rows = [A(doctor_id=1, patient_id=1, appt_date=day(800), appt_time="09:00", status="COMPLETED", charges=50.0),
+            A(doctor_id=1, patient_id=1, appt_date=day(500), appt_time="09:00", status="COMPLETED", charges=60.0),
+            A(doctor_id=1, patient_id=1, appt_date=day(500), appt_time="10:00", status="CANCELLED"),
+            A(doctor_id=1, patient_id=1, appt_date=day(10), appt_time="09:00", status="COMPLETED")]
+    db.add_all(rows); db.commit()
+    return [r.id for r in rows]
+
+def test_only_old_completed_visits_move_and_keep_their_ids(db, schema, visits):
+    old1, old2, cancelled, recent = visits
+    assert archive.archive_completed(db, batch_size=1) == 2
+    assert sorted(i for (i,) in db.query(schema.ArchivedAppointment.id)) == [old1, old2]
+    assert sorted(i for (i,) in db.query(schema.Appointment.id)) == [cancelled, recent]
+    assert db.get(schema.ArchivedAppointment, old2).charges == 60.0
+    assert archive.archive_completed(db) == 0  # nothing left to move
+
+def test_archive_is_off_without_a_cutoff(db, visits, monkeypatch):
+    monkeypatch.setitem(get_config(), "archive_after_days", None)
+    assert archive.archive_completed(db) == 0
+
+def test_stats_and_needs_archive(db, visits):
+    assert not archive.needs_archive(db)
+    archive.archive_completed(db)
+    s = archive.stats(db)
+    assert s["archived"] == 2 and s["hot"] == 2 and s["archived_through"] == day(500)
+    assert archive.needs_archive(db, day(600)) and not archive.needs_archive(db, day(100))
+
+def test_new_appointments_never_reuse_archived_ids(db, schema, visits):
+    archive.archive_completed(db)
+    db.query(schema.Appointment).delete(); db.commit()
+    a = schema.Appointment(doctor_id=1, patient_id=1, appt_date=day(0), appt_time="09:00", status="PENDING"); db.add(a); db.commit()
+    assert a.id > max(visits)
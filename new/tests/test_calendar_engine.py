@@ -0,0 +1,49 @@
+import threading
+from calendar_engine import CalendarEngine, to_unit
+
+DAY = "2030-04-01"
+
+def loaded(db):
+    cal = CalendarEngine(); cal.load(db); return cal
+
+def test_time_grid():
+    assert to_unit("09:05") == 109 and to_unit("09:07") is None and to_unit("24:00") is None and to_unit("x") is None
+
+def test_reserve_rejects_a_taken_slot_and_a_double_booked_patient(db):
+    cal = loaded(db)
+    assert cal.reserve(1, DAY, "09:00", patient_id=7) is None
+    assert cal.reserve(1, DAY, "09:00", patient_id=8) == "Doctor Busy"
+    assert cal.reserve(2, DAY, "09:00", patient_id=7) == "You have another appointment"
+    assert cal.reserve(2, DAY, "09:30", patient_id=7) is None
+    assert cal.day(1, DAY) == {"09:00": {"status": "PENDING", "patient_id": 7}}
+
+def test_release_frees_the_doctor_and_the_patient(db):
+    cal = loaded(db)
+    cal.reserve(1, DAY, "10:00", patient_id=7); cal.release(1, DAY, "10:00")
+    assert cal.is_free(1, DAY, "10:00") and cal.day(1, DAY) == {}
+    assert cal.reserve(2, DAY, "10:00", patient_id=7) is None
+
+def test_set_status_keeps_the_slot_occupied(db):
+    cal = loaded(db)
+    cal.reserve(1, DAY, "11:00", patient_id=7); cal.set_status(1, DAY, "11:00", "COMPLETED")
+    assert cal.day(1, DAY)["11:00"]["status"] == "COMPLETED" and not cal.is_free(1, DAY, "11:00")
+
+def test_concurrent_reservations_for_one_slot_admit_exactly_one(db):
+    cal = loaded(db); results = []; go = threading.Barrier(16)
+    def book(pid):
+        go.wait(); results.append(cal.reserve(1, DAY, "12:00", patient_id=pid))
+    ts = [threading.Thread(target=book, args=(p,)) for p in range(100, 116)]
+    for t in ts: t.start()
+    for t in ts: t.join()
+    assert results.count(None) == 1 and results.count("Doctor Busy") == 15
+
+def test_load_and_reload_days_follow_the_database(db, schema):
+    db.add(schema.Appointment(doctor_id=1, patient_id=1, appt_date=DAY, appt_time="09:00", status="CONFIRMED")); db.commit()
+    cal = loaded(db)
+    assert cal.day(1, DAY) == {"09:00": {"status": "CONFIRMED", "patient_id": 1}}
+    # another worker cancels 09:00 and books 09:30
+    db.query(schema.Appointment).delete()
+    db.add(schema.Appointment(doctor_id=1, patient_id=1, appt_date=DAY, appt_time="09:30", status="PENDING")); db.commit()
+    cal.reload_days(db, {(1, DAY)})
+    assert cal.day(1, DAY) == {"09:30": {"status": "PENDING", "patient_id": 1}}
+    assert cal.reserve(1, DAY, "09:00", patient_id=1) is None  # patient bit for 09:00 was cleared too
@@ -0,0 +1,43 @@
+import pytest
+from datetime import datetime
+from scheduler import Cron
+
+def fires(expr, start, n=4):
+    c = Cron(expr); t = datetime.fromisoformat(start); out = []
+    for _ in range(n): t = c.next_after(t); out.append(t.isoformat(timespec="minutes"))
+    return out
+
+@pytest.mark.parametrize("text,lo,hi,want", [
+    ("*", 0, 6, set(range(7))), ("*/15", 0, 59, {0, 15, 30, 45}), ("5", 0, 59, {5}),
+    ("10-12", 0, 23, {10, 11, 12}), ("0-20/10", 0, 59, {0, 10, 20}), ("1,3,5-6", 0, 6, {1, 3, 5, 6}),
+    ("5/20", 0, 59, {5, 25, 45}), ("1/2", 1, 12, {1, 3, 5, 7, 9, 11}),
+])
+def test_field_syntax(text, lo, hi, want):
+    assert Cron._field(text, lo, hi) == want
+
+@pytest.mark.parametrize("expr", ["* * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "5-1 * * * *", "* * * * 7", "x * * * *", "*/0 * * * *"])
+def test_rejects_bad_expressions(expr):
+    with pytest.raises(ValueError): Cron(expr)
+
+def test_next_after_is_strictly_later_and_on_the_minute():
+    assert fires("30 3 * * *", "2026-03-01T03:30:15", 2) == ["2026-03-02T03:30", "2026-03-03T03:30"]
+    assert fires("*/20 * * * *", "2026-03-01T10:05:00", 3) == ["2026-03-01T10:20", "2026-03-01T10:40", "2026-03-01T11:00"]
+
+def test_step_from_a_start_value_runs_to_the_end_of_the_range():
+    assert fires("0 5/6 * * *", "2026-03-01T00:00", 4) == ["2026-03-01T05:00", "2026-03-01T11:00", "2026-03-01T17:00", "2026-03-01T23:00"]
+
+def test_day_of_week_only():
+    # 2026-03-02 is a Monday
+    assert fires("0 9 * * 1", "2026-03-01T00:00", 2) == ["2026-03-02T09:00", "2026-03-09T09:00"]
+
+def test_day_of_month_and_week_both_restricted_fire_on_either():
+    # the 1st of the month or any Sunday (0): 2026-03-01 is a Sunday, then the 8th, 15th, 22nd, 29th, April 1st
+    assert fires("0 0 1 * 0", "2026-02-28T12:00", 7) == ["2026-03-01T00:00", "2026-03-08T00:00", "2026-03-15T00:00", "2026-03-22T00:00",
+                                                          "2026-03-29T00:00", "2026-04-01T00:00", "2026-04-05T00:00"]
+
+def test_month_rollover_and_leap_day():
+    assert fires("0 0 29 2 *", "2026-01-01T00:00", 2) == ["2028-02-29T00:00", "2032-02-29T00:00"]
+    assert fires("15 0 31 * *", "2026-04-01T00:00", 2) == ["2026-05-31T00:15", "2026-07-31T00:15"]
+
+def test_never_firing_expression_raises():
+    with pytest.raises(ValueError): Cron("0 0 31 2 *").next_after(datetime(2026, 1, 1))
@@ -0,0 +1,38 @@
+import pytest
+from bench.datagen import SPECIALTIES
+from logic_engine import FuzzyMatcher
+
+SPECS = list(SPECIALTIES)
+ID = {s: i + 1 for i, s in enumerate(SPECS)}
+
+@pytest.fixture(scope="module")
+def matcher():
+    return FuzzyMatcher([(k, ID[s]) for s in SPECS for k in SPECIALTIES[s]])
+
+def best(m, text):
+    sc = m.scores(text)
+    return max(sc, key=sc.get) if sc else None
+
+@pytest.mark.parametrize("text", ["tired all year", "near", "fear", "year", "dear me", "wear and tear"])
+def test_short_keywords_are_not_fuzzy_matched(matcher, text):
+    assert matcher.scores(text) == {}
+
+def test_exact_keyword_beats_fuzzy_neighbours(matcher):
+    assert matcher.scores("I fear it is my heart") == {ID["Cardiology"]: 1.0}
+
+def test_each_token_votes_once(matcher):
+    # "chest" must not also count as a near miss for other keywords
+    sc = matcher.scores("chest")
+    assert list(sc) == [ID["Cardiology"]] and sc[ID["Cardiology"]] == 1.0
+
+@pytest.mark.parametrize("text,spec", [
+    ("hearing loss", "ENT"), ("pain in my ear", "ENT"), ("my tummy hurts", "Gastroenterology"),
+    ("shortness of breath at night", "Pulmonology"), ("palpitaton since yesterday", "Cardiology"),
+    ("sore thraot", "ENT"), ("blured vision", "Ophthalmology"),
+])
+def test_routes_exact_and_typoed_keywords(matcher, text, spec):
+    assert best(matcher, text) == ID[spec]
+
+def test_batch_matches_single(matcher):
+    texts = ["I fear it is my heart", "year", "sore thraot", "rash and itch"]
+    assert matcher.scores_many(texts) == [matcher.scores(t) for t in texts]
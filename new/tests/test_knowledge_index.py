@@ -0,0 +1,46 @@
+from types import SimpleNamespace
+from sqlalchemy import text
+from knowledge_engine import MedicalKnowledgeSystem, install_fts
+
+def entry(i, symptoms, diagnosis):
+    return SimpleNamespace(id=i, symptom_text=symptoms, diagnosis=diagnosis, medication_plan="")
+
+SEED = [entry(1, "fever cough sore throat", "flu"), entry(2, "itchy rash on arms", "eczema"), entry(3, "chest pain breathless", "angina")]
+
+def test_new_entries_are_appended_with_the_fitted_vocabulary():
+    ks = MedicalKnowledgeSystem(refit_every=10, refit_seconds=3600)
+    assert ks.add_entries(SEED) == 3 and ks.refits == 1
+    assert ks.add_entries([entry(4, "fever and cough at night", "flu")]) == 1
+    assert ks.add_entries(SEED) == 0  # already indexed
+    assert ks.refits == 1 and ks.matrix.shape[0] == 4 and ks.appended == 1
+    ids = [i for i, _ in ks.rank_many(["night fever cough"], None, limit=2)[0]]
+    assert ids == [4, 1]
+
+def test_refit_after_refit_every_entries_or_refit_seconds():
+    ks = MedicalKnowledgeSystem(refit_every=3, refit_seconds=3600)
+    ks.add_entries(SEED)
+    ks.add_entries([entry(4, "migraine aura", "migraine"), entry(5, "knee swelling", "arthritis")])
+    assert ks.refits == 1
+    # "migraine" was not in the fitted vocabulary until the refit
+    assert ks.rank_many(["migraine"], None)[0] == []
+    ks.add_entries([entry(6, "ear ache", "otitis")])
+    assert ks.refits == 2 and ks.appended == 0 and ks.rank_many(["migraine"], None)[0][0][0] == 4
+    ks.refit_seconds = 0
+    ks.add_entries([entry(7, "toothache", "caries")])
+    assert ks.refits == 3
+
+def fts_objects(db):
+    return sorted(n for (n,) in db.execute(text("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name IN "
+                                                 "('knowledge_fts', 'knowledge_fts_ins', 'knowledge_fts_del', 'knowledge_fts_upd')")))
+
+def test_fts_index_exists_only_while_enabled_and_is_backfilled(db, schema):
+    db.add(schema.KnowledgeEntry(symptom_text="migraine aura", diagnosis="migraine")); db.commit()
+    install_fts(schema.engine, enabled=False)
+    assert fts_objects(db) == []
+    db.add(schema.KnowledgeEntry(symptom_text="migraine at night", diagnosis="migraine")); db.commit()
+    install_fts(schema.engine)
+    assert len(fts_objects(db)) == 4
+    db.add(schema.KnowledgeEntry(symptom_text="migraine with nausea", diagnosis="migraine")); db.commit()
+    assert db.execute(text("SELECT count(*) FROM knowledge_fts WHERE knowledge_fts MATCH 'migraine'")).scalar() == 3
+    install_fts(schema.engine, enabled=False)
+    assert fts_objects(db) == []
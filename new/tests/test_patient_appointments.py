@@ -0,0 +1,46 @@
+from datetime import date, timedelta
+import pytest
+from fastapi import HTTPException
+import archive
+
+@pytest.fixture
+def history(db, schema):
+    # 30 visits for patient 1 over 15 days, two per day; the older ones are archived
+    start = date.today() - timedelta(days=400); ids = []
+    for n in range(30):
+        status = "COMPLETED" if n % 3 else "CANCELLED"
+        a = schema.Appointment(doctor_id=1, patient_id=1, appt_date=(start + timedelta(days=n // 2 * 30)).isoformat(),
+                               appt_time="09:00" if n % 2 else "14:30", status=status)
+        db.add(a); db.flush(); ids.append(a.id)
+    db.commit(); archive.archive_completed(db)
+    assert db.query(schema.ArchivedAppointment).count() > 0
+    return ids
+
+def walk(main, db, **kw):
+    pages, cursor = [], None
+    while True:
+        page = main.patient_appointments(1, cursor=cursor, db=db, **kw)
+        pages.append(page["items"]); cursor = page["next_cursor"]
+        if not cursor: return pages
+
+@pytest.mark.parametrize("order", ["asc", "desc"])
+def test_pages_cover_hot_and_archived_rows_once_in_order(db, history, order):
+    import main
+    pages = walk(main, db, limit=7, order=order)
+    items = [i for p in pages for i in p]
+    assert sorted(i["ID"] for i in items) == sorted(history) and len(pages) == 5
+    keys = [(i["Date"], i["Time"], i["ID"]) for i in items]
+    assert keys == sorted(keys, reverse=order == "desc")
+
+def test_status_filter_and_limit_clamp(db, history):
+    import main
+    completed = [i for p in walk(main, db, status="completed", limit=500) for i in p]
+    assert len(completed) == 20 and {i["Status"] for i in completed} == {"COMPLETED"}
+    cancelled = [i for p in walk(main, db, status="CANCELLED", limit=0) for i in p]
+    assert len(cancelled) == 10
+
+def test_invalid_cursor_is_a_400(db, history):
+    import main
+    for bad in ("2024-01-01", "a|b|c"):
+        with pytest.raises(HTTPException) as e: main.patient_appointments(1, cursor=bad, limit=5, order="desc", db=db)
+        assert e.value.status_code == 400
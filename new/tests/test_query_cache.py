@@ -0,0 +1,36 @@
+from sqlalchemy.orm import sessionmaker
+from cache_sync import CacheVersions
+from knowledge_engine import QueryCache
+
+class Ranker:
+    def __init__(self): self.seen = []
+    def __call__(self, queries):
+        self.seen += queries; return [[(len(q), 1.0)] for q in queries]
+
+def test_repeat_queries_are_answered_from_cache():
+    rank = Ranker(); qc = QueryCache(None)
+    assert qc.get_many(["Fever and cough", "rash"], 3, rank) == [[(15, 1.0)], [(4, 1.0)]]
+    assert qc.get_many(["fever  and COUGH", "rash", "headache"], 3, rank) == [[(15, 1.0)], [(4, 1.0)], [(8, 1.0)]]
+    assert rank.seen == ["Fever and cough", "rash", "headache"]
+    assert qc.get_many(["rash"], 5, rank) and rank.seen[-1] == "rash"  # a different limit is its own entry
+    s = qc.stats(); assert s["hits"] == 2 and s["misses"] == 4
+
+def test_knowledge_version_bump_invalidates(schema):
+    # own session factory: the commit listener is per factory, and main registers one on SessionLocal
+    factory = sessionmaker(bind=schema.engine); db = factory()
+    versions = CacheVersions(factory); rank = Ranker(); qc = QueryCache(versions)
+    qc.get_many(["rash"], 3, rank); qc.get_many(["rash"], 3, rank)
+    assert rank.seen == ["rash"]
+    versions.bump(db, "knowledge"); db.commit()
+    qc.get_many(["rash"], 3, rank)
+    assert rank.seen == ["rash", "rash"] and qc.stats()["stale"] == 1
+    db.close()
+
+def test_ttl_and_size_bound():
+    rank = Ranker(); qc = QueryCache(None, max_entries=2, ttl=0)
+    qc.get_many(["a"], 3, rank); qc.get_many(["a"], 3, rank)
+    assert rank.seen == ["a", "a"]  # expired at once
+    qc = QueryCache(None, max_entries=2); rank = Ranker()
+    qc.get_many(["a", "b", "c"], 3, rank)
+    assert qc.stats()["entries"] == 2
+    qc.get_many(["a"], 3, rank); assert rank.seen[-1] == "a"  # the oldest entry was evicted
@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from receipts import ReceiptNumberService
+
+def test_numbers_count_up_per_day_and_restart_on_a_new_day(db):
+    svc = ReceiptNumberService()
+    assert [svc.next_number("20300101") for _ in range(3)] == ["RCP-20300101-0001", "RCP-20300101-0002", "RCP-20300101-0003"]
+    assert svc.next_number("20300102") == "RCP-20300102-0001"
+    # a restarted service continues from the stored sequence, not from 1
+    assert ReceiptNumberService().next_number("20300101") == "RCP-20300101-0004"
+
+def test_seeds_from_receipts_issued_before_the_sequence(db, schema):
+    db.add(schema.Appointment(doctor_id=1, patient_id=1, appt_date="2030-02-01", appt_time="09:00", status="COMPLETED", receipt_number="RCP-20300201-0041"))
+    db.add(schema.AdhocReceipt(receipt_number="RCP-20300201-0007", recipient_name="x", description="x", amount=1.0, created_at="2030-02-01"))
+    db.add(schema.AdhocReceipt(receipt_number="RCP-20300131-0099", recipient_name="x", description="x", amount=1.0, created_at="2030-01-31"))
+    db.commit()
+    assert ReceiptNumberService().next_number("20300201") == "RCP-20300201-0042"
+
+def test_blocks_from_several_workers_never_overlap(db):
+    workers = [ReceiptNumberService(block_size=5) for _ in range(3)]
+    with ThreadPoolExecutor(6) as ex:
+        got = list(ex.map(lambda i: workers[i % 3].next_number("20300301"), range(60)))
+    assert len(set(got)) == 60
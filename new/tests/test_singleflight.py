@@ -0,0 +1,37 @@
+import threading
+from singleflight import SingleFlight
+
+def run_concurrently(sf, key, fn, n=8):
+    results, errors, started = [], [], threading.Barrier(n)
+    def call():
+        started.wait()
+        try: results.append(sf.do(key, fn))
+        except Exception as e: errors.append(e)
+    ts = [threading.Thread(target=call) for _ in range(n)]
+    for t in ts: t.start()
+    for t in ts: t.join(5)
+    return results, errors
+
+def test_overlapping_calls_share_one_execution():
+    sf = SingleFlight("t"); calls = []; gate = threading.Event()
+    def fn():
+        calls.append(1); gate.wait(1); return {"v": 1}
+    threading.Timer(0.2, gate.set).start()
+    results, errors = run_concurrently(sf, "k", fn)
+    assert not errors and len(results) == 8 and all(r == {"v": 1} for r in results)
+    assert len(calls) < 8 and sf.stats()["shared"] == 8 - len(calls)
+
+def test_leader_error_reaches_every_waiter_and_is_not_cached():
+    sf = SingleFlight("t"); gate = threading.Event()
+    def boom():
+        gate.wait(1); raise RuntimeError("db down")
+    threading.Timer(0.2, gate.set).start()
+    results, errors = run_concurrently(sf, "k", boom)
+    assert not results and len(errors) == 8 and all(isinstance(e, RuntimeError) for e in errors)
+    assert sf.stats()["in_flight"] == 0
+    assert sf.do("k", lambda: "ok") == "ok"  # the failure was not remembered
+
+def test_different_keys_do_not_share():
+    sf = SingleFlight("t")
+    assert sf.do("a", lambda: 1) == 1 and sf.do("b", lambda: 2) == 2
+    assert sf.stats()["leaders"] == 2
@@ -0,0 +1,21 @@
+from specialty_classifier import training_rows
+
+def consult(db, schema, appt):
+    k = schema.KnowledgeEntry(symptom_text=appt.symptoms, diagnosis="flu", appointment_id=appt.id, doctor_name="Dr. House")
+    db.add(k); db.commit(); return k.id
+
+def test_a_repeat_consult_is_trained_once(db, schema):
+    a = schema.Appointment(doctor_id=1, patient_id=1, appt_date="2030-05-01", appt_time="09:00", status="COMPLETED", symptoms="chest pain")
+    b = schema.Appointment(doctor_id=1, patient_id=1, appt_date="2030-05-01", appt_time="09:30", status="COMPLETED", symptoms="palpitations")
+    db.add_all([a, b]); db.commit()
+    first = consult(db, schema, a); consult(db, schema, b); again = consult(db, schema, a)
+    assert [(r.seq, r.id) for r in training_rows(db)] == [(first, a.id), (first + 1, b.id)]
+    # an incremental run after the first consult does not see the repeat either
+    assert [r.id for r in training_rows(db, after_entry=first)] == [b.id]
+    assert training_rows(db, after_entry=first + 1, upto=again) == []
+
+def test_completed_visits_without_an_entry_count_in_a_full_run(db, schema):
+    a = schema.Appointment(doctor_id=1, patient_id=1, appt_date="2030-05-02", appt_time="09:00", status="COMPLETED", symptoms="chest pain")
+    db.add(a); db.commit()
+    assert [(r.seq, r.id) for r in training_rows(db)] == [(0, a.id)]
+    assert training_rows(db, after_entry=0) == []
@@ -0,0 +1,44 @@
+from sqlalchemy import text
+import re
+
+# FTS5 index over every user's name, email and phone. The rowid encodes the user:
+# id * 4 + role code, so triggers update a single row by key. unicode61 splits
+# emails and phone numbers on punctuation, so "john@test.com" matches "john" and "test".
+ROLES = {"Patient": (1, "patients", "phone"), "Doctor": (2, "doctors", "phone_number"), "Admin": (3, "admins", "NULL")}
+CODES = {code: role for role, (code, _, _) in ROLES.items()}
+
+def ddl():
+    out = ["CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(name, email, phone, tokenize='unicode61')"]
+    for role, (code, table, phone) in ROLES.items():
+        new_phone = "NULL" if phone == "NULL" else f"new.{phone}"
+        cols = "id, name, email" + ("" if phone == "NULL" else f", {phone}")
+        ins = f"INSERT INTO users_fts(rowid, name, email, phone) VALUES (new.id * 4 + {code}, new.name, new.email, {new_phone})"
+        out += [f"CREATE TRIGGER IF NOT EXISTS {table}_fts_ins AFTER INSERT ON {table} BEGIN {ins}; END",
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_upd AFTER UPDATE OF {cols} ON {table} BEGIN DELETE FROM users_fts WHERE rowid = old.id * 4 + {code}; {ins}; END",
+                f"CREATE TRIGGER IF NOT EXISTS {table}_fts_del AFTER DELETE ON {table} BEGIN DELETE FROM users_fts WHERE rowid = old.id * 4 + {code}; END"]
+    return out
+
+def install(engine):
+    # Creates the index and triggers if missing and backfills it on first creation
+    with engine.begin() as c:
+        fresh = not c.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'")).first()
+        for s in ddl(): c.execute(text(s))
+        if fresh:
+            for role, (code, table, phone) in ROLES.items():
+                c.execute(text(f"INSERT INTO users_fts(rowid, name, email, phone) SELECT id * 4 + {code}, name, email, {phone} FROM {table}"))
+
+def match_expr(q):
+    # Every word must match as a prefix: "jo sm" -> "jo"* AND "sm"*
+    words = re.findall(r"\w+", q or "")
+    return " ".join(f'"{w}"*' for w in words)
+
+def search(db, q, role=None, limit=20, offset=0):
+    expr = match_expr(q)
+    if not expr: return [], False
+    sql = "SELECT rowid, name, email, phone FROM users_fts WHERE users_fts MATCH :q"
+    params = {"q": expr, "limit": limit + 1, "offset": offset}
+    if role in ROLES: sql += " AND rowid % 4 = :code"; params["code"] = ROLES[role][0]
+    # bm25 weights: name, email, phone
+    rows = db.execute(text(sql + " ORDER BY bm25(users_fts, 10.0, 4.0, 2.0), rowid LIMIT :limit OFFSET :offset"), params).all()
+    hits = [{"role": CODES[r[0] % 4], "id": r[0] // 4, "name": r[1], "email": r[2], "phone": r[3]} for r in rows[:limit]]
+    return hits, len(rows) > limit